@@ -1,49 +1,67 @@
 from pathlib import Path
-import csv
-from flask import Flask, render_template, redirect, url_for
+from flask import Flask, Response, render_template, redirect, request, url_for
+import json
 import os
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from models.stockage import backend_configure
+from models.attribution import lire_usure, statistiques_usure
+from models.analyses import GRANULARITES, lire_agregats
+from config import obtenir_config
+from hardware.ipc import ClientIPC
+from metriques import TYPE_CONTENU, metriques_rfid
+from cache import CacheDashboard
 
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 
 app = Flask(__name__)
 
-def load_casiers():
-    casiers = []
-    csv_path = DATA_DIR / "casiers.csv"
-    if not csv_path.exists():
-        return casiers
-    with csv_path.open(newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            etat = (row.get("etat") or "").strip()
-            numero = row.get("id_casier") or row.get("numero") or ""
-            statut = "disponible" if etat.upper() == "PLEIN" else "occupe"
-            casiers.append({"numero": numero, "etat": etat or "N/A", "statut": statut})
-    return casiers
-
-def load_emprunts():
-    emprunts = []
-    csv_path = DATA_DIR / "emprunts.csv"
-    if not csv_path.exists():
-        return emprunts
-    with csv_path.open(newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for idx, row in enumerate(reader, 1):
-            statut = (row.get("statut") or "N/A").strip()
-            emprunts.append({
-                "id": idx,
-                "casier_id": row.get("id_casier", "N/A"),
-                "utilisateur": row.get("mail", "N/A"),
-                "date_debut": row.get("timestamp", "N/A"),
-                "statut": statut
-            })
-    return emprunts
-
-def build_stats(casiers):
-    total = len(casiers)
-    disponibles = sum(1 for c in casiers if c["statut"] == "disponible")
-    occupes = total - disponibles
-    return {"total": total, "disponibles": disponibles, "occupes": occupes}
+# CSV (snapshot + journal) ou SQLite selon IROBOT_STORAGE, relu de façon incrémentale
+cache = CacheDashboard(str(DATA_DIR), backend_configure())
+
+STATUTS_EMPRUNT = ("EN COURS", "TERMINE", "ANNULE")
+LIMIT_DEFAUT = 50
+LIMIT_MAX = 500
+LIMIT_SERIE_MAX = 24 * 31  # Un mois de tranches horaires
+IPC_TIMEOUT = 2
+ADRESSES_LOCALES = ("127.0.0.1", "::1")  # Seules origines admises pour /admin/profilage
+
+# Client IPC vers le processus RFID (/metrics, /admin/profilage), ouvert au chargement comme dans web/app.py :
+# pas d'initialisation paresseuse partagée entre les threads des requêtes
+ipc = ClientIPC().start()
+
+def json_compact(donnees, status=200):
+    corps = json.dumps(donnees, ensure_ascii=False, separators=(",", ":"))
+    return Response(corps, status=status, mimetype="application/json")
+
+def reponse_api(construire, variante=None):
+    """
+    Réponse JSON de l'API avec ETag (version du cache) :
+    un client qui renvoie If-None-Match avec la version courante reçoit un 304 vide.
+    → variante() : ce qui, dans la réponse, change sans nouvel événement (ex. avec l'heure qu'il est)
+    """
+    cache.rafraichir()
+    etag = cache.etag() if variante is None else f"{cache.etag()}-{variante()}"
+    if request.if_none_match.contains(etag):
+        reponse = Response(status=304)
+    else:
+        reponse = json_compact(construire())
+    reponse.set_etag(etag)
+    reponse.headers["Cache-Control"] = "no-cache"
+    return reponse
+
+def entier_param(nom, defaut, minimum, maximum=None):
+    brut = request.args.get(nom)
+    try:
+        valeur = defaut if brut is None else int(brut)
+    except ValueError:
+        valeur = None
+    if valeur is None or valeur < minimum or (maximum is not None and valeur > maximum):
+        borne = f"entre {minimum} et {maximum}" if maximum is not None else f">= {minimum}"
+        raise ValueError(f"{nom} doit être un entier {borne}")
+    return valeur
 
 @app.route("/")
 def index():
@@ -51,16 +69,91 @@ def index():
 
 @app.route("/dashboard")
 def dashboard():
-    casiers = load_casiers()
-    emprunts = load_emprunts()
-    stats = build_stats(casiers)
-    recent_emprunts = list(reversed(emprunts[-10:]))  # 10 derniers
-    return render_template("dashboard.html", casiers=casiers, stats=stats, emprunts=recent_emprunts)
+    cache.rafraichir()
+    return render_template("dashboard.html", casiers=cache.liste_casiers(), stats=cache.stats(),
+                           emprunts=cache.emprunts_recents())  # 10 derniers
+
+@app.route("/api/lockers")
+def api_lockers():
+    return reponse_api(lambda: {"casiers": cache.liste_casiers()})
+
+@app.route("/api/stats")
+def api_stats():
+    # Un emprunt passe en retard avec le temps, sans nouvel événement : le nombre de retards fait partie de l'ETag.
+    # À version égale, aucun emprunt n'a été rendu, l'ensemble des retards ne fait que croître : le nombre suffit.
+    en_retard = None
+
+    def variante():
+        nonlocal en_retard
+        en_retard = len(cache.emprunts_en_retard())
+        return f"r{en_retard}"
+
+    def construire():
+        stats = cache.stats()
+        stats["emprunts_en_cours"] = len(cache.emprunts.en_cours)
+        stats["emprunts_total"] = cache.emprunts.total
+        stats["emprunts_en_retard"] = en_retard
+        return stats
+    return reponse_api(construire, variante)
+
+@app.route("/api/loans")
+def api_loans():
+    statut = request.args.get("status") or None
+    try:
+        if statut is not None and statut not in STATUTS_EMPRUNT:
+            raise ValueError(f"status doit valoir {' ou '.join(STATUTS_EMPRUNT)}")
+        limit = entier_param("limit", LIMIT_DEFAUT, 1, LIMIT_MAX)
+        offset = entier_param("offset", 0, 0)
+    except ValueError as e:
+        return json_compact({"erreur": str(e)}, status=400)
+
+    def construire():
+        total, emprunts = cache.page_emprunts(statut, limit, offset)
+        return {"total": total, "limit": limit, "offset": offset, "emprunts": emprunts}
+    return reponse_api(construire)
+
+@app.route("/api/usure")
+def api_usure():
+    """Ouvertures par casier (data/usure.json, écrit par le processus RFID) et leur répartition"""
+    usure = lire_usure(str(DATA_DIR / "usure.json"))
+    return json_compact({
+        "casiers": [dict(infos, id_casier=id_casier) for id_casier, infos in sorted(usure.items())],
+        "repartition": statistiques_usure(usure),
+    })
+
+@app.route("/api/analyses")
+def api_analyses():
+    """Tranches horaires ou journalières (data/analyses.db, tenu par le processus RFID), de la plus ancienne"""
+    granularite = request.args.get("granularite", "jour")
+    try:
+        if granularite not in GRANULARITES:
+            raise ValueError(f"granularite doit valoir {' ou '.join(GRANULARITES)}")
+        limit = entier_param("limit", 30, 1, LIMIT_SERIE_MAX)
+    except ValueError as e:
+        return json_compact({"erreur": str(e)}, status=400)
+    tranches = lire_agregats(str(DATA_DIR / "analyses.db"), granularite, limit)
+    return json_compact({"granularite": granularite, "tranches": tranches})
 
 @app.route("/le-projet")
 def le_projet():
     return render_template("le_projet.html")
 
+@app.route("/metrics")
+def metrics():
+    return Response(metriques_rfid(ipc, IPC_TIMEOUT), content_type=TYPE_CONTENU)
+
+@app.route("/admin/profilage", methods=["POST"])
+def admin_profilage():
+    """Capture de profil dans le processus RFID (action=cpu|memoire|piles|arret, duree=secondes), en local seulement"""
+    if request.remote_addr not in ADRESSES_LOCALES:
+        return json_compact({"ok": False, "erreur": "réservé aux requêtes locales"}, 403)
+    message = {"type": "PROFILAGE", "action": request.values.get("action"), "duree": request.values.get("duree")}
+    reponse = ipc.demander(message, IPC_TIMEOUT) if ipc.attendre_connexion(IPC_TIMEOUT) else None
+    if reponse is None:
+        return json_compact({"ok": False, "erreur": "processus RFID injoignable"}, 503)
+    reponse = {cle: valeur for cle, valeur in reponse.items() if cle not in ("type", "id")}
+    return json_compact(reponse, 200 if reponse.get("ok") else 400)
+
 @app.route('/reboot', methods=['POST'])
 def reboot():
     try:
@@ -70,4 +163,4 @@ def reboot():
         return str(e), 500
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5010)
\ No newline at end of file
+    app.run(debug=True, host="0.0.0.0", port=obtenir_config().dashboard_port)
\ No newline at end of file
@@ -0,0 +1,260 @@
+"""
+Cache des données du dashboard, rafraîchi de façon incrémentale.
+
+→ CSV : on ne relit que les octets ajoutés aux journaux (casiers.journal, emprunts.journal)
+  depuis le dernier affichage ; le snapshot CSV n'est relu qu'après une compaction.
+→ SQLite : on ne requête que si PRAGMA data_version a changé (une autre connexion a écrit),
+  et uniquement ce qui est affiché (requêtes indexées, LIMIT).
+
+Le coût d'un affichage ne dépend donc plus de la longueur de l'historique.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from models.journal import SuiviJournal, lire_lignes
+from models.retards import DetecteurRetards
+
+NB_EMPRUNTS_RECENTS = 10
+COLONNES_EMPRUNTS = "id, mail, id_casier, timestamp, statut, timestamp_fin"
+
+
+def _entier(valeur):
+    """Les numéros de casier sont des str dans le CSV, des int dans le journal et SQLite"""
+    try:
+        return int(valeur)
+    except (TypeError, ValueError):
+        return valeur
+
+
+def vue_casier(row):
+    etat = (row.get("etat") or "").strip()
+    numero = _entier(row.get("id_casier") or row.get("numero") or "")
+    statut = "disponible" if etat.upper() == "PLEIN" else "occupe"
+    return {"numero": numero, "etat": etat or "N/A", "statut": statut}
+
+
+def vue_emprunt(index, row):
+    return {
+        "id": index + 1,
+        "casier_id": _entier(row.get("id_casier", "N/A")),
+        "utilisateur": row.get("mail", "N/A"),
+        "date_debut": row.get("timestamp", "N/A"),
+        "date_fin": row.get("timestamp_fin") or None,
+        "statut": (row.get("statut") or "N/A").strip()
+    }
+
+
+class EtatCasiers:
+    """Casiers par id + statistiques tenues à jour à chaque changement d'état"""
+
+    def __init__(self):
+        self.casiers = OrderedDict()  # id_casier (str) -> vue
+        self.stats = {"total": 0, "disponibles": 0, "occupes": 0}
+
+    def appliquer(self, row):
+        cle = str(row.get("id_casier") or row.get("numero") or "")
+        ancien = self.casiers.get(cle)
+        nouveau = vue_casier(row)
+        if ancien is None:
+            self.stats["total"] += 1
+        else:
+            self.stats[self._compteur(ancien)] -= 1
+        self.stats[self._compteur(nouveau)] += 1
+        self.casiers[cle] = nouveau
+
+    @staticmethod
+    def _compteur(vue):
+        return "disponibles" if vue["statut"] == "disponible" else "occupes"
+
+
+class EtatEmprunts:
+    """Derniers emprunts (fenêtre bornée) + emprunts EN COURS, sans garder l'historique"""
+
+    def __init__(self, nb_recents=NB_EMPRUNTS_RECENTS):
+        self.nb_recents = nb_recents
+        self.total = 0
+        self.recents = OrderedDict()   # index -> vue (les nb_recents dernières lignes)
+        self.en_cours = OrderedDict()  # index -> vue
+        self.retards = DetecteurRetards()
+
+    def appliquer(self, index, row):
+        """Applique une ligne (ajout si index == total, mise à jour sinon)"""
+        if index > self.total:
+            return
+        vue = vue_emprunt(index, row)
+        if index == self.total:
+            self.total += 1
+            self.recents[index] = vue
+            if len(self.recents) > self.nb_recents:
+                self.recents.popitem(last=False)
+        elif index in self.recents:
+            self.recents[index] = vue
+
+        if vue["statut"] == "EN COURS":
+            self.en_cours[index] = vue
+        else:
+            self.en_cours.pop(index, None)
+        self.retards.appliquer(index, row)
+
+
+class SourceCSV:
+    def __init__(self, data_dir):
+        self.suivi_casiers = SuiviJournal(os.path.join(data_dir, "casiers.csv"))
+        self.suivi_emprunts = SuiviJournal(os.path.join(data_dir, "emprunts.csv"))
+
+    def rafraichir(self, cache):
+        """Met à jour le cache, retourne True si quelque chose a changé"""
+        change = False
+
+        evenements = self.suivi_casiers.nouveaux_evenements()
+        if evenements is None:
+            cache.casiers = EtatCasiers()
+            lignes, evenements = self.suivi_casiers.recharger()
+            for row in lignes:
+                cache.casiers.appliquer(row)
+            change = True
+        for evenement in evenements:
+            if evenement.get("op") == "set":
+                cache.casiers.appliquer(evenement["ligne"])
+                change = True
+
+        evenements = self.suivi_emprunts.nouveaux_evenements()
+        if evenements is None:
+            cache.emprunts = EtatEmprunts(cache.nb_recents)
+            lignes, evenements = self.suivi_emprunts.recharger()
+            for index, row in enumerate(lignes):
+                cache.emprunts.appliquer(index, row)
+            change = True
+        for evenement in evenements:
+            if evenement.get("op") == "set":
+                cache.emprunts.appliquer(evenement["index"], evenement["ligne"])
+                change = True
+
+        return change
+
+    def page_emprunts(self, statut, limit, offset):
+        """Historique complet (relu depuis le CSV + journal), du plus récent au plus ancien"""
+        lignes = lire_lignes(self.suivi_emprunts.csv_path)
+        vues = [vue_emprunt(index, row) for index, row in enumerate(lignes)]
+        if statut:
+            vues = [vue for vue in vues if vue["statut"] == statut]
+        vues.reverse()
+        return len(vues), vues[offset:offset + limit]
+
+
+class SourceSQLite:
+    def __init__(self, data_dir):
+        self.db_path = os.path.join(data_dir, "irobot.db")
+        self.conn = None
+        self._data_version = None
+
+    def _connecter(self):
+        if self.conn is None and os.path.exists(self.db_path):
+            self.conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            self.conn.row_factory = sqlite3.Row
+        return self.conn
+
+    def rafraichir(self, cache):
+        conn = self._connecter()
+        if conn is None:
+            return False
+        # data_version change dès qu'une AUTRE connexion a validé une écriture
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return False
+        self._data_version = version
+
+        casiers = EtatCasiers()
+        for row in conn.execute("SELECT id_casier, etat FROM casiers ORDER BY id_casier"):
+            casiers.appliquer(dict(row))
+
+        emprunts = EtatEmprunts(cache.nb_recents)
+        emprunts.total = conn.execute("SELECT COALESCE(MAX(id), 0) FROM emprunts").fetchone()[0]
+        recents = conn.execute(
+            f"SELECT {COLONNES_EMPRUNTS} FROM emprunts ORDER BY id DESC LIMIT ?",
+            (cache.nb_recents,)
+        ).fetchall()
+        for row in reversed(recents):
+            emprunts.recents[row["id"] - 1] = vue_emprunt(row["id"] - 1, dict(row))
+        for row in conn.execute(
+            f"SELECT {COLONNES_EMPRUNTS} FROM emprunts WHERE statut = 'EN COURS' ORDER BY id"
+        ):
+            emprunts.en_cours[row["id"] - 1] = vue_emprunt(row["id"] - 1, dict(row))
+            emprunts.retards.ouvrir(row["id"] - 1, row["mail"], row["id_casier"], row["timestamp"])
+
+        cache.casiers, cache.emprunts = casiers, emprunts
+        return True
+
+    def page_emprunts(self, statut, limit, offset):
+        conn = self._connecter()
+        if conn is None:
+            return 0, []
+        filtre, params = ("WHERE statut = ?", (statut,)) if statut else ("", ())
+        total = conn.execute(f"SELECT COUNT(*) FROM emprunts {filtre}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT {COLONNES_EMPRUNTS} FROM emprunts {filtre} ORDER BY id DESC LIMIT ? OFFSET ?",
+            params + (limit, offset)
+        ).fetchall()
+        return total, [vue_emprunt(row["id"] - 1, dict(row)) for row in rows]
+
+
+class CacheDashboard:
+    """Point d'entrée du dashboard : données prêtes à afficher, rafraîchies à la demande"""
+
+    def __init__(self, data_dir, backend="csv", nb_recents=NB_EMPRUNTS_RECENTS):
+        self.nb_recents = nb_recents
+        self.casiers = EtatCasiers()
+        self.emprunts = EtatEmprunts(nb_recents)
+        self.version = 0  # Incrémentée à chaque changement visible
+        self._instance = format(int(time.time()), "x")  # Distingue les ETag d'un redémarrage à l'autre
+        self._source = SourceSQLite(data_dir) if backend == "sqlite" else SourceCSV(data_dir)
+        self._lock = threading.Lock()
+
+    def rafraichir(self):
+        with self._lock:
+            try:
+                if self._source.rafraichir(self):
+                    self.version += 1
+            except (OSError, sqlite3.Error) as e:
+                print(f"Erreur rafraîchissement du cache: {e}")
+            return self.version
+
+    def etag(self):
+        """Identifiant de la version des données (ETag de l'API)"""
+        return f"{self._instance}-{self.version}"
+
+    def liste_casiers(self):
+        return list(self.casiers.casiers.values())
+
+    def stats(self):
+        return dict(self.casiers.stats)
+
+    def emprunts_recents(self):
+        """Les derniers emprunts, du plus récent au plus ancien"""
+        return list(reversed(self.emprunts.recents.values()))
+
+    def emprunts_en_cours(self):
+        return list(self.emprunts.en_cours.values())
+
+    def emprunts_en_retard(self):
+        """Emprunts EN COURS depuis plus d'un jour (du plus ancien au plus récent)"""
+        return [self.emprunts.en_cours[retard.index] for retard in self.emprunts.retards.en_retard()
+                if retard.index in self.emprunts.en_cours]
+
+    def page_emprunts(self, statut=None, limit=50, offset=0):
+        """
+        Retourne (total, emprunts) du plus récent au plus ancien.
+        → EN COURS et les derniers emprunts sont servis depuis le cache
+        → Le reste de l'historique est lu à la demande
+        """
+        if statut == "EN COURS":
+            vues = list(reversed(self.emprunts.en_cours.values()))
+            return len(vues), vues[offset:offset + limit]
+        nb_recents = len(self.emprunts.recents)
+        if statut is None and (offset + limit <= nb_recents or nb_recents == self.emprunts.total):
+            return self.emprunts.total, self.emprunts_recents()[offset:offset + limit]
+        with self._lock:
+            return self._source.page_emprunts(statut, limit, offset)
@@ -0,0 +1,102 @@
+"""
+Benchmark des analyses d'emprunts (models/analyses.py).
+
+→ "reconstruction NumPy" : agrégats horaires et journaliers de tout l'historique (agreger_historique)
+→ "rejeu événement par événement" : le même historique passé à Analyses.emprunt / rendu, comme en service
+→ "série 30 jours" : lecture des agrégats par le dashboard (lire_agregats), à comparer à
+  "lecture de l'historique" (lire_table), le minimum qu'un calcul à la demande devrait payer
+
+Usage :
+    python3 benchmarks/bench_analyses.py [--emprunts 10000 100000] [--casiers 30]
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import analyses
+from models.analyses import Analyses, agreger_historique, lire_agregats
+from models.stockage import lire_table
+from models.journal import ecrire_csv
+
+FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def historique(nb_emprunts, nb_casiers, graine=1):
+    """Lignes d'emprunts (arrivées aux heures ouvrées, durées log-normales) et événements dans l'ordre"""
+    aleatoire = random.Random(graine)
+    instant = datetime(2025, 9, 1, 8, 0, 0)
+    lignes, evenements, retours = [], [], []  # retours : tas (fin, index)
+    while len(lignes) < nb_emprunts:
+        instant += timedelta(seconds=aleatoire.expovariate(1 / 300))
+        if not 8 <= instant.hour < 19:
+            instant = instant.replace(hour=8, minute=0, second=0) + timedelta(days=1)
+        while retours and retours[0][0] <= instant:
+            fin, index = heapq.heappop(retours)
+            lignes[index].update(statut='TERMINE', timestamp_fin=fin.strftime(FORMAT))
+            evenements.append(('rendu', index))
+        if len(retours) >= nb_casiers:
+            continue
+        fin = instant + timedelta(seconds=min(aleatoire.lognormvariate(8, 1), 7 * 86400))
+        lignes.append({'mail': f"u{len(lignes)}@epitech.eu", 'id_casier': 1, 'timestamp': instant.strftime(FORMAT),
+                       'statut': 'EN COURS', 'timestamp_fin': ''})
+        heapq.heappush(retours, (fin, len(lignes) - 1))
+        evenements.append(('emprunt', len(lignes) - 1))
+    return lignes, evenements
+
+
+def rejouer(lignes, evenements, nb_casiers, path):
+    analyses.INTERVALLE_SAUVEGARDE = 30.0
+    moteur = Analyses(path)
+    en_cours = 0
+    for type_evenement, index in evenements:
+        ligne = lignes[index]
+        if type_evenement == 'emprunt':
+            en_cours += 1
+            moteur.emprunt(ligne['timestamp'], nb_casiers - en_cours)
+        else:
+            en_cours -= 1
+            moteur.rendu(ligne['timestamp'], ligne['timestamp_fin'], nb_casiers - en_cours)
+    moteur.fermer()
+
+
+def chronometrer(fonction, repetitions=1):
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) / repetitions * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruction et lecture des agrégats d'emprunts")
+    parser.add_argument("--emprunts", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--casiers", type=int, default=30)
+    args = parser.parse_args()
+
+    agreger_historique(historique(10, args.casiers)[0], args.casiers)  # Import de NumPy hors mesure
+    print(f"{'emprunts':>8} | {'reconstruction NumPy':>20} | {'rejeu par événement':>19} | "
+          f"{'série 30 jours':>14} | {'lecture historique':>18}")
+    print("-" * 95)
+    for nb in args.emprunts:
+        lignes, evenements = historique(nb, args.casiers)
+        with tempfile.TemporaryDirectory() as dossier:
+            t_numpy = chronometrer(lambda: agreger_historique(lignes, args.casiers))
+            t_rejeu = chronometrer(lambda: rejouer(lignes, evenements, args.casiers, os.path.join(dossier, 'r.db')))
+            path = os.path.join(dossier, 'analyses.db')
+            moteur = Analyses(path)
+            moteur.reconstruire(lignes, args.casiers)
+            moteur.fermer()
+            t_serie = chronometrer(lambda: lire_agregats(path, 'jour', 30), 20)
+            ecrire_csv(os.path.join(dossier, 'emprunts.csv'), list(lignes[0]), lignes)
+            t_brut = chronometrer(lambda: lire_table('emprunts', dossier, backend='csv'), 3)
+        print(f"{nb:>8} | {t_numpy:>17.0f} ms | {t_rejeu:>16.0f} ms | {t_serie:>11.2f} ms | {t_brut:>15.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
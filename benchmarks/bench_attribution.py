@@ -0,0 +1,95 @@
+"""
+Benchmark de l'attribution des casiers (models/attribution.py).
+
+→ coût d'un choix : parcours de tous les casiers (ancien get_premier_libre) / ReserveCasiers
+→ usure : emprunts et rendus simulés (durées d'emprunt aléatoires), puis répartition des ouvertures
+  par casier selon la politique ("premier" use les petits numéros, "lru" répartit)
+
+Usage :
+    python3 benchmarks/bench_attribution.py [--casiers 15 150 1500] [--cycles 20000]
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.attribution import ReserveCasiers, statistiques_usure, POLITIQUES
+
+TAUX_OCCUPATION = 0.4  # Part moyenne des casiers empruntés
+
+
+def premier_par_parcours(etats):
+    """Ancien get_premier_libre : premier casier PLEIN dans l'ordre du fichier"""
+    for id_casier, etat in etats:
+        if etat.upper() == 'PLEIN':
+            return id_casier
+    return None
+
+
+def cout_choix(nb_casiers, repetitions):
+    """µs par choix, casiers de petit numéro tous empruntés (pire cas du parcours)"""
+    occupes = int(nb_casiers * 0.9)
+    etats = [(i, 'VIDE' if i <= occupes else 'PLEIN') for i in range(1, nb_casiers + 1)]
+    resultats = {}
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        premier_par_parcours(etats)
+    resultats['parcours'] = (time.perf_counter() - debut) / repetitions * 1e6
+    for politique in POLITIQUES:
+        reserve = ReserveCasiers(range(occupes + 1, nb_casiers + 1), politique)
+        debut = time.perf_counter()
+        for _ in range(repetitions):
+            reserve.choisir()
+        resultats[politique] = (time.perf_counter() - debut) / repetitions * 1e6
+    return resultats
+
+
+def usure(nb_casiers, cycles, politique, graine=1):
+    """Emprunts (durées exponentielles) et rendus, retourne la répartition des ouvertures"""
+    aleatoire = random.Random(graine)
+    reserve = ReserveCasiers(range(1, nb_casiers + 1), politique)
+    retours = []  # Tas (instant du rendu, casier)
+    instant = 0.0
+    for _ in range(cycles):
+        instant += aleatoire.expovariate(1.0)
+        while retours and retours[0][0] <= instant:
+            rendu = heapq.heappop(retours)[1]
+            reserve.ouverture(rendu)
+            reserve.liberer(rendu)
+        id_casier = reserve.choisir()
+        if id_casier is None:
+            continue
+        reserve.prendre(id_casier)
+        reserve.ouverture(id_casier)
+        heapq.heappush(retours, (instant + aleatoire.expovariate(1 / (nb_casiers * TAUX_OCCUPATION)), id_casier))
+    return statistiques_usure(reserve.usure)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coût du choix d'un casier et répartition de l'usure")
+    parser.add_argument("--casiers", type=int, nargs="+", default=[15, 150, 1500])
+    parser.add_argument("--cycles", type=int, default=20_000)
+    parser.add_argument("--repetitions", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"{'casiers':>7} | {'parcours (µs)':>13} | " + " | ".join(f"{p + ' (µs)':>12}" for p in POLITIQUES))
+    print("-" * 65)
+    for nb in args.casiers:
+        r = cout_choix(nb, args.repetitions)
+        print(f"{nb:>7} | {r['parcours']:>13.2f} | " + " | ".join(f"{r[p]:>12.2f}" for p in POLITIQUES))
+
+    nb = args.casiers[0]
+    print(f"\nUsure sur {nb} casiers, {args.cycles} emprunts (occupation moyenne {TAUX_OCCUPATION:.0%})")
+    print(f"{'politique':>9} | {'min':>6} | {'max':>6} | {'écart-type':>10} | {'max/moyenne':>11}")
+    print("-" * 55)
+    for politique in POLITIQUES:
+        s = usure(nb, args.cycles, politique)
+        print(f"{politique:>9} | {s['min']:>6} | {s['max']:>6} | {s['ecart_type']:>10.1f} | {s['max_sur_moyenne']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
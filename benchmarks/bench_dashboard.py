@@ -0,0 +1,78 @@
+"""
+Benchmark de l'affichage du dashboard selon la taille de l'historique d'emprunts.
+
+→ "relecture" : ancienne méthode, lire_table() de casiers + emprunts à chaque page
+→ "cache"     : CacheDashboard.rafraichir() après l'ajout d'un emprunt au journal
+                (seuls les octets ajoutés sont lus)
+
+Usage :
+    python3 benchmarks/bench_dashboard.py [--tailles 1000 10000 100000]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(RACINE)
+sys.path.append(os.path.join(RACINE, "DashBoard"))
+
+from models.stockage import lire_table
+from cache import CacheDashboard
+
+
+def generer_donnees(data_dir, nb_emprunts):
+    with open(os.path.join(data_dir, 'casiers.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id_casier', 'etat'])
+        for i in range(1, 16):
+            writer.writerow([i, 'PLEIN'])
+    with open(os.path.join(data_dir, 'emprunts.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['mail', 'id_casier', 'timestamp', 'statut'])
+        for i in range(nb_emprunts):
+            writer.writerow([f"etudiant{i % 300}@epitech.eu", i % 15 + 1, "2026-01-05 09:00:00", "TERMINE"])
+
+
+def ajouter_emprunt(data_dir, index):
+    """Simule un emprunt fait par le processus RFID (un événement dans le journal)"""
+    ligne = {'mail': 'bench@epitech.eu', 'id_casier': 1, 'timestamp': '2026-02-03 14:30:00', 'statut': 'EN COURS'}
+    with open(os.path.join(data_dir, 'emprunts.journal'), 'a') as f:
+        f.write(json.dumps({'op': 'set', 'index': index, 'ligne': ligne}) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coût d'un affichage du dashboard selon la taille de l'historique")
+    parser.add_argument("--tailles", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repetitions", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'emprunts':>10} | {'relecture (ms)':>14} | {'cache (ms)':>10}")
+    print("-" * 42)
+    for taille in args.tailles:
+        with tempfile.TemporaryDirectory() as data_dir:
+            generer_donnees(data_dir, taille)
+
+            debut = time.perf_counter()
+            for _ in range(args.repetitions):
+                lire_table("casiers", data_dir, "csv")
+                lire_table("emprunts", data_dir, "csv")[-10:]
+            relecture = (time.perf_counter() - debut) / args.repetitions
+
+            cache = CacheDashboard(data_dir, "csv")
+            cache.rafraichir()  # Chargement initial, hors mesure
+            debut = time.perf_counter()
+            for i in range(args.repetitions):
+                ajouter_emprunt(data_dir, taille + i)
+                cache.rafraichir()
+                cache.emprunts_recents()
+            incremental = (time.perf_counter() - debut) / args.repetitions
+
+            print(f"{taille:>10} | {relecture * 1000:>14.2f} | {incremental * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
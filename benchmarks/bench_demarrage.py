@@ -0,0 +1,99 @@
+"""
+Benchmark de démarrage de la couche modèles (temps d'import et mémoire résidente).
+
+Compare, dans des interpréteurs neufs :
+→ "avant"  : import de pandas + lecture des trois CSV en DataFrame (ancienne couche modèles)
+→ "après"  : import de models.stockage + chargement des managers (dict / __slots__)
+
+Le temps d'import est celui rapporté par `python -X importtime`, la mémoire est le pic RSS.
+
+Usage :
+    python3 benchmarks/bench_demarrage.py [--emprunts 5000]
+"""
+import argparse
+import csv
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "avant (pandas)": (
+        "import pandas as pd\n"
+        "for nom in ('utilisateurs', 'casiers', 'emprunts'):\n"
+        "    pd.read_csv(os.path.join(DATA_DIR, nom + '.csv'))\n"
+    ),
+    "après (modèles légers)": (
+        "from models.stockage import StockageCSV\n"
+        "StockageCSV(DATA_DIR)\n"
+        "assert 'pandas' not in sys.modules, 'pandas importé sur le chemin RFID'\n"
+        "assert 'numpy' not in sys.modules, 'numpy importé sur le chemin RFID'\n"
+    ),
+}
+
+MESURE = (
+    "import os, sys, resource, time\n"
+    "sys.path.insert(0, {racine!r})\n"
+    "DATA_DIR = {data_dir!r}\n"
+    "t0 = time.perf_counter()\n"
+    "{code}"
+    "print('TOTAL', time.perf_counter() - t0)\n"
+    "print('RSS', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+)
+
+
+def generer_donnees(data_dir, nb_emprunts):
+    with open(os.path.join(data_dir, 'utilisateurs.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['uid', 'mail', 'date_inscription'])
+        for i in range(300):
+            writer.writerow([1000000 + i, f"etudiant{i}@epitech.eu", "2026-01-05 09:00:00"])
+    with open(os.path.join(data_dir, 'casiers.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id_casier', 'etat'])
+        for i in range(1, 16):
+            writer.writerow([i, 'PLEIN'])
+    with open(os.path.join(data_dir, 'emprunts.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['mail', 'id_casier', 'timestamp', 'statut'])
+        for i in range(nb_emprunts):
+            writer.writerow([f"etudiant{i % 300}@epitech.eu", i % 15 + 1, "2026-01-05 09:00:00", "TERMINE"])
+
+
+def mesurer(code, data_dir):
+    """Lance un interpréteur neuf avec -X importtime et retourne (import µs, total s, RSS Mo)"""
+    script = MESURE.format(racine=RACINE, data_dir=data_dir, code=code)
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", script],
+                         capture_output=True, text=True, check=True)
+
+    # Somme des temps cumulés des imports de premier niveau
+    imports_us = 0
+    for ligne in res.stderr.splitlines():
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", ligne)
+        if m and not m.group(2):
+            imports_us += int(m.group(1))
+
+    valeurs = dict(ligne.split() for ligne in res.stdout.splitlines() if ligne.startswith(("TOTAL", "RSS")))
+    rss_ko = int(valeurs["RSS"])
+    return imports_us, float(valeurs["TOTAL"]), rss_ko / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps d'import et RSS au démarrage, avant/après")
+    parser.add_argument("--emprunts", type=int, default=5000, help="Taille de l'historique d'emprunts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        generer_donnees(data_dir, args.emprunts)
+        print(f"{'scénario':<24} | {'imports (ms)':>12} | {'total (ms)':>10} | {'RSS (Mo)':>8}")
+        print("-" * 64)
+        for nom, code in SCENARIOS.items():
+            imports_us, total_s, rss_mo = mesurer(code, data_dir)
+            print(f"{nom:<24} | {imports_us / 1000:>12.1f} | {total_s * 1000:>10.1f} | {rss_mo:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark du chemin "passage de carte" d'EmpruntManager.
+
+Mesure get_emprunt + get_casier_en_cours (ce que fait RFIDManager à chaque carte)
+sur des historiques de 1k à 1M lignes : la latence doit rester constante.
+
+Usage :
+    python3 benchmarks/bench_emprunts.py [--tailles 1000 10000 100000 1000000]
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.emprunt_manager import EmpruntManager
+
+NB_ACTIFS = 15  # Un emprunt EN COURS par casier
+
+
+def generer_historique(path, nb_lignes):
+    """Écrit un emprunts.csv de nb_lignes (dont NB_ACTIFS emprunts EN COURS en fin de fichier)"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['mail', 'id_casier', 'timestamp', 'statut'])
+        for i in range(nb_lignes - NB_ACTIFS):
+            writer.writerow([f"etudiant{i % 5000}@epitech.eu", i % 15 + 1, "2026-01-05 09:00:00", "TERMINE"])
+        for i in range(NB_ACTIFS):
+            writer.writerow([f"actif{i}@epitech.eu", i + 1, "2026-02-03 14:30:00", "EN COURS"])
+
+
+def mesurer(mgr, mails, repetitions):
+    """Retourne la latence moyenne (µs) d'une décision emprunt/rendu"""
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        mail = random.choice(mails)
+        if mgr.get_emprunt(mail):
+            mgr.get_casier_en_cours(mail)
+    return (time.perf_counter() - debut) / repetitions * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latence des lectures d'emprunts selon la taille de l'historique")
+    parser.add_argument("--tailles", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repetitions", type=int, default=20_000)
+    args = parser.parse_args()
+
+    mails = [f"actif{i}@epitech.eu" for i in range(NB_ACTIFS)] + [f"inconnu{i}@epitech.eu" for i in range(NB_ACTIFS)]
+
+    print(f"{'lignes':>10} | {'chargement (s)':>14} | {'passage (µs)':>12}")
+    print("-" * 44)
+    with tempfile.TemporaryDirectory() as tmp:
+        for taille in args.tailles:
+            path = os.path.join(tmp, f"emprunts_{taille}.csv")
+            generer_historique(path, taille)
+
+            debut = time.perf_counter()
+            mgr = EmpruntManager(csv_path=path)
+            chargement = time.perf_counter() - debut
+
+            latence = mesurer(mgr, mails, args.repetitions)
+            print(f"{taille:>10} | {chargement:>14.3f} | {latence:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark du rendu des mails de rappel individuels.
+
+→ "re.sub"      : ancienne méthode, injection par expression régulière sur tout le HTML
+                  puis MIMEMultipart + MIMEText sérialisés par le module email
+→ "précompilé"  : ModeleMail (smtp/gabarit.py), template découpé une fois, mail produit en octets
+
+Aucun mail n'est envoyé : seul le rendu (octets prêts pour SMTP) est mesuré.
+
+Usage :
+    python3 benchmarks/bench_gabarit.py [--messages 10000]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from html import escape
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(RACINE)
+
+from smtp.smtp_server import FROM_EMAIL, PLAIN_TEXT, SUJET, charger_template, creer_modele
+
+
+def injecter(html, id_span, texte):
+    """Ancienne injection : re.sub sur le HTML complet"""
+    texte = escape(texte).replace('\n', '<br>')
+    return re.sub(
+        r'(<span[^>]*id=["\']' + re.escape(id_span) + r'["\'][^>]*>).*?(</span>)',
+        lambda m: m.group(1) + texte + m.group(2),
+        html,
+        flags=re.IGNORECASE | re.DOTALL
+    )
+
+
+def rendre_ancien(html_template, destinataire, valeurs):
+    message = MIMEMultipart("alternative")
+    message["Subject"] = SUJET
+    message["From"] = FROM_EMAIL
+    message["To"] = destinataire
+    message.attach(MIMEText(PLAIN_TEXT.format(**valeurs), "plain", "utf-8"))
+    html_content = injecter(html_template, "rappel-phrase", valeurs["phrase"])
+    html_content = injecter(html_content, "rappel-details", valeurs["details"])
+    message.attach(MIMEText(html_content, "html", "utf-8"))
+    return message.as_bytes()
+
+
+def destinataires(nb_messages):
+    for i in range(nb_messages):
+        yield f"etudiant{i}@epitech.eu", {
+            "phrase": "Il faudrait que tu ramènes le câble HDMI.",
+            "details": f"Tu as emprunté le câble du casier n°{i % 15 + 1} il y a {i % 9 + 2} jours.",
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coût du rendu de mails individuels")
+    parser.add_argument("--messages", type=int, default=10_000)
+    args = parser.parse_args()
+
+    html_template = charger_template()
+
+    debut = time.perf_counter()
+    octets_ancien = sum(len(rendre_ancien(html_template, mail, valeurs)) for mail, valeurs in destinataires(args.messages))
+    ancien = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    modele = creer_modele(html_template)  # Compilation comprise dans la mesure
+    octets = sum(len(modele.rendre(mail, valeurs)) for mail, valeurs in destinataires(args.messages))
+    precompile = time.perf_counter() - debut
+
+    print(f"{args.messages} messages")
+    print(f"{'méthode':>12} | {'total (ms)':>10} | {'par mail (µs)':>13} | {'Mo produits':>11}")
+    print("-" * 56)
+    for nom, duree, taille in (("re.sub", ancien, octets_ancien), ("précompilé", precompile, octets)):
+        print(f"{nom:>12} | {duree * 1000:>10.1f} | {duree / args.messages * 1e6:>13.1f} | {taille / 1e6:>11.2f}")
+    print(f"Gain : x{ancien / precompile:.1f}")
+
+
+if __name__ == "__main__":
+    main()
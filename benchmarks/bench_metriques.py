@@ -0,0 +1,78 @@
+"""
+Benchmark du coût des métriques (metriques.py) sur le chemin d'un passage de carte.
+
+→ "inc"              : compteur sans étiquette
+→ "observer"         : histogramme sans étiquette
+→ "avec().observer"  : histogramme étiquetté, série recherchée à chaque mesure
+→ "série gardée"     : histogramme étiquetté, série obtenue une fois (comme SessionSerie)
+→ "perf_counter x2"  : deux lectures d'horloge, le minimum pour chronométrer une étape
+→ "exposer"          : rendu texte complet d'un registre chargé (un scrape /metrics)
+
+Usage :
+    python3 benchmarks/bench_metriques.py [--iterations 1000000] [--threads 1 4]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metriques import Registre, Compteur, Histogramme
+
+
+def chronometrer(fonction, iterations, nb_threads):
+    """Nanosecondes par appel, mesurées sur le mur (nb_threads threads appellent en parallèle)"""
+    par_thread = iterations // nb_threads
+
+    def boucle():
+        for _ in range(par_thread):
+            fonction()
+
+    threads = [threading.Thread(target=boucle) for _ in range(nb_threads)]
+    debut = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (time.perf_counter() - debut) / (par_thread * nb_threads) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coût d'enregistrement des métriques")
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    registre = Registre()
+    compteur = registre.enregistrer(Compteur("bench_total", "bench"))
+    histo = registre.enregistrer(Histogramme("bench_secondes", "bench"))
+    histo_port = registre.enregistrer(Histogramme("bench_port_secondes", "bench", etiquettes=("port",)))
+    serie = histo_port.avec("/dev/ttyACM0")
+    horloge = time.perf_counter
+
+    cas = [
+        ("inc", compteur.inc),
+        ("observer", lambda: histo.observer(0.012)),
+        ("avec().observer", lambda: histo_port.avec("/dev/ttyACM0").observer(0.012)),
+        ("série gardée", lambda: serie.observer(0.012)),
+        ("perf_counter x2", lambda: horloge() - horloge()),
+    ]
+
+    print(f"{args.iterations} appels par mesure")
+    print(f"{'opération':>18} | " + " | ".join(f"{f'{n} thread(s)':>13}" for n in args.threads))
+    print("-" * (21 + 16 * len(args.threads)))
+    for nom, fonction in cas:
+        mesures = [chronometrer(fonction, args.iterations, n) for n in args.threads]
+        print(f"{nom:>18} | " + " | ".join(f"{m:>10.0f} ns" for m in mesures))
+
+    for i in range(50):
+        histo_port.avec(f"/dev/ttyACM{i}").observer(0.01 * i)
+    debut = time.perf_counter()
+    texte = registre.exposer()
+    print(f"exposer : {len(texte.splitlines())} lignes en {(time.perf_counter() - debut) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
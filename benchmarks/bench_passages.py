@@ -0,0 +1,120 @@
+"""
+Benchmark de charge de la borne complète, sur matériel simulé (hardware/simulation.py).
+
+N passages de carte par minute traversent RFIDManager (boucle de lecture, anti-rebond, pipeline,
+stockage réel, Arduino factice sur pty, LCD en mémoire). Pour chaque débit :
+→ latence passage -> ouverture (carte présentée -> acquittement du relais) : p50 / p95 / p99
+→ pic : ouvertures dans la meilleure fenêtre glissante de 10 s (ou de la durée du test), ramenées à la minute
+
+Chaque utilisateur alterne emprunt et rendu (un utilisateur par casier). L'anti-rebond est réduit
+à FENETRE_BENCH : les passages scriptés sont tous de vrais passages.
+
+Usage :
+    python3 benchmarks/bench_passages.py [--taux 60 300 600 1200] [--duree 20] [--casiers 15] [--delai-relais 0.05]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from hardware.simulation import creer_borne_simulee
+
+FENETRE_BENCH = 0.1
+FENETRE_PIC = 10.0
+
+
+def centile(valeurs, p):
+    if not valeurs:
+        return float("nan")
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(round(p / 100 * (len(valeurs) - 1))))]
+
+
+def pic_par_minute(instants, fenetre=FENETRE_PIC):
+    """Maximum d'événements dans une fenêtre glissante de `fenetre` secondes, ramené à la minute"""
+    instants = sorted(instants)
+    pic, debut = 0, 0
+    for fin, instant in enumerate(instants):
+        while instant - instants[debut] > fenetre:
+            debut += 1
+        pic = max(pic, fin - debut + 1)
+    return pic * 60 / fenetre
+
+
+def mesurer(taux, duree, nb_casiers, delai_relais, backend):
+    utilisateurs = {str(100000 + i): f"etudiant{i}@epitech.eu" for i in range(nb_casiers)}
+    uids = list(utilisateurs)
+    nb_passages = max(1, int(taux * duree / 60))
+    intervalle = 60 / taux
+    script = [(i * intervalle, uids[i % len(uids)]) for i in range(nb_passages)]
+
+    latences, ouvertures, echecs = [], [], [0]
+    with tempfile.TemporaryDirectory() as data_dir, contextlib.redirect_stdout(io.StringIO()):
+        manager, simulation = creer_borne_simulee(data_dir, nb_casiers, utilisateurs, delai_relais, backend)
+        manager.anti_rebond.fenetre = FENETRE_BENCH
+        reader = manager.reader
+
+        def observer(op, ok):
+            if ok:
+                latences.append(op.t_fin - reader.presentation(op.uid, op.t_lecture))
+                ouvertures.append(op.t_fin)
+            else:
+                echecs[0] += 1
+
+        manager.pipeline.observateur = observer
+        boucle = threading.Thread(target=manager.run, name="rfid", daemon=True)
+        boucle.start()
+        manager.reader.programmer(script)
+
+        limite = time.monotonic() + duree + 30
+        while time.monotonic() < limite and (manager.reader.restantes() or manager.pipeline.en_cours()):
+            time.sleep(0.05)
+        time.sleep(0.2)
+        manager.arreter()
+        boucle.join(timeout=5)
+        simulation.fermer()
+
+    return {
+        "passages": nb_passages,
+        "ouvertures": len(latences),
+        "ignores": nb_passages - len(latences) - echecs[0],
+        "echecs": echecs[0],
+        "p50": centile(latences, 50),
+        "p95": centile(latences, 95),
+        "p99": centile(latences, 99),
+        "pic": pic_par_minute(ouvertures, min(FENETRE_PIC, duree)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latence passage -> ouverture et débit de la borne simulée")
+    parser.add_argument("--taux", type=int, nargs="+", default=[60, 300, 600, 1200], help="passages par minute")
+    parser.add_argument("--duree", type=float, default=20, help="secondes de passages par débit")
+    parser.add_argument("--casiers", type=int, default=15)
+    parser.add_argument("--delai-relais", type=float, default=0.05, help="secondes avant l'acquittement de l'Arduino")
+    parser.add_argument("--backend", choices=("csv", "sqlite"), default="csv")
+    args = parser.parse_args()
+
+    print(f"{args.casiers} casiers, relais {args.delai_relais * 1000:.0f} ms, stockage {args.backend}, "
+          f"{args.duree:.0f} s par débit")
+    print(f"{'passages/min':>12} | {'ouvertures':>10} | {'ignorés':>7} | {'échecs':>6} | "
+          f"{'p50 (ms)':>8} | {'p95 (ms)':>8} | {'p99 (ms)':>8} | {'pic/min':>7}")
+    print("-" * 90)
+    pic_max = 0
+    for taux in args.taux:
+        r = mesurer(taux, args.duree, args.casiers, args.delai_relais, args.backend)
+        pic_max = max(pic_max, r["pic"])
+        print(f"{taux:>12} | {r['ouvertures']:>10} | {r['ignores']:>7} | {r['echecs']:>6} | "
+              f"{r['p50'] * 1000:>8.1f} | {r['p95'] * 1000:>8.1f} | {r['p99'] * 1000:>8.1f} | {r['pic']:>7.0f}")
+    print(f"Pic observé : {pic_max:.0f} ouvertures/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Configuration centrale d'iRobot.
+
+Chaque paramètre est déclaré une seule fois (type, valeur par défaut, bornes) dans PARAMETRES.
+Priorité : valeur par défaut < fichier data/config.json (ou IROBOT_CONFIG) < variable d'environnement
+(IROBOT_<NOM> : IROBOT_POLL_INTERVAL, IROBOT_SERIAL_PORT... ; noms historiques pour SMTP_* et IROBOT_STORAGE).
+    {"poll_interval": 0.2, "volume": 0.8, "serial_port": "/dev/ttyACM1"}
+
+Les paramètres "rechargeables" (latences, délais, volume) changent à chaud, sans redémarrer la
+boucle RFID : kill -HUP <pid>, ou simple modification du fichier (surveillé). Les autres sont lus
+au démarrage : une modification est signalée mais demande un redémarrage.
+Une configuration invalide est refusée en entier (au démarrage : erreur ; au rechargement : l'ancienne est gardée).
+"""
+import json
+import os
+import signal
+import threading
+
+RACINE = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(RACINE, 'data', 'config.json')
+INTERVALLE_SURVEILLANCE = 2.0  # Secondes entre deux vérifications de la date du fichier
+
+
+class ErreurConfig(ValueError):
+    pass
+
+
+def _booleen(valeur):
+    if isinstance(valeur, bool):
+        return valeur
+    texte = str(valeur).strip().lower()
+    if texte in ('1', 'true', 'oui', 'yes', 'on'):
+        return True
+    if texte in ('0', 'false', 'non', 'no', 'off'):
+        return False
+    raise ValueError(f"booléen attendu, reçu {valeur!r}")
+
+
+def _entier(valeur):
+    """Accepte 39, "39" ou "0x27" (adresses I2C)"""
+    if isinstance(valeur, bool):
+        raise ValueError("entier attendu")
+    return valeur if isinstance(valeur, int) else int(str(valeur), 0)
+
+
+CONVERSIONS = {int: _entier, float: float, str: str, bool: _booleen}
+
+
+class Parametre:
+    __slots__ = ('type', 'defaut', 'env', 'rechargeable', 'minimum', 'maximum', 'choix')
+
+    def __init__(self, type, defaut, env=None, rechargeable=False, minimum=None, maximum=None, choix=None):
+        self.type = type
+        self.defaut = defaut
+        self.env = env
+        self.rechargeable = rechargeable
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choix = choix
+
+    def convertir(self, nom, valeur):
+        try:
+            valeur = CONVERSIONS[self.type](valeur)
+        except (TypeError, ValueError) as e:
+            raise ErreurConfig(f"{nom} : {self.type.__name__} attendu ({e})")
+        if self.minimum is not None and valeur < self.minimum:
+            raise ErreurConfig(f"{nom} : {valeur} < minimum {self.minimum}")
+        if self.maximum is not None and valeur > self.maximum:
+            raise ErreurConfig(f"{nom} : {valeur} > maximum {self.maximum}")
+        if self.choix is not None and valeur not in self.choix:
+            raise ErreurConfig(f"{nom} : {valeur!r} n'est pas parmi {', '.join(map(str, self.choix))}")
+        return valeur
+
+
+PARAMETRES = {
+    # Arduino
+    'serial_port': Parametre(str, '/dev/ttyACM0'),
+    'baud_rate': Parametre(int, 9600, choix=(9600, 19200, 38400, 57600, 115200)),
+    'reset_delay': Parametre(float, 2.5, minimum=0),
+    'ack_timeout': Parametre(float, 2.0, rechargeable=True, minimum=0.1),
+    'delai_actionnement': Parametre(float, 10.0, rechargeable=True, minimum=0.5),
+    # Lecteur RFID
+    'poll_interval': Parametre(float, 0.25, rechargeable=True, minimum=0.01, maximum=5),
+    'fenetre_rebond': Parametre(float, 3.0, rechargeable=True, minimum=0, maximum=60),
+    'association_timeout': Parametre(float, 20.0, rechargeable=True, minimum=1),
+    # LCD
+    'lcd_i2c_address': Parametre(int, 0x27, minimum=0x03, maximum=0x77),
+    'lcd_i2c_port': Parametre(int, 1, minimum=0),
+    # Haut-parleur
+    'volume': Parametre(float, 1.0, rechargeable=True, minimum=0, maximum=1),
+    'volume_systeme': Parametre(int, 80, rechargeable=True, minimum=0, maximum=100),
+    # Stockage
+    'stockage': Parametre(str, 'csv', env='IROBOT_STORAGE', choix=('csv', 'sqlite')),
+    'attribution': Parametre(str, 'lru', choix=('premier', 'lru', 'proche')),
+    # Mails
+    'smtp_server': Parametre(str, 'smtp-relay.brevo.com', env='SMTP_SERVER'),
+    'smtp_port': Parametre(int, 587, env='SMTP_PORT', minimum=1, maximum=65535),
+    'smtp_user': Parametre(str, '9c33ff001@smtp-brevo.com', env='SMTP_USER'),
+    'smtp_pass': Parametre(str, '', env='SMTP_PASS'),
+    'smtp_starttls': Parametre(bool, True, env='SMTP_STARTTLS'),
+    # Applications web
+    'web_port': Parametre(int, 5000, minimum=1, maximum=65535),
+    'dashboard_port': Parametre(int, 5010, minimum=1, maximum=65535),
+}
+
+
+def lire_valeurs(path, environ=None):
+    """Valeurs validées de tous les paramètres (ErreurConfig si le fichier ou une valeur est invalide)"""
+    environ = os.environ if environ is None else environ
+    fichier = {}
+    if os.path.exists(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                fichier = json.load(f)
+        except ValueError as e:
+            raise ErreurConfig(f"{path} : JSON invalide ({e})")
+        if not isinstance(fichier, dict):
+            raise ErreurConfig(f"{path} : un objet JSON est attendu")
+        inconnus = set(fichier) - set(PARAMETRES)
+        if inconnus:
+            raise ErreurConfig(f"{path} : paramètre(s) inconnu(s) {', '.join(sorted(inconnus))}")
+
+    valeurs = {}
+    for nom, parametre in PARAMETRES.items():
+        valeur = fichier.get(nom, parametre.defaut)
+        env = parametre.env or f"IROBOT_{nom.upper()}"
+        if env in environ:
+            valeur = environ[env]
+        valeurs[nom] = parametre.convertir(nom, valeur)
+    return valeurs
+
+
+class Config:
+    """Valeurs courantes (config.poll_interval, ...), rechargeables à chaud"""
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('IROBOT_CONFIG', CONFIG_PATH)
+        self._valeurs = lire_valeurs(self.path)
+        self._mtime = self._date_fichier()
+        self._abonnes = []
+        self._lock = threading.Lock()
+        self._demande = threading.Event()
+        self._surveillance = None
+
+    def __getattr__(self, nom):
+        try:
+            return self.__dict__['_valeurs'][nom]
+        except KeyError:
+            raise AttributeError(nom)
+
+    def valeurs(self):
+        return dict(self._valeurs)
+
+    def _date_fichier(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def abonner(self, callback):
+        """callback(modifies) après chaque rechargement : {nom: nouvelle valeur} des paramètres rechargeables"""
+        self._abonnes.append(callback)
+
+    def recharger(self):
+        """Relit fichier et environnement, applique les paramètres rechargeables. Retourne ceux qui ont changé"""
+        with self._lock:
+            self._mtime = self._date_fichier()
+            try:
+                nouvelles = lire_valeurs(self.path)
+            except ErreurConfig as e:
+                print(f"⚠ Configuration invalide, rechargement ignoré : {e}")
+                return {}
+            modifies = {}
+            for nom, valeur in nouvelles.items():
+                if valeur == self._valeurs[nom]:
+                    continue
+                if PARAMETRES[nom].rechargeable:
+                    modifies[nom] = valeur
+                else:
+                    print(f"⚠ {nom} modifié : pris en compte au prochain redémarrage")
+            self._valeurs = dict(self._valeurs, **modifies)
+
+        if modifies:
+            print(f"✓ Configuration rechargée : {', '.join(f'{nom}={valeur}' for nom, valeur in modifies.items())}")
+        for callback in self._abonnes:
+            try:
+                callback(modifies)
+            except Exception as e:
+                print(f"Erreur lors de l'application de la configuration: {e}")
+        return modifies
+
+    def surveiller(self, intervalle=INTERVALLE_SURVEILLANCE, sighup=True):
+        """
+        Recharge quand le fichier change, ou sur SIGHUP (à appeler depuis le thread principal).
+        Le gestionnaire de signal ne fait que réveiller le thread de surveillance.
+        """
+        if sighup and hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda *_: self._demande.set())
+        if self._surveillance is None:
+            self._surveillance = threading.Thread(target=self._boucle, args=(intervalle,),
+                                                  name="config", daemon=True)
+            self._surveillance.start()
+        return self
+
+    def _boucle(self, intervalle):
+        precedente = self._mtime
+        while True:
+            demande = self._demande.wait(intervalle)
+            self._demande.clear()
+            date = self._date_fichier()
+            # Fichier modifié et stable depuis un tour : jamais relu pendant son écriture
+            if demande or (date != self._mtime and date == precedente):
+                self.recharger()
+            precedente = date
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def obtenir_config():
+    """Configuration du processus (chargée au premier appel)"""
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = Config()
+        return _config
@@ -1,86 +1,322 @@
 import serial
 import time
 import sys
-import os
 import threading
+import queue
+from collections import deque
+import metriques
 from hardware.speaker import Speaker
+from config import obtenir_config
 
-SERIAL_PORT = '/dev/ttyACM0' 
-BAUD_RATE = 9600 
+_config = obtenir_config()
+SERIAL_PORT = _config.serial_port
+BAUD_RATE = _config.baud_rate
 MAX_CHANNEL = 14
+RESET_DELAY = _config.reset_delay   # L'Arduino redémarre à l'ouverture du port
+ACK_TIMEOUT = _config.ack_timeout   # Délai max d'acquittement d'une commande (valeur initiale, rechargeable)
+RECONNECT_DELAY = 1.0   # Attente entre deux tentatives de reconnexion
+READ_TIMEOUT = 0.1      # Timeout de readline (réactivité du thread lecteur)
+
+ALLER_RETOUR = metriques.histogramme("irobot_serie_aller_retour_secondes",
+                                     "Octet de canal écrit -> acquittement de l'Arduino", etiquettes=("port",))
+SANS_ACQUITTEMENT = metriques.compteur("irobot_serie_sans_acquittement_total",
+                                       "Commandes expirées sans réponse de l'Arduino", etiquettes=("port",))
+
+
+class Commande:
+    """Commande envoyée à l'Arduino, résolue par son acquittement"""
+
+    def __init__(self, channel, on_ack=None):
+        self.channel = channel
+        self.on_ack = on_ack
+        self.reponse = None
+        self.t_creation = time.monotonic()
+        self.t_envoi = None
+        self.t_ack = None
+        self._event = threading.Event()
+        self._a_la_fin = []
+        self._fin_lock = threading.Lock()
+
+    def _resoudre(self, reponse):
+        self.reponse = reponse
+        self.t_ack = time.monotonic()
+        if reponse is not None and self.on_ack:
+            self._appeler(self.on_ack)  # Avant de signaler la fin : qui attend la commande voit ses effets (usure)
+        with self._fin_lock:
+            self._event.set()
+            callbacks, self._a_la_fin = self._a_la_fin, []
+        for callback in callbacks:
+            self._appeler(callback)
+
+    def _appeler(self, callback):
+        try:
+            callback(self)
+        except Exception as e:
+            print(f"Erreur callback fin de commande: {e}")
+
+    def quand_terminee(self, callback):
+        """Appelle callback(commande) une fois la commande acquittée, expirée ou annulée"""
+        with self._fin_lock:
+            if not self._event.is_set():
+                self._a_la_fin.append(callback)
+                return
+        self._appeler(callback)
+
+    def attendre(self, timeout=None):
+        """Attend l'acquittement, retourne True si l'Arduino a répondu"""
+        return self._event.wait(timeout) and self.reponse is not None
+
+    @property
+    def terminee(self):
+        return self._event.is_set()
+
+    @property
+    def latence(self):
+        """Temps entre la demande et l'acquittement (en secondes)"""
+        if self.t_ack is None:
+            return None
+        return self.t_ack - self.t_creation
+
+
+class SessionSerie:
+    """
+    Connexion série persistante avec l'Arduino.
+    → Le reset (2.5 s) n'est payé qu'une fois, à la connexion
+    → Un thread écrivain vide la file des commandes
+    → Un thread lecteur associe chaque réponse à la plus ancienne commande en attente
+    → Reconnexion automatique si l'USB est débranché
+    """
+
+    def __init__(self, port=SERIAL_PORT, baud_rate=BAUD_RATE, reset_delay=RESET_DELAY,
+                 ack_timeout=ACK_TIMEOUT, max_channel=MAX_CHANNEL):
+        self.port = port
+        self.baud_rate = baud_rate
+        self.reset_delay = reset_delay
+        self.ack_timeout = ack_timeout
+        self.max_channel = max_channel
+        self._aller_retour = ALLER_RETOUR.avec(port)
+        self._sans_acquittement = SANS_ACQUITTEMENT.avec(port)
+
+        self._ser = None
+        self._lock = threading.Lock()
+        self._connecte = threading.Event()
+        self._file = queue.Queue()
+        self._en_attente = deque()
+        self._en_attente_lock = threading.Lock()
+        self._actif = False
+        self._writer = None
+        self._reader = None
+
+    @property
+    def connecte(self):
+        return self._connecte.is_set()
+
+    def start(self):
+        """Démarre les threads écrivain et lecteur"""
+        if self._actif:
+            return
+        self._actif = True
+        self._writer = threading.Thread(target=self._writer_loop, name=f"arduino-writer {self.port}", daemon=True)
+        self._reader = threading.Thread(target=self._reader_loop, name=f"arduino-reader {self.port}", daemon=True)
+        self._writer.start()
+        self._reader.start()
+
+    def stop(self):
+        """Arrête les threads et ferme le port"""
+        if not self._actif:
+            return
+        self._actif = False
+        self._file.put(None)
+        if self._writer:
+            self._writer.join(timeout=1)
+        if self._reader:
+            self._reader.join(timeout=1)
+        self._deconnecter()
+        with self._en_attente_lock:
+            while self._en_attente:
+                self._en_attente.popleft()._resoudre(None)
+
+    def envoyer(self, channel, on_ack=None):
+        """Met une commande en file et retourne immédiatement"""
+        if channel < 0 or channel > self.max_channel:
+            raise ValueError(f"Le canal {channel} est hors limites (0 à {self.max_channel}).")
+        commande = Commande(channel, on_ack)
+        self._file.put(commande)
+        return commande
+
+    def _connecter(self):
+        """Ouvre le port et attend le reset de l'Arduino (une seule fois)"""
+        try:
+            ser = serial.Serial(self.port, self.baud_rate, timeout=READ_TIMEOUT)
+            time.sleep(self.reset_delay)
+            ser.reset_input_buffer()
+        except (serial.SerialException, OSError) as e:
+            print(f"Erreur de communication série: {e}")
+            print("Vérifiez le port et la connexion USB.")
+            return False
+
+        with self._lock:
+            self._ser = ser
+        self._connecte.set()
+        print(f"Connexion établie sur {self.port}")
+        return True
+
+    def _deconnecter(self):
+        self._connecte.clear()
+        with self._lock:
+            ser, self._ser = self._ser, None
+        if ser is not None:
+            try:
+                ser.close()
+                print("Port série fermé.")
+            except Exception:
+                pass
+
+    def _writer_loop(self):
+        commande = None
+        while self._actif:
+            if not self.connecte:
+                if not self._connecter():
+                    time.sleep(RECONNECT_DELAY)
+                    continue
+
+            if commande is None:
+                try:
+                    commande = self._file.get(timeout=RECONNECT_DELAY)
+                except queue.Empty:
+                    continue
+                if commande is None:
+                    break
+
+            commande.t_envoi = time.monotonic()
+            with self._en_attente_lock:
+                self._en_attente.append(commande)
+            try:
+                with self._lock:
+                    self._ser.write(bytes([commande.channel]))
+                    self._ser.flush()  # Force l'envoi immédiat
+                print(f"Envoi ({self.port}) : Canal {commande.channel} -> Relais {commande.channel + 1}")
+                commande = None
+            except (serial.SerialException, OSError, AttributeError) as e:
+                # USB débranché : on garde la commande pour la renvoyer après reconnexion
+                print(f"Erreur d'écriture série: {e}")
+                with self._en_attente_lock:
+                    if commande in self._en_attente:
+                        self._en_attente.remove(commande)
+                self._deconnecter()
+
+    def _reader_loop(self):
+        while self._actif:
+            if not self._connecte.wait(timeout=READ_TIMEOUT):
+                continue
+            try:
+                ser = self._ser
+                if ser is None:
+                    continue
+                ligne = ser.readline()
+            except (serial.SerialException, OSError, TypeError) as e:
+                if self._actif:
+                    print(f"Erreur de lecture série: {e}")
+                    self._deconnecter()
+                continue
+
+            self._expirer()
+            reponse = ligne.decode('utf-8', errors='ignore').strip()
+            if reponse:
+                print(f"Arduino -> {reponse}")
+                self._acquitter(reponse)
+
+    def _acquitter(self, reponse):
+        """Associe la réponse à la plus ancienne commande en attente"""
+        with self._en_attente_lock:
+            if not self._en_attente:
+                return
+            commande = self._en_attente.popleft()
+        commande._resoudre(reponse)
+        self._aller_retour.observer(commande.t_ack - commande.t_envoi)
+
+    def _expirer(self):
+        """Abandonne les commandes restées sans réponse au-delà du timeout"""
+        limite = time.monotonic() - self.ack_timeout
+        with self._en_attente_lock:
+            while self._en_attente and self._en_attente[0].t_envoi < limite:
+                commande = self._en_attente.popleft()
+                print(f"⚠ Pas d'acquittement pour le canal {commande.channel}")
+                self._sans_acquittement.inc()
+                commande._resoudre(None)
+
 
 def send_relay_command(channel, lcd=None, casier_id=None, speaker=None):
-    """Initialise la communication série et envoie le numéro de canal."""
+    """Ouvre une session ponctuelle et envoie le numéro de canal (usage en ligne de commande)."""
+    session = SessionSerie()
     try:
-        if channel < 0 or channel > MAX_CHANNEL:
-            print(f"Erreur: Le canal {channel} est hors limites (0 à {MAX_CHANNEL}).")
-            return
-        
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=2)   
-        time.sleep(2.5)
-        
-        ser.reset_input_buffer()
-        
-        print(f"Connexion établie sur {SERIAL_PORT}")
-        print(f"Envoi : Canal {channel} -> Relais {channel + 1}")
-                
-        if speaker and casier_id:
-            audio_path = os.path.join(os.path.dirname(__file__), "..", "audio", f"audio_{casier_id}.mp3")
-            if os.path.exists(audio_path):
-                print(f"🔊 Lecture du son pour le casier {casier_id}")
-                threading.Thread(target=speaker.play_sound, args=(audio_path, 3), daemon=True).start()
-            else:
-                print(f"⚠ Fichier audio introuvable: {audio_path}")
-
-        ser.write(bytes([channel]))
-        ser.flush()  # Force l'envoi immédiat
-        
-        
-        time.sleep(0.3)
-        while ser.in_waiting > 0:
-            response = ser.readline().decode('utf-8', errors='ignore').strip()
-            if response:
-                print(f"Arduino -> {response}")
-                
-                if lcd and casier_id:
-                    lcd.write_temporary(f"Casier {casier_id}", "ouvert", 4)
-
-    except serial.SerialException as e:
-        print(f"Erreur de communication série: {e}")
-        print("Vérifiez le port et la connexion USB.")
-    except FileNotFoundError:
-        print(f"Erreur: Le port {SERIAL_PORT} est introuvable.")
-    except Exception as e:
-        print(f"Erreur inattendue: {e}")
+        session.start()
+        commande = session.envoyer(channel)
+        if not commande.attendre(RESET_DELAY + ACK_TIMEOUT + 1):
+            print("Aucune réponse de l'Arduino.")
+        elif lcd and casier_id:
+            lcd.write_temporary(f"Casier {casier_id}", "ouvert", 4)
+        return commande
+    except ValueError as e:
+        print(f"Erreur: {e}")
     finally:
-        if 'ser' in locals() and ser.is_open:
-            ser.close()
-            print("Port série fermé.\n")
+        session.stop()
+
 
 class ArduinoComm:
-    def __init__(self, lcd=None, speaker=None):
-        self.serial_port = SERIAL_PORT
-        self.baud_rate = BAUD_RATE
+    def __init__(self, lcd=None, speaker=None, port=SERIAL_PORT, baud_rate=BAUD_RATE, flotte=None):
+        from hardware.flotte import charger_flotte
+
+        self.serial_port = port
+        self.baud_rate = baud_rate
         self.lcd = lcd
-        self.speaker = speaker or Speaker(volume=1.0, system_volume=80)
-    
+        self.usure = None  # Réserve des casiers (models/attribution.py) : ouvertures comptées à l'acquittement
+        self.speaker = speaker or Speaker(volume=_config.volume, system_volume=_config.volume_systeme)
+        # Un ou plusieurs bancs (data/flotte.json), une session série par port
+        self.flotte = (flotte or charger_flotte(port=port, baud_rate=baud_rate)).start()
+
+    def _jouer_audio(self, casier_id):
+        if self.speaker:
+            self.speaker.annoncer_casier(casier_id)  # Annonce préchargée, jouée par le thread audio
+
+    def _on_ack(self, id_casier):
+        def callback(commande):
+            print(f"✓ Casier {id_casier} ouvert en {commande.latence * 1000:.0f} ms")
+            if self.usure is not None:
+                self.usure.ouverture(id_casier)
+            if self.lcd:
+                self.lcd.write_temporary(f"Casier {id_casier}", "ouvert", 4)  # Non bloquant
+        return callback
+
     def envoyer_commande(self, id_casier, action):
-        """Envoie une commande à l'Arduino pour contrôler un casier"""
+        """Envoie une commande à l'Arduino pour contrôler un casier (non bloquant)"""
         try:
             id_int = int(id_casier)
-            
-            channel = id_int - 1
-            
+
+            banc, channel = self.flotte.route(id_int)
+
             if action.upper() == "OUVRIR":
-                print(f"\n🔓 Ouverture du casier {id_int} (Canal Arduino: {channel})")
-                send_relay_command(channel, self.lcd, id_int, self.speaker)
+                print(f"\n🔓 Ouverture du casier {id_int} (Banc {banc.nom}, Canal Arduino: {channel})")
+                commande = self.flotte.envoyer(id_int, on_ack=self._on_ack(id_int))
+                self._jouer_audio(id_int)
+                return commande
             else:
                 print(f"Action inconnue: {action}")
-                
-        except ValueError:
-            print(f"Erreur: id_casier '{id_casier}' n'est pas un nombre valide.")
+
+        except ValueError as e:
+            print(f"Erreur: id_casier '{id_casier}' invalide ({e}).")
         except Exception as e:
             print(f"Erreur lors de l'envoi: {e}")
+        return None
+
+    def regler_ack_timeout(self, ack_timeout):
+        """Nouveau délai d'acquittement pour tous les bancs (rechargement de la configuration)"""
+        for banc in self.flotte.bancs:
+            banc.session.ack_timeout = ack_timeout
+
+    def fermer(self):
+        """Ferme les connexions série persistantes"""
+        self.flotte.stop()
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
@@ -88,10 +324,10 @@ if __name__ == "__main__":
         print("Exemple pour Relais 1: python3 arduino_comm.py 0")
         print("Exemple pour Relais 8: python3 arduino_comm.py 7")
         sys.exit(1)
-    
+
     try:
         target_channel = int(sys.argv[1])
-        send_relay_command(target_channel)
     except ValueError:
         print("Erreur: L'argument doit être un nombre entier (0-14).")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+    send_relay_command(target_channel)
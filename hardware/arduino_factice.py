@@ -0,0 +1,61 @@
+"""
+Arduino factice sur un pseudo-terminal (pty) : tester SessionSerie / la flotte sans carte.
+
+Chaque octet reçu (numéro de canal) est acquitté par une ligne "OK <canal>", comme le firmware
+qui répond après avoir actionné le relais.
+
+    python3 hardware/arduino_factice.py 2     # deux bancs factices, affiche les ports à mettre dans flotte.json
+"""
+import os
+import sys
+import threading
+import time
+import tty
+
+
+class ArduinoFactice:
+    def __init__(self, delai_reponse=0.0):
+        self.delai_reponse = delai_reponse  # Temps d'actionnement simulé (secondes)
+        self.canaux_recus = []
+        self._maitre, self._esclave = os.openpty()
+        tty.setraw(self._esclave)  # Pas d'écho ni de conversion de fins de ligne
+        self.port = os.ttyname(self._esclave)
+        self._actif = True
+        self._thread = threading.Thread(target=self._boucle, name=f"arduino-factice {self.port}", daemon=True)
+        self._thread.start()
+
+    def _boucle(self):
+        while self._actif:
+            try:
+                octets = os.read(self._maitre, 64)
+            except OSError:
+                return
+            for canal in octets:
+                self.canaux_recus.append(canal)
+                if self.delai_reponse:
+                    time.sleep(self.delai_reponse)
+                os.write(self._maitre, f"OK {canal}\n".encode())
+
+    def fermer(self):
+        self._actif = False
+        for fd in (self._esclave, self._maitre):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    nb = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    arduinos = [ArduinoFactice() for _ in range(nb)]
+    for i, arduino in enumerate(arduinos):
+        print(f"Banc factice {i + 1} : {arduino.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for arduino in arduinos:
+            print(f"{arduino.port} : canaux reçus {arduino.canaux_recus}")
+            arduino.fermer()
@@ -0,0 +1,111 @@
+"""
+Flotte de casiers : plusieurs bancs (un Arduino chacun) pilotés depuis un seul Raspberry Pi.
+
+→ Chaque casier (identifiant global, comme dans casiers.csv) est routé vers un couple (banc, canal)
+→ Chaque banc a sa propre SessionSerie : un écrivain et un lecteur par port, un banc lent ou
+  débranché ne retarde pas les autres
+→ Les bancs (et la position de leur lecteur) sont transmis à la réserve des casiers disponibles
+  (models/attribution.py), qui choisit le casier selon la politique d'attribution
+
+Configuration : data/flotte.json (ou le fichier désigné par IROBOT_FLOTTE)
+    {"bancs": [
+        {"nom": "A", "port": "/dev/ttyACM0", "casiers": [1, 2, 3]},
+        {"nom": "B", "port": "/dev/ttyACM1", "casiers": [16, 17], "reset_delay": 2.5, "lecteur": 17,
+         "rfid": {"device": 1, "irq": 25}}
+    ]}
+Le canal d'un casier est sa position dans la liste "casiers" de son banc.
+"lecteur" : casier devant lequel est le lecteur du banc (politique "proche"), par défaut le premier.
+"rfid" : MFRC522 propre au banc (bus/device SPI, broche IRQ). Dès qu'un banc en déclare un, chaque banc
+lit ses cartes sur son lecteur et ses emprunts lui sont attribués (hardware/rfid_manager.py).
+Sans fichier : un seul banc sur SERIAL_PORT, casiers 1 à MAX_CHANNEL + 1 (comportement historique).
+"""
+import json
+import os
+
+from hardware.arduino_comm import SessionSerie, SERIAL_PORT, BAUD_RATE, MAX_CHANNEL, RESET_DELAY
+
+FLOTTE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'flotte.json')
+
+
+class Banc:
+    """Un banc de casiers derrière un Arduino"""
+
+    def __init__(self, nom, port, casiers, baud_rate=BAUD_RATE, reset_delay=RESET_DELAY, lecteur=None, rfid=None):
+        if len(casiers) > MAX_CHANNEL + 1:
+            raise ValueError(f"Banc {nom} : {len(casiers)} casiers pour {MAX_CHANNEL + 1} canaux")
+        self.nom = nom
+        self.casiers = [int(id_casier) for id_casier in casiers]
+        self.lecteur = int(lecteur) if lecteur is not None else self.casiers[0]
+        self.rfid = rfid  # {"bus", "device", "irq"} du MFRC522 du banc, None : lecteur commun
+        self.session = SessionSerie(port, baud_rate, reset_delay=reset_delay, max_channel=len(casiers) - 1)
+
+    @property
+    def port(self):
+        return self.session.port
+
+
+class Flotte:
+    def __init__(self, bancs):
+        self.bancs = list(bancs)
+        self._routes = {}  # id_casier -> (Banc, canal)
+        ports = {}
+        for banc in self.bancs:
+            if banc.port in ports:
+                raise ValueError(f"Port {banc.port} déclaré dans les bancs {ports[banc.port].nom} et {banc.nom}")
+            ports[banc.port] = banc
+            for canal, id_casier in enumerate(banc.casiers):
+                if id_casier in self._routes:
+                    raise ValueError(f"Casier {id_casier} déclaré dans les bancs "
+                                     f"{self._routes[id_casier][0].nom} et {banc.nom}")
+                self._routes[id_casier] = (banc, canal)
+
+    @classmethod
+    def depuis_config(cls, config):
+        return cls(Banc(b["nom"], b["port"], b["casiers"], b.get("baud_rate", BAUD_RATE),
+                        b.get("reset_delay", RESET_DELAY), b.get("lecteur"), b.get("rfid"))
+                   for b in config["bancs"])
+
+    def start(self):
+        for banc in self.bancs:
+            banc.session.start()
+        return self
+
+    def stop(self):
+        for banc in self.bancs:
+            banc.session.stop()
+
+    def route(self, id_casier):
+        """(banc, canal) d'un casier, ValueError s'il n'appartient à aucun banc"""
+        try:
+            return self._routes[int(id_casier)]
+        except KeyError:
+            raise ValueError(f"Casier {id_casier} absent de la flotte")
+
+    def envoyer(self, id_casier, on_ack=None):
+        """Met la commande d'ouverture en file sur le port du banc (retour immédiat)"""
+        banc, canal = self.route(id_casier)
+        return banc.session.envoyer(canal, on_ack)
+
+    def groupes(self):
+        """{id_casier: nom du banc} : seuls ces casiers sont attribués"""
+        return {id_casier: banc.nom for id_casier, (banc, _) in self._routes.items()}
+
+    def lecteurs(self):
+        """{nom du banc: casier devant son lecteur}"""
+        return {banc.nom: banc.lecteur for banc in self.bancs}
+
+    def etat(self):
+        """Connexion de chaque banc (supervision)"""
+        return {banc.nom: {"port": banc.port, "connecte": banc.session.connecte, "casiers": len(banc.casiers)}
+                for banc in self.bancs}
+
+
+def charger_flotte(path=None, port=SERIAL_PORT, baud_rate=BAUD_RATE):
+    """Flotte décrite par le fichier de configuration, ou banc unique historique s'il n'existe pas"""
+    path = path or os.environ.get('IROBOT_FLOTTE', FLOTTE_PATH)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            flotte = Flotte.depuis_config(json.load(f))
+        print(f"Flotte : {len(flotte.bancs)} banc(s) ({', '.join(banc.nom for banc in flotte.bancs)})")
+        return flotte
+    return Flotte([Banc("principal", port, range(1, MAX_CHANNEL + 2), baud_rate)])
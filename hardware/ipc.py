@@ -0,0 +1,227 @@
+"""
+Canal IPC local entre le processus RFID et l'application web (socket Unix).
+
+Protocole : un message JSON par ligne, avec un champ "type".
+→ web  -> RFID : {"type": "ASSOCIATION", "mail": ..., "timestamp": ...}
+→ RFID -> web  : {"type": "SUCCESS" | "ERROR" | "TIMEOUT" | "NORMAL", ...} poussés à tous les clients
+→ Requête/réponse : un message portant un "id" reçoit {"type": "REPONSE", "id": ..., ...}
+
+Le processus RFID héberge le serveur (ServeurIPC) ; le web s'y connecte (ClientIPC)
+et garde le dernier état reçu en mémoire : plus aucun fichier lu à chaque tour de boucle.
+"""
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+
+SOCKET_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'rfid.sock')
+RECONNECT_DELAY = 1.0
+
+
+def _encoder(message):
+    return (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def _lire_messages(conn):
+    """Itère sur les messages JSON reçus sur une connexion, jusqu'à sa fermeture"""
+    tampon = b''
+    while True:
+        donnees = conn.recv(4096)
+        if not donnees:
+            return
+        tampon += donnees
+        while b'\n' in tampon:
+            ligne, tampon = tampon.split(b'\n', 1)
+            if not ligne.strip():
+                continue
+            try:
+                yield json.loads(ligne.decode('utf-8'))
+            except ValueError:
+                print(f"⚠ Message IPC illisible ignoré: {ligne[:80]!r}")
+
+
+class ServeurIPC:
+    """Serveur du processus RFID : reçoit les demandes, pousse les résultats à tous les clients"""
+
+    def __init__(self, path=SOCKET_PATH):
+        self.path = path
+        self._handlers = {}
+        self._clients = set()
+        self._clients_lock = threading.Lock()
+        self._envoi_lock = threading.Lock()
+        self._sock = None
+        self._actif = False
+
+    def on(self, type_message, handler):
+        """Enregistre handler(message) -> dict|None pour un type de message"""
+        self._handlers[type_message] = handler
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Socket orphelin d'une exécution précédente
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        self._sock.listen(8)
+        self._actif = True
+        threading.Thread(target=self._accepter, name="ipc-accept", daemon=True).start()
+        print(f"Canal IPC en écoute sur {self.path}")
+
+    def stop(self):
+        self._actif = False
+        if self._sock is not None:
+            self._sock.close()
+        with self._clients_lock:
+            clients = list(self._clients)
+        for conn in clients:
+            self._retirer(conn)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def publier(self, message):
+        """Pousse un message à tous les clients connectés"""
+        donnees = _encoder(message)
+        with self._clients_lock:
+            clients = list(self._clients)
+        for conn in clients:
+            try:
+                with self._envoi_lock:
+                    conn.sendall(donnees)
+            except OSError:
+                self._retirer(conn)
+
+    def _accepter(self):
+        while self._actif:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            with self._clients_lock:
+                self._clients.add(conn)
+            threading.Thread(target=self._servir, args=(conn,), name="ipc-client", daemon=True).start()
+
+    def _servir(self, conn):
+        try:
+            for message in _lire_messages(conn):
+                self._traiter(conn, message)
+        except OSError:
+            pass
+        finally:
+            self._retirer(conn)
+
+    def _traiter(self, conn, message):
+        handler = self._handlers.get(message.get('type'))
+        if handler is None:
+            reponse = {'erreur': f"type inconnu: {message.get('type')}"}
+        else:
+            try:
+                reponse = handler(message)
+            except Exception as e:
+                print(f"Erreur traitement IPC {message.get('type')}: {e}")
+                reponse = {'erreur': str(e)}
+        if 'id' in message:
+            with self._envoi_lock:
+                conn.sendall(_encoder(dict(reponse or {}, type='REPONSE', id=message['id'])))
+
+    def _retirer(self, conn):
+        with self._clients_lock:
+            self._clients.discard(conn)
+        try:
+            conn.shutdown(socket.SHUT_RDWR)  # Débloque le recv() du thread qui sert ce client
+        except OSError:
+            pass
+        conn.close()
+
+
+class ClientIPC:
+    """
+    Client du processus web : connexion persistante (reconnexion automatique),
+    dernier état poussé par le RFID gardé en mémoire.
+    """
+
+    def __init__(self, path=SOCKET_PATH):
+        self.path = path
+        self.etat = {"mode": "NORMAL"}
+        self.condition = threading.Condition()
+        self.version = 0  # Incrémentée à chaque état reçu
+        self._sock = None
+        self._envoi_lock = threading.Lock()
+        self._connecte = threading.Event()
+        self._ids = itertools.count(1)
+        self._reponses = {}
+        self._thread = None
+
+    @property
+    def connecte(self):
+        return self._connecte.is_set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._boucle, name="ipc-client", daemon=True)
+            self._thread.start()
+        return self
+
+    def attendre_connexion(self, timeout):
+        return self._connecte.wait(timeout)
+
+    def envoyer(self, message):
+        """Envoie un message au processus RFID, retourne False s'il est injoignable"""
+        if not self._connecte.is_set():
+            return False
+        try:
+            with self._envoi_lock:
+                self._sock.sendall(_encoder(message))
+            return True
+        except OSError:
+            return False
+
+    def demander(self, message, timeout=5):
+        """Requête/réponse : retourne la réponse du processus RFID ou None"""
+        id_requete = next(self._ids)
+        attente = threading.Event()
+        self._reponses[id_requete] = [attente, None]
+        try:
+            if not self.envoyer(dict(message, id=id_requete)):
+                return None
+            if not attente.wait(timeout):
+                return None
+            return self._reponses[id_requete][1]
+        finally:
+            self._reponses.pop(id_requete, None)
+
+    def mettre_a_jour(self, etat):
+        """Remplace l'état local et réveille les threads en attente"""
+        with self.condition:
+            self.etat = etat
+            self.version += 1
+            self.condition.notify_all()
+
+    def _boucle(self):
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                time.sleep(RECONNECT_DELAY)
+                continue
+
+            self._sock = sock
+            self._connecte.set()
+            try:
+                for message in _lire_messages(sock):
+                    if message.get('type') == 'REPONSE':
+                        attente = self._reponses.get(message.get('id'))
+                        if attente:
+                            attente[1] = message
+                            attente[0].set()
+                    else:
+                        self.mettre_a_jour(dict(message, mode=message['type']))
+            except OSError:
+                pass
+            finally:
+                self._connecte.clear()
+                sock.close()
+            time.sleep(RECONNECT_DELAY)
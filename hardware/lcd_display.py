@@ -1,71 +1,193 @@
-from RPLCD.i2c import CharLCD
-import time
+"""
+Afficheur LCD 16x2 (I2C).
+
+Un seul thread (le propriétaire) parle à l'écran :
+→ les appelants déposent des messages et reviennent immédiatement (jamais de sleep ni de join)
+→ les messages sont ordonnés par priorité (alternance par défaut < statut < erreur) et expirent après leur durée
+→ l'écran est gardé en mémoire (framebuffer) : seuls les caractères qui changent sont envoyés sur l'I2C,
+  sans lcd.clear() (lent et qui fait clignoter)
+"""
+import heapq
+import itertools
 import threading
+import time
+
+import metriques
+
+COLS = 16
+ROWS = 2
+PERIODE_ALTERNANCE = 3  # Secondes entre les deux messages par défaut
+REESSAI_I2C = 1.0
+
+DEFAUT = 0   # Alternance "HDMI Locker" / "Passez votre carte", quand rien d'autre n'est à afficher
+STATUT = 1
+ERREUR = 2
+
+MESSAGES_DEFAUT = (("HDMI Locker", "3000"), ("Passez votre", "carte"))
+
+ECRITURE_LCD = metriques.histogramme("irobot_ecriture_lcd_secondes",
+                                     "Envoi sur l'I2C d'un changement d'écran (caractères modifiés seulement)")
+CARACTERES_LCD = metriques.compteur("irobot_lcd_caracteres_total", "Caractères envoyés sur l'I2C")
+
+
+def cadrer(line1="", line2=""):
+    """Les deux lignes centrées sur 16 caractères, telles qu'affichées"""
+    return (line1 or "")[:COLS].center(COLS), (line2 or "")[:COLS].center(COLS)
+
+
+def segments_modifies(avant, apres):
+    """Retourne les (colonne, texte) à réécrire pour passer de la ligne avant à la ligne après"""
+    segments = []
+    debut = None
+    for col in range(len(apres) + 1):
+        different = col < len(apres) and (avant is None or avant[col] != apres[col])
+        if different and debut is None:
+            debut = col
+        elif not different and debut is not None:
+            segments.append((debut, apres[debut:col]))
+            debut = None
+    return segments
+
+
+class Message:
+    __slots__ = ('lignes', 'priorite', 'expiration', 'ordre')
+
+    def __init__(self, lignes, priorite, expiration, ordre):
+        self.lignes = lignes
+        self.priorite = priorite
+        self.expiration = expiration
+        self.ordre = ordre
+
+    def __lt__(self, autre):
+        # Tas min : la priorité la plus haute, puis le message le plus récent, sort en premier
+        return (-self.priorite, -self.ordre) < (-autre.priorite, -autre.ordre)
+
 
 class LCDDisplay:
-    def __init__(self):
-        self.lcd = CharLCD(i2c_expander='PCF8574', address=0x27, port=1, cols=16, rows=2)
+    def __init__(self, driver=None):
+        if driver is None:
+            from RPLCD.i2c import CharLCD
+            from config import obtenir_config
+            config = obtenir_config()
+            driver = CharLCD(i2c_expander='PCF8574', address=config.lcd_i2c_address, port=config.lcd_i2c_port,
+                             cols=COLS, rows=ROWS)
+        self.lcd = driver
         self.lcd.clear()
-        self._default_mode = True
-        self._stop_alternating = False
-        self._alternating_thread = None
-        self.start_alternating()
-    
-    def clear(self):
-        """Efface l'écran"""
-        self.lcd.clear()
-    
+        self._framebuffer = [" " * COLS] * ROWS
+        self._messages = []  # Tas de Message
+        self._ordre = itertools.count()
+        self._condition = threading.Condition()
+        self._actif = True
+        self._modifie = True  # Un message a été déposé depuis le dernier dessin
+        self.ecritures = 0  # Caractères envoyés sur l'I2C (pour mesurer l'effet du diff)
+        self._thread = threading.Thread(target=self._boucle, name="lcd", daemon=True)
+        self._thread.start()
+
+    # --- API (non bloquante) ---
+
+    def afficher(self, line1="", line2="", priorite=STATUT, duree=None):
+        """
+        Dépose un message. Il remplace les messages de priorité inférieure ou égale,
+        et reste affiché `duree` secondes (indéfiniment si None).
+        """
+        expiration = time.monotonic() + duree if duree else None
+        message = Message(cadrer(line1, line2), priorite, expiration, next(self._ordre))
+        with self._condition:
+            self._messages = [autre for autre in self._messages if autre.priorite > priorite]
+            self._messages.append(message)
+            heapq.heapify(self._messages)
+            self._modifie = True
+            self._condition.notify()
+        return message
+
     def write(self, line1="", line2=""):
         """Écrit sur les deux lignes (max 16 caractères par ligne)"""
-        self.stop_alternating()
-        self.lcd.clear()
-        if line1:
-            self.lcd.cursor_pos = (0, 0)
-            self.lcd.write_string(line1[:16].center(16))
-        if line2:
-            self.lcd.cursor_pos = (1, 0)
-            self.lcd.write_string(line2[:16].center(16))
-    
+        self.afficher(line1, line2)
+
     def write_temporary(self, line1="", line2="", duration=3):
-        """Affiche le message voulu puis revient au message par défaut"""
-        self.write(line1, line2)
-        time.sleep(duration)
-        self.start_alternating()
-    
-    def _alternate_default_messages(self):
-        """Alterne entre les deux messages par défaut"""
-        while not self._stop_alternating:
-            if self._default_mode:
-                self.lcd.clear()
-                self.lcd.cursor_pos = (0, 0)
-                self.lcd.write_string("HDMI Locker".center(16))
-                self.lcd.cursor_pos = (1, 0)
-                self.lcd.write_string("3000".center(16))
-                
-            else:
-                self.lcd.clear()
-                self.lcd.cursor_pos = (0, 0)
-                self.lcd.write_string("Passez votre".center(16))
-                self.lcd.cursor_pos = (1, 0)
-                self.lcd.write_string("carte".center(16))
-                
-            self._default_mode = not self._default_mode
-            time.sleep(3)
-    
+        """Affiche le message voulu puis revient au message précédent ou par défaut"""
+        self.afficher(line1, line2, duree=duration)
+
+    def erreur(self, line1="", line2="", duration=3):
+        """Message prioritaire : n'est pas masqué par les messages de statut"""
+        self.afficher(line1, line2, priorite=ERREUR, duree=duration)
+
     def start_alternating(self):
-        """Démarre l'alternance des messages par défaut"""
-        self.stop_alternating()
-        self._stop_alternating = False
-        self._alternating_thread = threading.Thread(target=self._alternate_default_messages, daemon=True)
-        self._alternating_thread.start()
-    
-    def stop_alternating(self):
-        """Arrête l'alternance des messages par défaut"""
-        if self._alternating_thread and self._alternating_thread.is_alive():
-            self._stop_alternating = True
-            self._alternating_thread.join(timeout=0.5)
-    
+        """
+        Retire les messages de statut : retour à l'alternance des messages par défaut.
+        Les erreurs restent jusqu'à leur expiration (celle d'un autre passage, par exemple).
+        """
+        with self._condition:
+            self._messages = [message for message in self._messages if message.priorite > STATUT]
+            heapq.heapify(self._messages)
+            self._modifie = True
+            self._condition.notify()
+
+    def clear(self):
+        """Efface l'écran (message vide prioritaire)"""
+        self.afficher("", "", priorite=ERREUR)
+
     def cleanup(self):
-        """Nettoie les ressources"""
-        self.stop_alternating()
-        self.clear()
+        """Arrête le thread propriétaire et efface l'écran"""
+        with self._condition:
+            self._actif = False
+            self._condition.notify()
+        self._thread.join(timeout=1)
+        try:
+            self.lcd.clear()
+        except OSError:
+            pass
+
+    # --- Thread propriétaire ---
+
+    def _courant(self, maintenant):
+        """Lignes à afficher et date du prochain changement (None : aucun avant un nouveau message)"""
+        while self._messages:
+            message = self._messages[0]
+            if message.expiration is not None and message.expiration <= maintenant:
+                heapq.heappop(self._messages)
+                continue
+            expirations = [m.expiration for m in self._messages if m.expiration]
+            return message.lignes, min(expirations) if expirations else None
+
+        # Alternance : l'écran change à chaque multiple de PERIODE_ALTERNANCE
+        tour = int(maintenant // PERIODE_ALTERNANCE)
+        return cadrer(*MESSAGES_DEFAUT[tour % 2]), (tour + 1) * PERIODE_ALTERNANCE
+
+    def _boucle(self):
+        while True:
+            with self._condition:
+                if not self._actif:
+                    return
+                self._modifie = False
+                lignes, prochain = self._courant(time.monotonic())
+            self._dessiner(lignes)
+            with self._condition:
+                if not self._actif:
+                    return
+                attente = None if prochain is None else max(0.0, prochain - time.monotonic())
+                if None in self._framebuffer:
+                    attente = REESSAI_I2C if attente is None else min(attente, REESSAI_I2C)  # Après une erreur I2C
+                if not self._modifie:
+                    self._condition.wait(attente)
+
+    def _dessiner(self, lignes):
+        """N'envoie que les caractères qui diffèrent du framebuffer"""
+        debut = time.perf_counter()
+        avant = self.ecritures
+        try:
+            for row, ligne in enumerate(lignes):
+                for col, texte in segments_modifies(self._framebuffer[row], ligne):
+                    try:
+                        self.lcd.cursor_pos = (row, col)
+                        self.lcd.write_string(texte)
+                        self.ecritures += len(texte)
+                    except OSError as e:
+                        print(f"Erreur LCD: {e}")
+                        self._framebuffer[row] = None  # État de l'écran inconnu : ligne redessinée en entier
+                        return
+                self._framebuffer[row] = ligne
+        finally:
+            if self.ecritures != avant:  # Écran inchangé (réveil sans modification) : rien à mesurer
+                ECRITURE_LCD.observer(time.perf_counter() - debut)
+                CARACTERES_LCD.inc(self.ecritures - avant)
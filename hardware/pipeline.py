@@ -0,0 +1,374 @@
+"""
+Pipeline de traitement des passages de carte (threads + files).
+
+    lecture -> autorisation -> persistance -> actionnement -> retour (LCD)
+
+→ Lecture : la boucle RFID ne fait que déposer l'UID, elle reprend aussitôt la lecture suivante
+→ Autorisation : identification de l'utilisateur et décision emprunt / rendu
+→ Persistance : écriture de l'emprunt (un seul thread écrivain, avant l'ouverture : une coupure
+  après ce point ne perd pas le passage) ; le rendu n'est écrit qu'après l'acquittement de l'ouverture
+→ Actionnement : commande Arduino non bloquante, terminée par son acquittement
+→ Retour : messages déposés dans la file de priorité du LCD (son propre thread les affiche)
+
+Un utilisateur ou un casier n'a jamais deux opérations en vol : l'utilisateur est réservé de
+l'autorisation jusqu'à la fin de l'actionnement, le casier pendant son ouverture. Une opération
+dont le casier est encore en cours d'ouverture attend sa fin à part, sans bloquer les autres casiers.
+
+Un emprunt est enregistré avant l'ouverture : si l'Arduino n'acquitte pas (échec d'envoi, expiration),
+l'étape de persistance l'annule (statut ANNULE, casier de nouveau disponible), le casier n'ayant jamais
+été ouvert ; ni les analyses ni l'usure ne le comptent. Un rendu sans acquittement n'est pas écrit :
+l'emprunt reste EN COURS et le casier n'est pas proposé au suivant, le câble étant resté à l'utilisateur.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import metriques
+from hardware.lcd_display import STATUT, ERREUR
+
+DELAI_ACTIONNEMENT = 10.0  # Au-delà, une ouverture sans réponse libère utilisateur et casier
+DUREE_MESSAGE = 3
+
+RECHERCHE_UTILISATEUR = metriques.histogramme("irobot_recherche_utilisateur_secondes",
+                                              "Recherche du mail associé à un UID")
+ECRITURE_STOCKAGE = metriques.histogramme("irobot_ecriture_stockage_secondes",
+                                          "Écriture d'un emprunt ou d'un rendu", etiquettes=("action",))
+DUREE_PASSAGE = metriques.histogramme("irobot_passage_secondes",
+                                      "Carte lue -> fin de l'ouverture (acquittement, échec ou expiration)",
+                                      etiquettes=("action", "resultat"))
+PASSAGES = metriques.compteur("irobot_passages_total", "Passages de carte traités par le pipeline",
+                              etiquettes=("action", "resultat"))
+ANNULATIONS = metriques.compteur("irobot_emprunts_annules_total",
+                                 "Emprunts annulés faute d'acquittement de l'ouverture du casier")
+
+
+class Operation:
+    """Un passage de carte qui traverse le pipeline"""
+    __slots__ = ('uid', 'mail', 'action', 'id_casier', 'association', 'banc', 't_lecture', 't_envoi', 't_fin',
+                 'terminee')
+
+    def __init__(self, uid, association=None, banc=None):
+        self.uid = uid
+        self.mail = None
+        self.action = None  # EMPRUNT | RENDU | ASSOCIATION, puis ANNULATION | CLOTURE après l'ouverture
+        self.id_casier = None
+        self.association = association
+        self.banc = banc  # Banc du lecteur qui a lu la carte (None : un seul lecteur)
+        self.t_lecture = time.monotonic()
+        self.t_envoi = None
+        self.t_fin = None
+        self.terminee = False
+
+
+class PipelinePassage:
+    def __init__(self, stockage, arduino, lcd, publier=None, delai_actionnement=DELAI_ACTIONNEMENT, observateur=None):
+        self.stockage = stockage
+        self.arduino = arduino
+        self.lcd = lcd
+        self.publier = publier  # publier(mode, **infos) : résultat d'association pour le web
+        self.delai_actionnement = delai_actionnement  # Modifiable à chaud
+        self.observateur = observateur  # observateur(op, ok) à la fin de chaque emprunt/rendu (mesures)
+
+        self._autorisation = queue.Queue()
+        self._persistance = queue.Queue()
+        self._actionnement = queue.Queue()
+
+        self._verrou = threading.RLock()
+        self._utilisateurs_en_cours = set()
+        self._casiers_en_cours = {}   # id_casier -> Operation
+        self._attente_casiers = {}    # id_casier -> deque des opérations qui attendent la fin de son ouverture
+        self._files_arretees = set()  # Étapes arrêtées : ce qui leur est encore déposé est traité sur place
+        self._threads = []
+
+    def start(self):
+        for nom, cible in (("autorisation", self._boucle_autorisation),
+                           ("persistance", self._boucle_persistance),
+                           ("actionnement", self._boucle_actionnement)):
+            thread = threading.Thread(target=cible, name=f"pipeline-{nom}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        """Termine les opérations déjà en file puis arrête les threads"""
+        for file in (self._autorisation, self._persistance, self._actionnement):
+            file.put(None)
+            file.join()
+        for thread in self._threads:
+            thread.join(timeout=1)
+
+    def soumettre(self, uid, association=None, banc=None):
+        """Dépose un passage de carte (retour immédiat)"""
+        self._autorisation.put(Operation(uid, association, banc))
+
+    def afficher(self, line1="", line2="", duree=None, priorite=STATUT):
+        """Message LCD (temporaire si duree), non bloquant"""
+        self.lcd.afficher(line1, line2, priorite=priorite, duree=duree)
+
+    def afficher_defaut(self):
+        self.lcd.start_alternating()
+
+    def en_cours(self):
+        """Nombre d'opérations en vol (utilisateurs réservés)"""
+        with self._verrou:
+            return len(self._utilisateurs_en_cours)
+
+    # --- Étapes ---
+
+    def _deposer(self, file, element, sinon):
+        """Dépose element dans la file d'une étape, ou appelle sinon(element) si l'étape est arrêtée"""
+        with self._verrou:
+            if file not in self._files_arretees:
+                file.put(element)
+                return
+        sinon(element)
+
+    def _arreter_etape(self, file, sinon):
+        """None reçu : ce qui a été déposé après lui (acquittements tardifs) est traité par sinon"""
+        with self._verrou:
+            self._files_arretees.add(file)
+        while True:
+            try:
+                element = file.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if element is not None:
+                    sinon(element)
+            finally:
+                file.task_done()
+
+    def _boucle(self, file, traiter):
+        while True:
+            element = file.get()
+            try:
+                if element is None:
+                    self._arreter_etape(file, traiter)
+                    return
+                traiter(element)
+            except Exception as e:
+                print(f"Erreur pipeline ({threading.current_thread().name}): {e}")
+                if isinstance(element, Operation):
+                    self._terminer(element, ok=False)
+            finally:
+                file.task_done()
+
+    def _boucle_autorisation(self):
+        self._boucle(self._autorisation, self._autoriser)
+
+    def _boucle_persistance(self):
+        self._boucle(self._persistance, self._persister)
+
+    def _autoriser(self, op):
+        if op.association:
+            op.action = "ASSOCIATION"
+            self._persistance.put(op)
+            return
+
+        debut = time.perf_counter()
+        op.mail = self.stockage.users.get_mail_by_uid(op.uid)
+        RECHERCHE_UTILISATEUR.observer(time.perf_counter() - debut)
+        if not op.mail:
+            PASSAGES.avec("INCONNU", "refuse").inc()
+            print(f"ID {op.uid} inconnu. Veuillez scanner le QR Code sur le casier.")
+            self.afficher("Carte inconnue", "Scannez QR code", DUREE_MESSAGE, ERREUR)
+            return
+
+        with self._verrou:
+            if op.mail in self._utilisateurs_en_cours:
+                PASSAGES.avec("EN_COURS", "ignore").inc()
+                print(f"Opération déjà en cours pour {op.mail}, passage ignoré")
+                return
+            self._utilisateurs_en_cours.add(op.mail)
+
+        print(f"Utilisateur reconnu : {op.mail}")
+        op.action = "RENDU" if self.stockage.emprunts.get_emprunt(op.mail) else "EMPRUNT"
+        self.afficher("Veuillez", "patienter...")
+        self._persistance.put(op)
+
+    def _persister(self, op):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        if op.action == "ASSOCIATION":
+            self._associer(op)
+            return
+        if op.action == "ANNULATION":
+            self._annuler(op)
+            return
+        if op.action == "CLOTURE":
+            self._cloturer(op)
+            return
+
+        debut = time.perf_counter()
+        if op.action == "RENDU":
+            print("Action : Rendu de matériel")
+            # Rien n'est écrit avant l'ouverture : le rendu est enregistré à son acquittement (_cloturer)
+            op.id_casier = self.stockage.emprunts.get_casier_en_cours(op.mail)
+            if not op.id_casier:
+                print("Erreur: emprunt EN COURS mais id_casier introuvable")
+                self._terminer(op, ok=False)
+                return
+        else:
+            print("Action : Nouvel emprunt")
+            # Attribution du casier + création de l'emprunt (une seule transaction en SQLite)
+            op.id_casier = self.stockage.emprunter(op.mail, now, op.banc)
+            ECRITURE_STOCKAGE.avec(op.action).observer(time.perf_counter() - debut)
+            if op.id_casier is None:
+                print("Désolé, aucun casier n'est disponible.")
+                self._liberer_utilisateur(op)
+                self.afficher("Aucun casier", "disponible", DUREE_MESSAGE, ERREUR)
+                self._observer(op, ok=False)
+                return
+            print(f"✓ Casier {op.id_casier} attribué à {op.mail}")
+
+        self._actionnement.put(op)
+
+    def _cloturer(self, op):
+        """Casier ouvert pour un rendu : clôture de l'emprunt + casier PLEIN, puis libère l'utilisateur"""
+        try:
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            debut = time.perf_counter()
+            # Une seule transaction en SQLite
+            if self.stockage.rendre(op.mail, now) == op.id_casier:
+                print(f"✓ Casier {op.id_casier} rendu et libéré")
+            ECRITURE_STOCKAGE.avec("RENDU").observer(time.perf_counter() - debut)
+        finally:
+            self._liberer_utilisateur(op)
+
+    def _annuler(self, op):
+        """Annule l'emprunt d'un casier jamais ouvert (le câble y est resté), puis libère l'utilisateur"""
+        try:
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if self.stockage.annuler(op.mail, op.id_casier, now) == op.id_casier:
+                ANNULATIONS.inc()
+                print(f"⚠ Casier {op.id_casier} non ouvert : emprunt de {op.mail} annulé")
+        finally:
+            self._liberer_utilisateur(op)
+
+    def _associer(self, op):
+        print(f"\n>>> ASSOCIATION : Carte {op.uid} pour {op.association}")
+        if self.stockage.users.register_user(op.uid, op.association):
+            print(f"✓ Succès ! Carte {op.uid} associée à {op.association}")
+            if self.publier:
+                self.publier("SUCCESS", mail=op.association, uid=op.uid)
+            self.afficher("Succes !", "", DUREE_MESSAGE)
+        else:
+            print("✗ Erreur : Carte ou Email déjà enregistré.")
+            if self.publier:
+                self.publier("ERROR", mail=op.association, message="Carte ou email déjà enregistré")
+            self.afficher("Carte deja", "enregistree", DUREE_MESSAGE, ERREUR)
+
+    def _boucle_actionnement(self):
+        while True:
+            try:
+                op = self._actionnement.get(timeout=0.5)
+            except queue.Empty:
+                self._liberer_expirees()
+                continue
+            try:
+                if op is None:
+                    self._arreter_actionnement()
+                    return
+                self._actionner(op)
+            except Exception as e:
+                print(f"Erreur pipeline (actionnement): {e}")
+                self._terminer(op, ok=False)
+            finally:
+                self._actionnement.task_done()
+
+    def _actionner(self, op):
+        # Un casier encore en cours d'ouverture n'est pas recommandé avant la fin de la précédente :
+        # l'opération attend à part, les autres casiers continuent de s'ouvrir
+        with self._verrou:
+            if op.id_casier in self._casiers_en_cours:
+                self._attente_casiers.setdefault(op.id_casier, deque()).append(op)
+                return
+            self._casiers_en_cours[op.id_casier] = op
+
+        print(f"Ouverture du casier {op.id_casier}...")
+        op.t_envoi = time.monotonic()
+        commande = self.arduino.envoyer_commande(op.id_casier, "OUVRIR")
+        if commande is None:
+            self._terminer(op, ok=False)
+            return
+        commande.quand_terminee(lambda c: self._terminer(op, ok=c.reponse is not None))
+
+    def _arreter_actionnement(self):
+        """Ouvertures en vol : attend leur acquittement (au plus delai_actionnement), les autres sont abandonnées"""
+        self._arreter_etape(self._actionnement, self._abandonner)
+        fin = time.monotonic() + self.delai_actionnement
+        while self._casiers_en_cours and time.monotonic() < fin:
+            time.sleep(0.05)
+        with self._verrou:
+            restantes = list(self._casiers_en_cours.values())
+            restantes += [op for attente in self._attente_casiers.values() for op in attente]
+            self._attente_casiers.clear()
+        for op in restantes:
+            self._abandonner(op)
+
+    def _liberer_expirees(self):
+        limite = time.monotonic() - self.delai_actionnement
+        with self._verrou:
+            expirees = [op for op in self._casiers_en_cours.values() if op.t_envoi and op.t_envoi < limite]
+        for op in expirees:
+            print(f"⚠ Casier {op.id_casier} : pas de réponse de l'Arduino, opération libérée")
+            self._terminer(op, ok=False)
+
+    def _abandonner(self, op):
+        """Opération qui ne sera pas actionnée (arrêt du pipeline)"""
+        self._terminer(op, ok=False)
+
+    def _liberer_utilisateur(self, op):
+        with self._verrou:
+            self._utilisateurs_en_cours.discard(op.mail)
+
+    def _liberer_casier(self, op):
+        """Rend le casier de l'opération ; la première opération qui l'attendait repart à l'actionnement"""
+        with self._verrou:
+            if op.id_casier is None or self._casiers_en_cours.get(op.id_casier) is not op:
+                return
+            del self._casiers_en_cours[op.id_casier]
+            attente = self._attente_casiers.get(op.id_casier)
+            suivante = attente.popleft() if attente else None
+            if attente is not None and not attente:
+                del self._attente_casiers[op.id_casier]
+        if suivante is not None:
+            self._deposer(self._actionnement, suivante, self._abandonner)
+
+    def _terminer(self, op, ok):
+        """Fin d'une opération (acquittement, expiration ou erreur) : libère et affiche le résultat"""
+        with self._verrou:
+            if op.terminee:
+                return  # Déjà terminée (acquittement arrivé après l'expiration, par exemple)
+            op.terminee = True
+        self._liberer_casier(op)
+        if ok:
+            self.afficher(f"Casier {op.id_casier}", "ouvert", DUREE_MESSAGE + 1)
+        elif op.id_casier is not None:
+            self.afficher("Erreur casier", str(op.id_casier), DUREE_MESSAGE, ERREUR)
+        else:
+            self.afficher_defaut()
+        self._observer(op, ok)
+        if not ok and op.action == "EMPRUNT" and op.id_casier is not None:
+            # Emprunt enregistré mais casier jamais ouvert : l'utilisateur reste réservé jusqu'à son annulation
+            op.action = "ANNULATION"
+            self._deposer(self._persistance, op, self._persister)
+        elif ok and op.action == "RENDU":
+            # Casier ouvert : le rendu est enregistré, l'utilisateur reste réservé jusque-là
+            op.action = "CLOTURE"
+            self._deposer(self._persistance, op, self._persister)
+        else:
+            self._liberer_utilisateur(op)
+
+    def _observer(self, op, ok):
+        op.t_fin = time.monotonic()
+        resultat = "ok" if ok else "echec"
+        DUREE_PASSAGE.avec(op.action, resultat).observer(op.t_fin - op.t_lecture)
+        PASSAGES.avec(op.action, resultat).inc()
+        if self.observateur:
+            try:
+                self.observateur(op, ok)
+            except Exception as e:
+                print(f"Erreur observateur pipeline: {e}")
@@ -0,0 +1,300 @@
+"""
+Profilage à la demande du processus RFID, sans le redémarrer.
+
+Trois captures, écrites dans data/profiles/ (horodatées) :
+→ cpu     : profil de tous les threads pendant N secondes
+            .prof (pstats / snakeviz), .txt (fonctions les plus coûteuses), .folded (flamegraph.pl)
+→ memoire : instantané tracemalloc et différence avec le précédent (le premier démarre le traçage),
+            objets vivants par type et leur évolution, RSS
+→ piles   : pile de chaque thread vivant (thread bloqué, threads qui s'accumulent)
+
+Déclencheurs :
+    kill -USR1 <pid>                      # piles + mémoire
+    kill -USR2 <pid>                      # profil CPU de DUREE_CPU secondes
+    python3 hardware/profilage.py cpu 60  # via le canal IPC (demande "PROFILAGE"), idem memoire / piles / arret
+    POST /admin/profilage du dashboard (action=cpu&duree=60), depuis la borne (localhost) uniquement
+
+Le profil CPU est obtenu par échantillonnage de toutes les piles (sys._current_frames, ~100 Hz), écrit
+au format pstats (nombre d'appels = nombre d'échantillons). cProfile ne convient pas : avant 3.12 il ne
+suit que le thread qui l'active, et depuis 3.12 il reçoit les événements de tous les threads sur une
+seule pile d'appels, ce qui mélange leurs temps.
+"""
+import gc
+import os
+import pstats
+import queue
+import signal
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+PROFILS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'profiles')
+DUREE_CPU = 30          # Secondes par défaut d'un profil CPU
+DUREE_CPU_MAX = 600
+INTERVALLE_ECHANTILLON = 0.01
+PROFONDEUR_MEMOIRE = 10  # Trames gardées par allocation tracée
+LIGNES_RAPPORT = 40
+
+
+def _cle(code):
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+class ProfilEchantillonne:
+    """
+    Piles de tous les threads relevées à intervalle régulier, présentées comme un profil cProfile
+    (create_stats / stats) : pstats.Stats(profil) fonctionne, temps = échantillons x intervalle.
+    """
+
+    def __init__(self, intervalle=INTERVALLE_ECHANTILLON, exclure=()):
+        self.intervalle = intervalle
+        self.exclure = set(exclure)  # Identifiants de threads non échantillonnés (le profileur lui-même)
+        self.echantillons = 0
+        self.propre = Counter()     # fonction -> échantillons où elle est au sommet de la pile
+        self.inclusif = Counter()   # fonction -> échantillons où elle est dans la pile
+        self.appels = Counter()     # (appelant, appelé) -> échantillons
+        self.piles = Counter()      # "thread;f1;f2;..." -> échantillons (format replié de flamegraph)
+        self.stats = {}
+
+    def echantillonner(self):
+        noms = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, trame in sys._current_frames().items():
+            if ident in self.exclure:
+                continue
+            pile = []
+            while trame is not None:
+                pile.append(_cle(trame.f_code))
+                trame = trame.f_back
+            pile.reverse()  # De la racine au sommet
+            self.propre[pile[-1]] += 1
+            self.inclusif.update(set(pile))
+            self.appels.update(set(zip(pile, pile[1:])))
+            self.piles[";".join([noms.get(ident, str(ident))] + [f"{os.path.basename(f)}:{nom}" for f, _, nom in pile])] += 1
+        self.echantillons += 1
+
+    def executer(self, duree, arret):
+        """Échantillonne pendant `duree` secondes ou jusqu'à ce que l'Event `arret` soit levé"""
+        prochain = time.monotonic()
+        fin = prochain + duree
+        while prochain < fin and not arret.is_set():
+            self.echantillonner()
+            prochain += self.intervalle
+            arret.wait(max(0.0, prochain - time.monotonic()))
+        self.create_stats()
+
+    def create_stats(self):
+        dt = self.intervalle
+        appelants = {}
+        for (appelant, appele), n in self.appels.items():
+            appelants.setdefault(appele, {})[appelant] = (n, n, 0.0, n * dt)
+        self.stats = {fonction: (n, n, self.propre[fonction] * dt, n * dt, appelants.get(fonction, {}))
+                      for fonction, n in self.inclusif.items()}
+
+
+def _rss_ko():
+    try:
+        with open('/proc/self/status') as f:
+            for ligne in f:
+                if ligne.startswith('VmRSS:'):
+                    return int(ligne.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class Profileur:
+    """
+    Captures à la demande, exécutées par un thread dédié : les gestionnaires de signaux et le
+    canal IPC ne font que déposer la demande (SimpleQueue : put réentrant, sûr dans un signal).
+    """
+
+    def __init__(self, dossier=PROFILS_DIR):
+        self.dossier = dossier
+        self._demandes = queue.SimpleQueue()
+        self._cpu_lock = threading.Lock()  # Un seul profil CPU à la fois
+        self._arret_cpu = threading.Event()
+        self._snapshot = None     # Dernier instantané tracemalloc
+        self._types = None        # Dernier décompte des objets par type
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._boucle, name="profilage", daemon=True)
+            self._thread.start()
+        return self
+
+    def installer_signaux(self):
+        """SIGUSR1 : piles + mémoire, SIGUSR2 : profil CPU (à appeler depuis le thread principal)"""
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self._sur_usr1)
+            signal.signal(signal.SIGUSR2, lambda *_: self.demander("cpu"))
+        return self
+
+    def _sur_usr1(self, *_):
+        self.demander("piles")
+        self.demander("memoire")
+
+    def demander(self, action, duree=DUREE_CPU):
+        """Dépose une capture (retour immédiat), exécutée par le thread de profilage"""
+        self._demandes.put((action, duree))
+
+    def traiter_ipc(self, message):
+        """Demande "PROFILAGE" reçue du canal IPC : {"action": "cpu" | "memoire" | "piles" | "arret", "duree": s}"""
+        action = message.get("action")
+        if action not in ("cpu", "memoire", "piles", "arret"):
+            return {"ok": False, "erreur": f"action inconnue: {action}"}
+        try:
+            duree = float(message.get("duree") or DUREE_CPU)
+        except (TypeError, ValueError):
+            return {"ok": False, "erreur": "duree invalide"}
+        if not 0 < duree <= DUREE_CPU_MAX:
+            return {"ok": False, "erreur": f"duree entre 0 et {DUREE_CPU_MAX} s"}
+        if action == "cpu" and self._cpu_lock.locked():
+            return {"ok": False, "erreur": "profil CPU déjà en cours"}
+        if action == "arret":
+            self.arreter()
+            return {"ok": True}
+        self.demander(action, duree)
+        return {"ok": True, "dossier": self.dossier}
+
+    def arreter(self):
+        """Interrompt un profil CPU en cours (écrit ce qui a été mesuré) et arrête le traçage mémoire"""
+        self._arret_cpu.set()
+        self.demander("arret_memoire")
+
+    def _boucle(self):
+        while True:
+            action, duree = self._demandes.get()
+            try:
+                if action == "cpu":
+                    # Thread à part : piles et mémoire restent disponibles pendant un long profil
+                    threading.Thread(target=self.profiler_cpu, args=(duree,), name="profilage-cpu",
+                                     daemon=True).start()
+                elif action == "memoire":
+                    self.instantane_memoire()
+                elif action == "piles":
+                    self.piles_threads()
+                elif action == "arret_memoire" and tracemalloc.is_tracing():
+                    tracemalloc.stop()
+                    self._snapshot = None
+                    print("Profilage : traçage mémoire arrêté")
+            except Exception as e:
+                print(f"Erreur profilage ({action}): {e}")
+
+    def _chemin(self, nom):
+        os.makedirs(self.dossier, exist_ok=True)
+        return os.path.join(self.dossier, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{nom}")
+
+    # --- Captures ---
+
+    def profiler_cpu(self, duree=DUREE_CPU):
+        """Profil de tous les threads pendant `duree` secondes, retourne le chemin du .prof"""
+        if not self._cpu_lock.acquire(blocking=False):
+            print("Profilage : profil CPU déjà en cours, demande ignorée")
+            return None
+        try:
+            self._arret_cpu.clear()
+            print(f"Profilage : profil CPU de {duree:.0f} s...")
+            profil = ProfilEchantillonne(exclure={threading.get_ident()})
+            profil.executer(duree, self._arret_cpu)
+
+            base = self._chemin("cpu")
+            stats = pstats.Stats(profil)
+            stats.dump_stats(base + ".prof")
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(f"Échantillonnage : {profil.echantillons} relevés toutes les "
+                        f"{profil.intervalle * 1000:.0f} ms (temps = relevés x intervalle, temps mur : "
+                        f"les threads en attente comptent dans wait/get/recv)\n")
+                stats.stream = f
+                stats.sort_stats("tottime").print_stats(LIGNES_RAPPORT)
+                stats.sort_stats("cumulative").print_stats(LIGNES_RAPPORT)
+            with open(base + ".folded", "w", encoding="utf-8") as f:
+                for pile, n in profil.piles.most_common():
+                    f.write(f"{pile} {n}\n")
+            print(f"✓ Profil CPU écrit : {base}.prof")
+            return base + ".prof"
+        finally:
+            self._cpu_lock.release()
+
+    def instantane_memoire(self):
+        """Allocations tracemalloc et objets par type, comparés à l'instantané précédent"""
+        gc.collect()
+        types = Counter(type(objet).__name__ for objet in gc.get_objects())
+        chemin = self._chemin("memoire.txt")
+        with open(chemin, "w", encoding="utf-8") as f:
+            rss = _rss_ko()
+            f.write(f"RSS : {rss / 1024:.1f} Mo\n" if rss else "RSS : inconnu\n")
+            f.write(f"Threads vivants : {threading.active_count()}\n\n")
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(PROFONDEUR_MEMOIRE)
+                f.write("Traçage tracemalloc démarré : les allocations seront comparées à partir du prochain instantané\n")
+            else:
+                snapshot = tracemalloc.take_snapshot().filter_traces((
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                ))
+                actuelle, pic = tracemalloc.get_traced_memory()
+                f.write(f"Mémoire tracée : {actuelle / 1024:.0f} Ko (pic {pic / 1024:.0f} Ko)\n\n")
+                f.write("--- Plus grosses allocations (ligne) ---\n")
+                for stat in snapshot.statistics("lineno")[:LIGNES_RAPPORT]:
+                    f.write(f"{stat}\n")
+                if self._snapshot is not None:
+                    f.write("\n--- Évolution depuis l'instantané précédent (ligne) ---\n")
+                    for stat in snapshot.compare_to(self._snapshot, "lineno")[:LIGNES_RAPPORT]:
+                        f.write(f"{stat}\n")
+                    f.write("\n--- Plus forte croissance (pile) ---\n")
+                    for stat in snapshot.compare_to(self._snapshot, "traceback")[:5]:
+                        f.write(f"{stat}\n" + "\n".join(stat.traceback.format()) + "\n\n")
+                self._snapshot = snapshot
+
+            f.write("\n--- Objets vivants par type ---\n")
+            for nom, n in types.most_common(LIGNES_RAPPORT):
+                delta = f" ({n - self._types.get(nom, 0):+d})" if self._types is not None else ""
+                f.write(f"{nom:<40} {n:>9}{delta}\n")
+        self._types = types
+        print(f"✓ Instantané mémoire écrit : {chemin}")
+        return chemin
+
+    def piles_threads(self):
+        """Pile courante de chaque thread vivant"""
+        threads = {thread.ident: thread for thread in threading.enumerate()}
+        chemin = self._chemin("piles.txt")
+        with open(chemin, "w", encoding="utf-8") as f:
+            trames = sys._current_frames()
+            f.write(f"{len(trames)} thread(s)\n")
+            for nom, n in Counter(t.name.split(" ")[0] for t in threads.values()).most_common():
+                f.write(f"  {nom} x{n}\n")
+            for ident, trame in trames.items():
+                thread = threads.get(ident)
+                nom = thread.name if thread else "?"
+                demon = " (daemon)" if thread is not None and thread.daemon else ""
+                f.write(f"\n--- {nom}{demon} [{ident}] ---\n")
+                f.write("".join(traceback.format_stack(trame)))
+        print(f"✓ Piles des threads écrites : {chemin}")
+        return chemin
+
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from hardware.ipc import ClientIPC
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("cpu", "memoire", "piles", "arret"):
+        print("Usage: python3 hardware/profilage.py cpu [secondes] | memoire | piles | arret")
+        sys.exit(1)
+    message = {"type": "PROFILAGE", "action": sys.argv[1]}
+    if len(sys.argv) > 2:
+        message["duree"] = sys.argv[2]
+    client = ClientIPC().start()
+    if not client.attendre_connexion(2):
+        print("Processus RFID injoignable (data/rfid.sock)")
+        sys.exit(1)
+    reponse = client.demander(message)
+    if not reponse or not reponse.get("ok"):
+        print(f"Refusé : {(reponse or {}).get('erreur', 'pas de réponse')}")
+        sys.exit(1)
+    print(f"Demande acceptée, résultat dans {reponse.get('dossier', PROFILS_DIR)}")
@@ -1,215 +1,187 @@
 import time
-import json
 import os
-from datetime import datetime
-from mfrc522 import MFRC522
-import RPi.GPIO as GPIO
+import threading
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from models.user_manager import UserManager
-from models.emprunt_manager import EmpruntManager
-from models.locker_manager import LockerManager
+from models.stockage import ouvrir_stockage
 from hardware.arduino_comm import ArduinoComm
 from hardware.lcd_display import LCDDisplay
+from hardware.rfid_reader import LecteurMFRC522, LecteursBancs, AntiRebond, IRQ_PIN
+from hardware.ipc import ServeurIPC
+from hardware.pipeline import PipelinePassage
+from hardware.profilage import Profileur
+from config import obtenir_config
+import metriques
+
+
+def creer_lecteur(flotte=None):
+    """Un MFRC522 par banc si la flotte en déclare ("rfid" dans flotte.json), sinon le lecteur commun"""
+    bancs = [banc for banc in flotte.bancs if banc.rfid] if flotte is not None else []
+    if not bancs:
+        return LecteurMFRC522()
+    lecteurs = {}
+    for banc in bancs:
+        irq = banc.rfid.get("irq", IRQ_PIN)  # null : pas d'IRQ câblée, polling
+        lecteurs[banc.nom] = LecteurMFRC522(irq_pin=irq, utiliser_irq=irq is not None,
+                                            bus=banc.rfid.get("bus", 0), device=banc.rfid.get("device", 0))
+    return LecteursBancs(lecteurs)
+
 
 class RFIDManager:
-    def __init__(self):
-        self.reader = MFRC522()
-        self.user_mgr = UserManager()
-        self.emprunt_mgr = EmpruntManager()
-        self.locker_mgr = LockerManager()
-        self.lcd = LCDDisplay()
-        self.arduino = ArduinoComm(self.lcd)
+    def __init__(self, reader=None, lcd=None, arduino=None, stockage=None, ipc=None, surveiller_config=True):
+        # Pilotes injectables : hardware/simulation.py fournit lecteur, LCD, Arduino et haut-parleur simulés
+        self.config = obtenir_config()
+        self.stockage = stockage or ouvrir_stockage()
+        self.user_mgr = self.stockage.users
+        self.emprunt_mgr = self.stockage.emprunts
+        self.locker_mgr = self.stockage.casiers
+        self.lcd = lcd or LCDDisplay()
+        self.arduino = arduino or ArduinoComm()  # Les messages LCD d'ouverture sont déposés par le pipeline
+        # Attribution des casiers : seuls ceux de la flotte, répartis par banc, proches du lecteur
+        flotte = getattr(self.arduino, 'flotte', None)
+        if flotte is not None:
+            self.locker_mgr.reserve.regrouper(flotte.groupes(), flotte.lecteurs())
+            self.arduino.usure = self.locker_mgr.reserve  # Usure : seules les ouvertures acquittées comptent
+        # Un lecteur par banc (les emprunts vont au banc du lecteur) ou un lecteur commun
+        self.reader = reader or creer_lecteur(flotte)
+        
+        # Autorisation, persistance et actionnement tournent dans leurs propres threads
+        self.pipeline = PipelinePassage(self.stockage, self.arduino, self.lcd, publier=self.publier_resultat,
+                                        delai_actionnement=self.config.delai_actionnement)
+        self.pipeline.start()
         
-        self.state_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'rfid_state.json')
-        self.association_timeout = 20
+        # Demandes d'association poussées par le web via le canal IPC (plus de fichier d'état)
+        self.association_timeout = self.config.association_timeout
+        self._association = None  # {"mail": ..., "timestamp": ...}
+        self._association_lock = threading.Lock()
+        self.ipc = ipc or ServeurIPC()
+        self.ipc.on("ASSOCIATION", self._on_association)
+        self.ipc.start()
+        self.poll_interval = self.config.poll_interval  # Attente max d'une carte avant de revérifier l'état d'association
         
-        self.last_uid = None
-        self.last_read_time = 0
-        self.cooldown_duration = 5
-        self.is_processing = False
+        # Une carte laissée sur le lecteur est ignorée, une autre carte passe tout de suite
+        self.anti_rebond = AntiRebond(self.config.fenetre_rebond)
+        self.ipc.on("ANTI_REBOND", lambda message: self.anti_rebond.compteurs())
+        # Compteurs et histogrammes du chemin de passage, exposés par /metrics des applications Flask
+        self.ipc.on("METRIQUES", lambda message: {"texte": metriques.exposer()})
+        # Profilage à chaud (data/profiles/) : kill -USR1 / -USR2, ou demande IPC "PROFILAGE"
+        self.profileur = Profileur().start()
+        self.ipc.on("PROFILAGE", self.profileur.traiter_ipc)
+
+        # Réglages rechargés à chaud (SIGHUP ou modification de data/config.json), sans arrêter la boucle
+        self.config.abonner(self.appliquer_config)
+        thread_principal = threading.current_thread() is threading.main_thread()
+        if surveiller_config:
+            self.config.surveiller(sighup=thread_principal)
+        if thread_principal:
+            self.profileur.installer_signaux()
+        self._actif = True
+
+    def appliquer_config(self, modifies):
+        """Applique les paramètres rechargeables qui ont changé (thread de surveillance de la config)"""
+        if 'poll_interval' in modifies:
+            self.poll_interval = modifies['poll_interval']
+        if 'association_timeout' in modifies:
+            self.association_timeout = modifies['association_timeout']
+        if 'fenetre_rebond' in modifies:
+            self.anti_rebond.fenetre = modifies['fenetre_rebond']
+        if 'delai_actionnement' in modifies:
+            self.pipeline.delai_actionnement = modifies['delai_actionnement']
+        if 'ack_timeout' in modifies:
+            self.arduino.regler_ack_timeout(modifies['ack_timeout'])
+        if 'volume' in modifies:
+            self.arduino.speaker.set_volume(modifies['volume'])
+        if 'volume_systeme' in modifies:
+            self.arduino.speaker.set_system_volume(modifies['volume_systeme'])
 
     def read_uid_no_block(self):
         """Tente de lire un UID sans bloquer, avec le format SimpleMFRC522"""
-        (status, TagType) = self.reader.MFRC522_Request(self.reader.PICC_REQIDL)
-        
-        if status == self.reader.MI_OK:
-            (status, uid_bytes) = self.reader.MFRC522_Anticoll()
-            if status == self.reader.MI_OK:
-                # 4 premiers octets transformés en int
-                n = 0
-                for i in range(0, 4):
-                    n = n << 8
-                    n = n | uid_bytes[i]
-                return n
-        return None
+        return self.reader.attendre_carte(0)
+
+    def _on_association(self, message):
+        """Demande d'association reçue du web (thread IPC)"""
+        mail = message.get("mail")
+        if not mail:
+            return {"ok": False, "erreur": "mail manquant"}
+        with self._association_lock:
+            self._association = {"mail": mail, "timestamp": message.get("timestamp") or time.time()}
+        print(f"Demande d'association reçue pour {mail}")
+        return {"ok": True}
 
     def get_pending_association(self):
-        """Vérifie si Flask a demandé une association dans le fichier JSON"""
-        if not os.path.exists(self.state_file):
+        """Retourne le mail en attente d'association (état en mémoire, aucun accès disque)"""
+        with self._association_lock:
+            data = self._association
+        if data is None:
             return None
-        
-        try:
-            with open(self.state_file, 'r') as f:
-                data = json.load(f)
-            
-            if data.get('mode') == 'ASSOCIATION':
-                start_time = data.get('timestamp', 0)
-                if time.time() - start_time < self.association_timeout:
-                    return data.get('mail')
-                else:
-                    self.reset_state()
-        except Exception as e:
-            print(f"Erreur lecture state: {e}")
+        if time.time() - data["timestamp"] < self.association_timeout:
+            return data["mail"]
+        self.reset_state("TIMEOUT")
         return None
 
-    def reset_state(self):
+    def reset_state(self, mode="NORMAL"):
         """Repasse le système en mode normal"""
-        try:
-            with open(self.state_file, 'w') as f:
-                json.dump({"mode": "NORMAL"}, f)
-        except Exception as e:
-            print(f"Erreur écriture state: {e}")
+        with self._association_lock:
+            self._association = None
+        self.ipc.publier({"type": mode})
 
-    def handle_normal_mode(self, uid):
-        """Logique d'emprunt/rendu classique"""
-        try:
-            self.lcd.write("Veuillez", "patienter...")
-        except OSError as e:
-            self.lcd.cursor_mode = 'hide'
-            print(f"Erreur LCD: {e}")
-        
-        mail = self.user_mgr.get_mail_by_uid(uid)
-        
-        if not mail:
-            print(f"ID {uid} inconnu. Veuillez scanner le QR Code sur le casier.")
-            try:
-                self.lcd.write("Utilisateur", "inconnu")
-                time.sleep(3)
-                self.lcd.write("Scannez le", "QR code")
-            except OSError:
-                self.lcd.cursor_mode = 'hide'
-                pass
-            return
-
-        print(f"Utilisateur reconnu : {mail}")
-        
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        if self.emprunt_mgr.get_emprunt(mail):
-            print("Action : Rendu de matériel")
-            
-            id_casier = self.emprunt_mgr.get_casier_en_cours(mail)
-            if not id_casier:
-                print("Erreur: emprunt EN COURS mais id_casier introuvable")
-                self.lcd.start_alternating()
-                return
-            
-            print(f"Ouverture du casier {id_casier}...")
-            self.arduino.envoyer_commande(id_casier, "OUVRIR")
-            self.emprunt_mgr.cloturer_emprunt(mail, now)
-            
-            self.locker_mgr.casier_plein(id_casier)
-            print(f"✓ Casier {id_casier} rendu et libéré")
-            return
-        
-        print("Action : Nouvel emprunt")
-        
-        id_casier = self.locker_mgr.get_premier_libre()
-        if id_casier is None:
-            print("Désolé, aucun casier n'est disponible.")
-            self.lcd.write_temporary("Aucun casier", "disponible", 3)
-            return
-        
-        id_casier = int(id_casier)
-        print(f"Attribution du casier {id_casier}...")
-        self.arduino.envoyer_commande(id_casier, "OUVRIR")
-        
-        ok = self.emprunt_mgr.creer_emprunt(mail, id_casier, now)
-        if not ok:
-            print("Impossible de créer l'emprunt (déjà un emprunt en cours?)")
-            self.lcd.start_alternating()
-            return
-        
-        self.locker_mgr.casier_vide(id_casier)
-        print(f"✓ Casier {id_casier} attribué à {mail}")
+    def publier_resultat(self, mode, **infos):
+        """Pousse le résultat d'une association au web (appelé par le pipeline)"""
+        self.ipc.publier(dict(infos, type=mode, timestamp=time.time()))
+
+    def prendre_association(self):
+        """Retire la demande d'association en cours : une seule carte lui sera associée"""
+        with self._association_lock:
+            data, self._association = self._association, None
+        return data["mail"] if data else None
+
+    def handle_normal_mode(self, uid, banc=None):
+        """Logique d'emprunt/rendu classique, déléguée au pipeline (retour immédiat)"""
+        self.pipeline.soumettre(uid, banc=banc)
+
+    def arreter(self):
+        """Demande la fin de run() (depuis un autre thread) : la boucle s'arrête au plus tard après poll_interval"""
+        self._actif = False
 
     def run(self):
         print("--- Système iRobot RFID prêt (Mode Réactif) ---")
         try:
-            while True:
+            while self._actif:
                 pending_mail = self.get_pending_association()
                 
                 if pending_mail and not hasattr(self, '_association_msg_shown'):
-                    self.lcd.write("Enregistrez", "votre carte")
+                    self.pipeline.afficher("Enregistrez", "votre carte")
                     self._association_msg_shown = True
                 elif not pending_mail and hasattr(self, '_association_msg_shown'):
-                    self.lcd.start_alternating()
+                    self.pipeline.afficher_defaut()
                     delattr(self, '_association_msg_shown')
                 
-                current_time = time.time()
-                if self.is_processing and (current_time - self.last_read_time) < self.cooldown_duration:
-                    time.sleep(0.1)
-                    continue
+                # Bloque (IRQ ou polling adaptatif) jusqu'à une carte ou poll_interval
+                uid, banc = self.reader.attendre_passage(self.poll_interval)
                 
-                if self.is_processing:
-                    self.is_processing = False
-                    print("Lecteur RFID réactivé")
-                
-                uid = self.read_uid_no_block()
-                
-                if uid:
-                    self.is_processing = True
-                    self.last_uid = uid
-                    self.last_read_time = current_time
-                    print(f"Carte détectée - Lecteur RFID bloqué pour {self.cooldown_duration}s")
-                    
-                    if pending_mail:
-                        print(f"\n>>> ASSOCIATION : Carte {uid} pour {pending_mail}")
-                        success = self.user_mgr.register_user(uid, pending_mail)
-                        
-                        if success:
-                            print(f"✓ Succès ! Carte {uid} associée à {pending_mail}")
-                            self.lcd.write_temporary("Succes !", "", 3)
-                            try:
-                                with open(self.state_file, 'w') as f:
-                                    json.dump({
-                                        "mode": "SUCCESS",
-                                        "mail": pending_mail,
-                                        "uid": uid,
-                                        "timestamp": time.time()
-                                    }, f)
-                            except Exception as e:
-                                print(f"Erreur écriture succès: {e}")
-                        else:
-                            print("✗ Erreur : Carte ou Email déjà enregistré.")
-                            self.lcd.write_temporary("Carte deja", "enregistree", 3)
-                            try:
-                                with open(self.state_file, 'w') as f:
-                                    json.dump({
-                                        "mode": "ERROR",
-                                        "mail": pending_mail,
-                                        "message": "Carte ou email déjà enregistré",
-                                        "timestamp": time.time()
-                                    }, f)
-                            except Exception as e:
-                                print(f"Erreur écriture erreur: {e}")
-                        
-                        delattr(self, '_association_msg_shown')
+                if uid and self.anti_rebond.accepter(uid):
+                    association = self.prendre_association() if pending_mail else None
+                    if association:
+                        self.pipeline.soumettre(uid, association=association)
+                        if hasattr(self, '_association_msg_shown'):
+                            delattr(self, '_association_msg_shown')
                     else:
-                        print(f"\n--- Carte détectée : {uid} ---")
-                        self.handle_normal_mode(uid)
-                
-                time.sleep(0.1)
+                        print(f"\n--- Carte détectée : {uid}" + (f" (banc {banc})" if banc else "") + " ---")
+                        self.handle_normal_mode(uid, banc)
                 
         except KeyboardInterrupt:
             print("\n\nArrêt du système...")
         finally:
+            print(f"Anti-rebond : {self.anti_rebond.compteurs()}")
             print("Nettoyage GPIO...")
+            self.ipc.stop()
+            self.pipeline.stop()
+            self.arduino.fermer()
+            self.stockage.fermer()
             self.lcd.cleanup()
-            GPIO.cleanup()
+            self.reader.fermer()
 
 if __name__ == "__main__":
     manager = RFIDManager()
@@ -0,0 +1,290 @@
+"""
+Lecteurs RFID interchangeables.
+
+→ LecteurMFRC522 : lecteur réel. Détection par l'IRQ du MFRC522 (front descendant via gpiozero),
+  avec repli automatique sur un polling adaptatif si l'IRQ n'est pas câblée/disponible.
+→ LecteurFactice : UID injectés par programme (tests, machine sans GPIO).
+→ LecteursBancs : un lecteur par banc de casiers (flotte), chaque carte lue avec le banc de son lecteur.
+→ AntiRebond : filtre les relectures d'une carte restée sur le lecteur (par UID).
+
+Les lecteurs implémentent LecteurRFID.attendre_carte(timeout) : bloque jusqu'à une carte ou le timeout,
+sans occuper le CPU, et retourne l'UID (format SimpleMFRC522) ou None. attendre_passage(timeout)
+retourne en plus le banc du lecteur qui a lu la carte, (None, None) sans carte.
+"""
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+import metriques
+
+IRQ_PIN = 24            # GPIO24 (BCM) / broche 18 : câblage usuel de la broche IRQ du MFRC522
+REARM_INTERVAL = 0.05   # En mode IRQ, la détection est relancée par le MFRC522 toutes les 50 ms
+POLL_MIN = 0.02         # Polling adaptatif : intervalle juste après une activité...
+POLL_MAX = 0.25         # ... qui s'allonge jusqu'à ce maximum quand personne ne passe
+POLL_FACTEUR = 1.5
+FENETRE_REBOND = 3.0    # Une même carte relue dans cette fenêtre est ignorée
+PALIERS_REBOND = (0.25, 0.5, 1.0, 2.0, 3.0, 5.0)  # Histogramme des écarts entre deux lectures d'un UID
+
+# Registres et commandes du MFRC522 (datasheet NXP, §9)
+COMMAND_REG = 0x01
+COM_IEN_REG = 0x02
+COM_IRQ_REG = 0x04
+FIFO_DATA_REG = 0x09
+BIT_FRAMING_REG = 0x0D
+PCD_TRANSCEIVE = 0x0C
+PICC_REQA = 0x26
+
+LECTURE_CARTE = metriques.histogramme("irobot_lecture_carte_secondes",
+                                      "Lecture d'un UID sur le MFRC522 (requête + anticollision)")
+LECTURES = metriques.compteur("irobot_lectures_total", "Lectures de carte présentées à l'anti-rebond")
+REBONDS = metriques.compteur("irobot_rebonds_ignores_total", "Relectures ignorées par l'anti-rebond")
+
+
+def uid_depuis_octets(uid_bytes):
+    """4 premiers octets transformés en int (format SimpleMFRC522)"""
+    n = 0
+    for i in range(0, 4):
+        n = n << 8
+        n = n | uid_bytes[i]
+    return n
+
+
+class LecteurRFID(ABC):
+    """Interface commune des lecteurs (mode : "irq", "polling", "factice"... affiché au démarrage)"""
+
+    mode = "inconnu"
+    banc = None  # Banc de casiers devant lequel est le lecteur (None : un seul lecteur)
+
+    @abstractmethod
+    def attendre_carte(self, timeout):
+        """Bloque au plus `timeout` secondes, retourne l'UID de la carte présentée ou None"""
+
+    def attendre_passage(self, timeout):
+        """(uid, banc du lecteur) ou (None, None)"""
+        uid = self.attendre_carte(timeout)
+        return (uid, self.banc) if uid else (None, None)
+
+    def fermer(self):
+        pass
+
+
+class LecteurMFRC522(LecteurRFID):
+    def __init__(self, irq_pin=IRQ_PIN, utiliser_irq=True, bus=0, device=0):
+        from mfrc522 import MFRC522
+
+        self.reader = MFRC522(bus=bus, device=device)  # Plusieurs lecteurs : un chip select SPI chacun
+        self.mode = "polling"
+        self._carte = threading.Event()
+        self._irq = None
+        self._intervalle = POLL_MIN
+
+        if utiliser_irq:
+            try:
+                from gpiozero import Button
+
+                # IRQ active à l'état bas (IRqInv) : front descendant = "pressed"
+                self._irq = Button(irq_pin, pull_up=True)
+                self._irq.when_pressed = self._carte.set
+                self._armer_irq()
+                self.mode = "irq"
+                print(f"Lecteur RFID (SPI{bus}.{device}) : détection par IRQ (GPIO{irq_pin})")
+            except Exception as e:
+                print(f"⚠ IRQ RFID indisponible, repli sur le polling adaptatif ({e})")
+                self._irq = None
+        if self.mode == "polling":
+            print(f"Lecteur RFID (SPI{bus}.{device}) : polling adaptatif")
+
+    def lire_uid(self):
+        """Tente de lire un UID sans bloquer, avec le format SimpleMFRC522"""
+        debut = time.perf_counter()
+        (status, TagType) = self.reader.MFRC522_Request(self.reader.PICC_REQIDL)
+
+        if status == self.reader.MI_OK:
+            (status, uid_bytes) = self.reader.MFRC522_Anticoll()
+            if status == self.reader.MI_OK:
+                LECTURE_CARTE.observer(time.perf_counter() - debut)  # Seules les lectures réussies sont mesurées
+                return uid_depuis_octets(uid_bytes)
+        return None
+
+    def _armer_irq(self):
+        """Active l'IRQ de réception et demande au MFRC522 d'émettre un REQA"""
+        self.reader.Write_MFRC522(COM_IEN_REG, 0xA0)     # IRqInv + RxIEn
+        self.reader.Write_MFRC522(COM_IRQ_REG, 0x7F)     # Efface les interruptions en attente
+        self.reader.Write_MFRC522(FIFO_DATA_REG, PICC_REQA)
+        self.reader.Write_MFRC522(COMMAND_REG, PCD_TRANSCEIVE)
+        self.reader.Write_MFRC522(BIT_FRAMING_REG, 0x87)  # StartSend, trame courte de 7 bits
+
+    def attendre_carte(self, timeout):
+        if self.mode == "irq":
+            return self._attendre_irq(timeout)
+        return self._attendre_polling(timeout)
+
+    def _attendre_irq(self, timeout):
+        fin = time.monotonic() + timeout
+        while True:
+            restant = fin - time.monotonic()
+            if restant <= 0:
+                return None
+            if self._carte.wait(min(REARM_INTERVAL, restant)):
+                self._carte.clear()
+                self.reader.Write_MFRC522(COM_IRQ_REG, 0x7F)
+                uid = self.lire_uid()
+                self._armer_irq()
+                if uid:
+                    return uid
+            else:
+                self._armer_irq()
+
+    def _attendre_polling(self, timeout):
+        fin = time.monotonic() + timeout
+        while True:
+            uid = self.lire_uid()
+            if uid:
+                self._intervalle = POLL_MIN
+                return uid
+            restant = fin - time.monotonic()
+            if restant <= 0:
+                return None
+            time.sleep(min(self._intervalle, restant))
+            self._intervalle = min(self._intervalle * POLL_FACTEUR, POLL_MAX)
+
+    def fermer(self):
+        if self._irq is not None:
+            self._irq.close()
+        try:
+            import RPi.GPIO as GPIO
+            GPIO.cleanup()
+        except Exception:
+            pass
+
+
+class LecteurFactice(LecteurRFID):
+    """Lecteur sans matériel : les cartes sont "présentées" par programme"""
+
+    mode = "factice"
+
+    def __init__(self, uids=()):
+        self._cartes = queue.Queue()
+        for uid in uids:
+            self.presenter(uid)
+
+    def presenter(self, uid):
+        self._cartes.put(uid)
+
+    def attendre_carte(self, timeout):
+        try:
+            return self._cartes.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LecteursBancs(LecteurRFID):
+    """
+    Un lecteur par banc ({nom du banc: lecteur}) : chaque lecteur attend les cartes dans son propre thread,
+    les passages sont regroupés dans une file et lus avec le banc de leur lecteur (attendre_passage).
+    """
+
+    mode = "bancs"
+    ATTENTE = 0.25  # Attente max d'un lecteur avant de revérifier l'arrêt
+
+    def __init__(self, lecteurs):
+        self.lecteurs = dict(lecteurs)
+        self._passages = queue.Queue()
+        self._actif = True
+        self._threads = []
+        for banc, lecteur in self.lecteurs.items():
+            lecteur.banc = banc
+            thread = threading.Thread(target=self._ecouter, args=(lecteur,), name=f"rfid-{banc}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _ecouter(self, lecteur):
+        while self._actif:
+            try:
+                uid = lecteur.attendre_carte(self.ATTENTE)
+            except Exception as e:
+                print(f"⚠ Lecteur du banc {lecteur.banc} : {e}")
+                time.sleep(self.ATTENTE)
+                continue
+            if uid:
+                self._passages.put((uid, lecteur.banc))
+
+    def attendre_passage(self, timeout):
+        try:
+            return self._passages.get(timeout=timeout)
+        except queue.Empty:
+            return None, None
+
+    def attendre_carte(self, timeout):
+        return self.attendre_passage(timeout)[0]
+
+    def fermer(self):
+        self._actif = False
+        for thread in self._threads:
+            thread.join(timeout=2 * self.ATTENTE)
+        for lecteur in self.lecteurs.values():
+            lecteur.fermer()
+
+
+class AntiRebond:
+    """
+    Anti-rebond par UID : une carte relue moins de `fenetre` s après sa dernière lecture est ignorée
+    (la fenêtre glisse tant que la carte reste sur le lecteur), une autre carte passe immédiatement.
+
+    Les compteurs servent à régler la fenêtre : écarts entre deux lectures d'un même UID,
+    relectures ignorées, et "passages" acceptés peu après la fin de la fenêtre (fenêtre trop courte ?).
+    """
+
+    def __init__(self, fenetre=FENETRE_REBOND, horloge=time.monotonic):
+        self.fenetre = fenetre
+        self._horloge = horloge
+        self._vus = OrderedDict()  # uid -> dernière lecture, du plus ancien au plus récent
+        self._lock = threading.Lock()
+        self.lectures = 0
+        self.acceptees = 0
+        self.ignorees = 0
+        self.acceptees_juste_apres = 0  # Relecture acceptée moins de 2 fenêtres après la précédente
+        self.ecarts = {palier: 0 for palier in PALIERS_REBOND + (float("inf"),)}
+
+    def accepter(self, uid):
+        """True si la lecture est un nouveau passage, False si c'est un rebond"""
+        maintenant = self._horloge()
+        with self._lock:
+            self.lectures += 1
+            LECTURES.inc()
+            self._purger(maintenant)
+            precedente = self._vus.pop(uid, None)
+            self._vus[uid] = maintenant
+
+            if precedente is not None:
+                ecart = maintenant - precedente
+                self.ecarts[next(p for p in self.ecarts if ecart <= p)] += 1
+                if ecart < self.fenetre:
+                    self.ignorees += 1
+                    REBONDS.inc()
+                    return False
+                self.acceptees_juste_apres += 1
+            self.acceptees += 1
+            return True
+
+    def _purger(self, maintenant):
+        """Oublie les UID plus vus depuis 2 fenêtres (gardés au-delà d'une pour les compteurs)"""
+        limite = maintenant - 2 * self.fenetre
+        while self._vus:
+            uid, vu = next(iter(self._vus.items()))
+            if vu >= limite:
+                break
+            del self._vus[uid]
+
+    def compteurs(self):
+        with self._lock:
+            return {
+                "fenetre_s": self.fenetre,
+                "lectures": self.lectures,
+                "acceptees": self.acceptees,
+                "ignorees": self.ignorees,
+                "acceptees_juste_apres": self.acceptees_juste_apres,
+                "ecarts": {("+inf" if p == float("inf") else f"<={p}s"): n for p, n in self.ecarts.items()},
+            }
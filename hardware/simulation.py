@@ -0,0 +1,196 @@
+"""
+Borne simulée : faire tourner RFIDManager sans Raspberry Pi.
+
+→ LecteurScripte : UID présentés à des instants programmés (remplace le MFRC522)
+→ ArduinoFactice : pty qui acquitte chaque octet de relais après un délai réglable (hardware/arduino_factice.py)
+→ PiloteLCDMemoire : pilote LCD en mémoire, derrière le vrai LCDDisplay (diff, priorités, expiration)
+→ SpeakerNul : compte les annonces sans son
+
+    manager, simulation = creer_borne_simulee(data_dir)
+    manager.reader.programmer([(0.0, "123"), (1.5, "456")])
+    threading.Thread(target=manager.run).start()
+    ...
+    manager.arreter(); simulation.fermer()
+"""
+import bisect
+import csv
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from hardware.arduino_comm import ArduinoComm, MAX_CHANNEL
+from hardware.arduino_factice import ArduinoFactice
+from hardware.flotte import Banc, Flotte
+from hardware.ipc import ServeurIPC
+from hardware.lcd_display import LCDDisplay, COLS, ROWS
+from hardware.rfid_reader import LecteurRFID, LecteursBancs
+from models.stockage import ouvrir_stockage
+
+
+class LecteurScripte(LecteurRFID):
+    """Lecteur dont les cartes arrivent aux instants d'un script [(secondes depuis le départ, uid), ...]"""
+
+    mode = "scripte"
+
+    def __init__(self, script=()):
+        self._script = []  # Tas (instant monotonic, ordre, uid)
+        self._ordre = itertools.count()
+        self._condition = threading.Condition()
+        self.presentations = {}  # uid -> instants de présentation, croissants (mesure de latence)
+        self.programmer(script)
+
+    def programmer(self, script, depart=None):
+        depart = time.monotonic() if depart is None else depart
+        with self._condition:
+            for decalage, uid in script:
+                heapq.heappush(self._script, (depart + decalage, next(self._ordre), str(uid)))
+            self._condition.notify()
+
+    def presentation(self, uid, avant):
+        """Instant de la dernière présentation de uid avant `avant` (début du passage lu à cet instant)"""
+        instants = self.presentations.get(uid, ())
+        i = bisect.bisect_right(instants, avant)
+        return instants[i - 1] if i else None
+
+    def restantes(self):
+        with self._condition:
+            return len(self._script)
+
+    def attendre_carte(self, timeout):
+        limite = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                maintenant = time.monotonic()
+                if self._script and self._script[0][0] <= maintenant:
+                    instant, _, uid = heapq.heappop(self._script)
+                    self.presentations.setdefault(uid, []).append(instant)
+                    return uid
+                if maintenant >= limite:
+                    return None
+                prochaine = self._script[0][0] if self._script else limite
+                self._condition.wait(min(prochaine, limite) - maintenant)
+
+
+class PiloteLCDMemoire:
+    """Même interface que RPLCD CharLCD (clear, cursor_pos, write_string), écran gardé en mémoire"""
+
+    def __init__(self, cols=COLS, rows=ROWS):
+        self.cols = cols
+        self.lignes = [[" "] * cols for _ in range(rows)]
+        self.cursor_pos = (0, 0)
+        self.caracteres_ecrits = 0
+
+    def clear(self):
+        for ligne in self.lignes:
+            ligne[:] = [" "] * self.cols
+        self.cursor_pos = (0, 0)
+
+    def write_string(self, texte):
+        row, col = self.cursor_pos
+        for caractere in texte:
+            if col < self.cols:
+                self.lignes[row][col] = caractere
+            col += 1
+        self.caracteres_ecrits += len(texte)
+        self.cursor_pos = (row, col)
+
+    def ecran(self):
+        return ["".join(ligne) for ligne in self.lignes]
+
+
+class SpeakerNul:
+    """Haut-parleur muet : même interface que Speaker"""
+
+    initialized = False
+
+    def __init__(self):
+        self.annonces = []
+        self.volume = 1.0
+
+    def annoncer_casier(self, id_casier):
+        self.annonces.append(int(id_casier))
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+    def set_system_volume(self, volume):
+        pass
+
+    def play_sound(self, file_path, duration=None):
+        pass
+
+    def stop(self):
+        pass
+
+    def cleanup(self):
+        pass
+
+
+def preparer_donnees(data_dir, nb_casiers, utilisateurs):
+    """CSV de départ : nb_casiers casiers PLEIN, utilisateurs {uid: mail}, aucun emprunt"""
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, 'casiers.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id_casier', 'etat'])
+        for id_casier in range(1, nb_casiers + 1):
+            writer.writerow([id_casier, 'PLEIN'])
+    with open(os.path.join(data_dir, 'utilisateurs.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['uid', 'mail', 'date_inscription'])
+        for uid, mail in utilisateurs.items():
+            writer.writerow([uid, mail, '2026-01-05 09:00:00'])
+    with open(os.path.join(data_dir, 'emprunts.csv'), 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerow(['mail', 'id_casier', 'timestamp', 'statut', 'timestamp_fin'])
+
+
+class Simulation:
+    """Les éléments simulés d'une borne, à fermer après RFIDManager"""
+
+    def __init__(self, arduinos, pilote_lcd, speaker):
+        self.arduinos = arduinos
+        self.pilote_lcd = pilote_lcd
+        self.speaker = speaker
+
+    def fermer(self):
+        for arduino in self.arduinos:
+            arduino.fermer()
+
+
+def creer_borne_simulee(data_dir, nb_casiers=15, utilisateurs=None, delai_relais=0.05, backend=None,
+                        lecteur_par_banc=False):
+    """
+    RFIDManager complet sur matériel simulé : un ArduinoFactice par banc de 15 casiers,
+    stockage réel (CSV ou SQLite) dans data_dir, socket IPC dans data_dir.
+    lecteur_par_banc : un LecteurScripte par banc (manager.reader.lecteurs[nom du banc]) au lieu d'un seul.
+    Retourne (manager, simulation).
+    """
+    from hardware.rfid_manager import RFIDManager
+
+    if utilisateurs is not None:
+        preparer_donnees(data_dir, nb_casiers, utilisateurs)
+    stockage = ouvrir_stockage(backend, data_dir)  # SQLite : base créée à partir des CSV
+
+    arduinos, bancs = [], []
+    for debut in range(1, nb_casiers + 1, MAX_CHANNEL + 1):
+        arduino = ArduinoFactice(delai_reponse=delai_relais)
+        casiers = range(debut, min(debut + MAX_CHANNEL + 1, nb_casiers + 1))
+        arduinos.append(arduino)
+        bancs.append(Banc(f"sim{len(bancs) + 1}", arduino.port, casiers, reset_delay=0))
+
+    pilote_lcd = PiloteLCDMemoire()
+    speaker = SpeakerNul()
+    if lecteur_par_banc:
+        lecteur = LecteursBancs({banc.nom: LecteurScripte() for banc in bancs})
+    else:
+        lecteur = LecteurScripte()
+    manager = RFIDManager(
+        reader=lecteur,
+        lcd=LCDDisplay(driver=pilote_lcd),
+        arduino=ArduinoComm(speaker=speaker, flotte=Flotte(bancs)),
+        stockage=stockage,
+        ipc=ServeurIPC(os.path.join(data_dir, 'rfid.sock')),
+        surveiller_config=False,
+    )
+    return manager, Simulation(arduinos, pilote_lcd, speaker)
@@ -1,97 +1,176 @@
 import os
-os.environ["SDL_AUDIODRIVER"] = "alsa"
+os.environ.setdefault("SDL_AUDIODRIVER", "alsa")
 
 import pygame
 import time
+import queue
+import threading
 import subprocess
 
+import metriques
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "audio")
+NB_CASIERS = 15
+CANAL_ANNONCES = 0      # Canal réservé aux annonces "casier N"
+CANAL_DIVERS = 1        # Canal réservé aux autres sons (tests...)
+DUREE_ANNONCE = 3       # Secondes max d'une annonce
+
+DEMARRAGE_ANNONCE = metriques.histogramme("irobot_demarrage_annonce_secondes",
+                                          "annoncer_casier() -> début de la lecture (file + annonce précédente)")
+
 class Speaker:
-    """Gère la lecture de sons via le haut-parleur USB"""
-    
-    def __init__(self, volume=0.5, system_volume=100):
-        """Initialise pygame mixer pour la lecture audio"""
+    """
+    Gère la lecture de sons via le haut-parleur USB.
+    → Les annonces audio_1.mp3 à audio_15.mp3 sont décodées une seule fois au démarrage (pygame.mixer.Sound)
+    → Un seul thread audio les joue sur un canal réservé : annoncer_casier() ne fait que déposer le numéro
+    """
+
+    def __init__(self, volume=0.5, system_volume=100, audio_dir=AUDIO_DIR):
+        """Initialise pygame mixer et précharge les annonces des casiers"""
 
         self.initialized = False
+        self.volume = volume
+        self.clips = {}  # id_casier -> pygame.mixer.Sound
+        self.derniere_latence = None  # Secondes entre annoncer_casier() et le début de la lecture
+        self._file = queue.Queue()
+        self._worker = None
         try:
             print("🔧 Nettoyage des verrous audio...")
-            subprocess.run("sudo fuser -k /dev/snd/* 2>/dev/null", 
+            subprocess.run("sudo fuser -k /dev/snd/* 2>/dev/null",
                          shell=True, capture_output=True, timeout=3)
             time.sleep(0.5)
-            
+
             pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512)
-            
+            pygame.mixer.set_reserved(2)  # Canaux 0 et 1 : jamais pris par un Sound.play() automatique
+            self._canaux = {CANAL_ANNONCES: pygame.mixer.Channel(CANAL_ANNONCES),
+                            CANAL_DIVERS: pygame.mixer.Channel(CANAL_DIVERS)}
+
             self.initialized = True
             self.set_volume(volume)
             self.set_system_volume(system_volume)
+            self.precharger(audio_dir)
+            self._worker = threading.Thread(target=self._boucle, name="audio", daemon=True)
+            self._worker.start()
             print("✓ Haut-parleur initialisé")
-            
+
         except Exception as e:
             print(f"⚠ Haut-parleur indisponible (mode silencieux activé)")
             print(f"   Détails: {e}")
             self.initialized = False
-    
+
+    def precharger(self, audio_dir=AUDIO_DIR):
+        """Décode une fois pour toutes les annonces des casiers en mémoire"""
+        debut = time.perf_counter()
+        for id_casier in range(1, NB_CASIERS + 1):
+            audio_path = os.path.join(audio_dir, f"audio_{id_casier}.mp3")
+            if not os.path.exists(audio_path):
+                print(f"⚠ Fichier audio introuvable: {audio_path}")
+                continue
+            try:
+                son = pygame.mixer.Sound(audio_path)
+                son.set_volume(self.volume)
+                self.clips[id_casier] = son
+            except Exception as e:
+                print(f"⚠ Décodage impossible de {os.path.basename(audio_path)}: {e}")
+        print(f"🔊 {len(self.clips)} annonce(s) préchargée(s) en {time.perf_counter() - debut:.2f}s")
+
     def set_system_volume(self, volume):
         """Ajuste le volume système du Raspberry Pi"""
 
         if not self.initialized:
             return
-            
+
         try:
             volume = max(0, min(100, volume))
-            subprocess.run(['amixer', 'sset', 'PCM', f'{volume}%'], 
+            subprocess.run(['amixer', 'sset', 'PCM', f'{volume}%'],
                          check=False, capture_output=True, timeout=2)
             print(f"🔊 Volume système réglé à {volume}%")
         except Exception:
             pass  # Ignore silencieusement les erreurs
-    
+
     def set_volume(self, volume):
         """Ajuste le volume de lecture pygame"""
-        
+
         if not self.initialized:
             return
-            
+
         try:
             volume = max(0.0, min(1.0, volume))
+            self.volume = volume
             pygame.mixer.music.set_volume(volume)
+            for son in self.clips.values():
+                son.set_volume(volume)
             print(f"🔊 Volume pygame réglé à {int(volume * 100)}%")
         except Exception:
             pass
-    
+
+    def annoncer_casier(self, id_casier):
+        """Annonce "casier N" (non bloquant : joué par le thread audio)"""
+        if not self.initialized:
+            return
+        self._file.put((int(id_casier), time.perf_counter()))
+
+    def _boucle(self):
+        """Thread audio : joue les annonces l'une après l'autre sur le canal réservé"""
+        canal = self._canaux[CANAL_ANNONCES]
+        while True:
+            demande = self._file.get()
+            if demande is None:
+                return
+            id_casier, t_demande = demande
+            son = self.clips.get(id_casier)
+            if son is None:
+                print(f"⚠ Pas d'annonce préchargée pour le casier {id_casier}")
+                continue
+            # Une annonce en cours n'est pas coupée : la suivante démarre à sa fin
+            while canal.get_busy():
+                time.sleep(0.01)
+            try:
+                canal.play(son, maxtime=DUREE_ANNONCE * 1000)
+                self.derniere_latence = time.perf_counter() - t_demande
+                DEMARRAGE_ANNONCE.observer(self.derniere_latence)
+                print(f"🔊 Annonce du casier {id_casier} ({self.derniere_latence * 1000:.1f} ms)")
+            except Exception as e:
+                print(f"🔊 Erreur lecture audio (non critique): {e}")
+
     def play_sound(self, file_path, duration=None):
-        """Joue un fichier audio"""
+        """Joue un fichier audio (décodé à chaque appel : réservé aux sons hors annonces)"""
 
         if not self.initialized:
             return
-        
+
         try:
             if not os.path.exists(file_path):
                 return
-            
-            pygame.mixer.music.load(file_path)
-            pygame.mixer.music.play()
+
+            son = pygame.mixer.Sound(file_path)
+            son.set_volume(self.volume)
+            self._canaux[CANAL_DIVERS].play(son, maxtime=int(duration * 1000) if duration else 0)
             print(f"🔊 Lecture de: {os.path.basename(file_path)}")
-            
+
             if duration:
                 time.sleep(duration)
-                pygame.mixer.music.stop()
-                    
+
         except Exception as e:
             print(f"🔊 Erreur lecture audio (non critique): {e}")
-    
+
     def stop(self):
         """Arrête la lecture en cours"""
         if self.initialized:
             try:
-                pygame.mixer.music.stop()
+                pygame.mixer.stop()
             except Exception:
                 pass
-    
+
     def cleanup(self):
         """Libère les ressources"""
         if self.initialized:
             try:
-                pygame.mixer.music.stop()
-                pygame.mixer.music.unload()
+                self._file.put(None)
+                if self._worker:
+                    self._worker.join(timeout=1)
+                pygame.mixer.stop()
+                self.clips = {}
                 pygame.mixer.quit()
                 self.initialized = False
                 print("✓ Ressources audio libérées")
@@ -101,14 +180,19 @@ class Speaker:
 if __name__ == "__main__":
     print("=== Test du haut-parleur ===")
     speaker = Speaker(volume=1.0, system_volume=100)
-    
+
     audio_path = os.path.join(os.path.dirname(__file__), "..", "audio", "test2.mp3")
-    
+
     if os.path.exists(audio_path):
         print(f"Test avec: {audio_path}")
         speaker.play_sound(audio_path, duration=2)
         print("✓ Test terminé")
     else:
         print(f"⚠ Fichier de test non trouvé: {audio_path}")
-    
-    speaker.cleanup()
\ No newline at end of file
+
+    if speaker.clips:
+        print("Test de l'annonce du casier 1")
+        speaker.annoncer_casier(1)
+        time.sleep(DUREE_ANNONCE)
+
+    speaker.cleanup()
@@ -0,0 +1,189 @@
+"""
+Métriques d'iRobot (compteurs et histogrammes), exposées au format texte de Prometheus.
+
+Chaque module déclare ses métriques une fois, au chargement :
+    LECTURES = metriques.compteur("irobot_lectures_total", "Cartes lues")
+    SERIE = metriques.histogramme("irobot_serie_aller_retour_secondes", "...", etiquettes=("port",))
+puis enregistre sur le chemin chaud :
+    LECTURES.inc()
+    rtt = SERIE.avec(port)         # Série étiquetée, à garder (évite la recherche à chaque mesure)
+    rtt.observer(duree)
+
+Enregistrer coûte une recherche dichotomique et un verrou (~1 µs, benchmarks/bench_metriques.py) :
+les mesures restent actives en production. Les métriques vivent dans le processus qui les mesure
+(la boucle RFID) : les applications Flask les obtiennent par le canal IPC (demande "METRIQUES").
+"""
+import bisect
+import threading
+
+TYPE_CONTENU = "text/plain; version=0.0.4; charset=utf-8"
+# Secondes : de la lecture SPI d'une carte (~ms) à l'acquittement d'un relais lent (~s)
+BORNES_LATENCE = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _nombre(valeur):
+    if valeur == float("inf"):
+        return "+Inf"
+    return repr(float(valeur)) if isinstance(valeur, float) else str(valeur)
+
+
+def _etiquettes(noms, valeurs, supplementaires=()):
+    paires = list(zip(noms, valeurs)) + list(supplementaires)
+    if not paires:
+        return ""
+    echapper = lambda v: str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join(f'{nom}="{echapper(valeur)}"' for nom, valeur in paires) + "}"
+
+
+class _ValeurCompteur:
+    __slots__ = ('valeur', '_lock')
+
+    def __init__(self):
+        self.valeur = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.valeur += n
+
+
+class _ValeurHistogramme:
+    __slots__ = ('bornes', 'comptes', 'somme', '_lock')
+
+    def __init__(self, bornes):
+        self.bornes = bornes
+        self.comptes = [0] * (len(bornes) + 1)  # Dernier : au-delà de la plus grande borne
+        self.somme = 0.0
+        self._lock = threading.Lock()
+
+    def observer(self, valeur):
+        i = bisect.bisect_left(self.bornes, valeur)
+        with self._lock:
+            self.comptes[i] += 1
+            self.somme += valeur
+
+    def lire(self):
+        with self._lock:
+            return list(self.comptes), self.somme
+
+
+class Metrique:
+    type = None
+
+    def __init__(self, nom, aide, etiquettes=()):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = tuple(etiquettes)
+        self._series = {}  # (valeurs d'étiquettes) -> valeur
+        self._lock = threading.Lock()
+        self._defaut = None if self.etiquettes else self.avec()
+
+    def _nouvelle(self):
+        raise NotImplementedError
+
+    def avec(self, *valeurs):
+        """Série pour ces valeurs d'étiquettes (créée au premier appel)"""
+        serie = self._series.get(valeurs)
+        if serie is None:
+            if len(valeurs) != len(self.etiquettes):
+                raise ValueError(f"{self.nom} : étiquettes attendues {self.etiquettes}, reçu {valeurs}")
+            with self._lock:
+                serie = self._series.setdefault(valeurs, self._nouvelle())
+        return serie
+
+    def exposer(self):
+        lignes = [f"# HELP {self.nom} {self.aide}", f"# TYPE {self.nom} {self.type}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for valeurs, serie in series:
+            lignes.extend(self._lignes(valeurs, serie))
+        return lignes
+
+
+class Compteur(Metrique):
+    type = "counter"
+
+    def _nouvelle(self):
+        return _ValeurCompteur()
+
+    def inc(self, n=1):
+        self._defaut.inc(n)
+
+    def _lignes(self, valeurs, serie):
+        return [f"{self.nom}{_etiquettes(self.etiquettes, valeurs)} {_nombre(serie.valeur)}"]
+
+
+class Histogramme(Metrique):
+    type = "histogram"
+
+    def __init__(self, nom, aide, etiquettes=(), bornes=BORNES_LATENCE):
+        self.bornes = tuple(sorted(bornes))
+        super().__init__(nom, aide, etiquettes)
+
+    def _nouvelle(self):
+        return _ValeurHistogramme(self.bornes)
+
+    def observer(self, valeur):
+        self._defaut.observer(valeur)
+
+    def _lignes(self, valeurs, serie):
+        comptes, somme = serie.lire()
+        lignes, cumul = [], 0
+        for borne, compte in zip(self.bornes + (float("inf"),), comptes):
+            cumul += compte
+            le = _etiquettes(self.etiquettes, valeurs, [("le", _nombre(borne))])
+            lignes.append(f"{self.nom}_bucket{le} {cumul}")
+        etiquettes = _etiquettes(self.etiquettes, valeurs)
+        lignes.append(f"{self.nom}_sum{etiquettes} {_nombre(somme)}")
+        lignes.append(f"{self.nom}_count{etiquettes} {cumul}")
+        return lignes
+
+
+class Registre:
+    def __init__(self):
+        self._metriques = {}
+        self._lock = threading.Lock()
+
+    def enregistrer(self, metrique):
+        """Retourne la métrique déjà déclarée sous ce nom (module importé deux fois), sinon l'ajoute"""
+        with self._lock:
+            existante = self._metriques.setdefault(metrique.nom, metrique)
+        if type(existante) is not type(metrique) or existante.etiquettes != metrique.etiquettes:
+            raise ValueError(f"Métrique {metrique.nom} déjà déclarée autrement")
+        return existante
+
+    def exposer(self):
+        """Toutes les métriques au format texte de Prometheus"""
+        with self._lock:
+            metriques = list(self._metriques.values())
+        lignes = []
+        for metrique in metriques:
+            lignes.extend(metrique.exposer())
+        return "\n".join(lignes) + "\n" if lignes else ""
+
+
+REGISTRE = Registre()
+
+
+def compteur(nom, aide, etiquettes=()):
+    return REGISTRE.enregistrer(Compteur(nom, aide, etiquettes))
+
+
+def histogramme(nom, aide, etiquettes=(), bornes=BORNES_LATENCE):
+    return REGISTRE.enregistrer(Histogramme(nom, aide, etiquettes, bornes))
+
+
+def exposer():
+    return REGISTRE.exposer()
+
+
+def metriques_rfid(ipc, timeout=2):
+    """
+    Texte des métriques du processus RFID, demandé par une application Flask via son ClientIPC.
+    irobot_rfid_joignable vaut 0 si la boucle RFID ne répond pas (le scrape reste valide).
+    """
+    reponse = ipc.demander({"type": "METRIQUES"}, timeout) if ipc.attendre_connexion(timeout) else None
+    texte = reponse.get("texte", "") if reponse else ""
+    return (texte + "# HELP irobot_rfid_joignable Boucle RFID joignable par le canal IPC\n"
+            "# TYPE irobot_rfid_joignable gauge\n"
+            f"irobot_rfid_joignable {1 if reponse else 0}\n")
@@ -0,0 +1,422 @@
+"""
+Analyses des emprunts : agrégats par heure et par jour, tenus à jour à chaque événement.
+
+Par tranche (heure ou jour) :
+→ emprunts, rendus, refus (aucun casier disponible)
+→ durées des emprunts rendus dans la tranche : nombre, somme, max et histogramme par classes
+  BORNES_DUREE (moyenne, médiane et centiles sans garder les durées une à une)
+→ minutes sans aucun casier disponible
+
+Le stockage (emprunter / rendre, CSV comme SQLite) alimente data/analyses.db : le dashboard lit
+quelques centaines de tranches au lieu de l'historique brut. Les tranches modifiées sont écrites
+au plus toutes les INTERVALLE_SAUVEGARDE secondes, et à l'arrêt.
+
+Le remplissage depuis l'historique (calcul vectorisé NumPy) est une étape explicite, jamais faite par le
+stockage : le démarrage de la boucle RFID n'importe pas NumPy. start.sh la lance avant la borne si la base
+n'existe pas encore ; sinon borne arrêtée (ses tranches en attente écraseraient une partie du résultat) :
+    python3 models/analyses.py reconstruire [--si-absente]
+    python3 models/analyses.py jour [30]      # 30 derniers jours (heure [24] : dernières heures)
+
+Les lignes d'avant la colonne timestamp_fin (timestamp = instant du rendu) comptent comme rendus,
+sans durée. Les refus ne sont pas dans l'historique : la reconstruction les remet à zéro.
+Les emprunts ANNULE (casier jamais ouvert, voir hardware/pipeline.py) ne comptent nulle part.
+"""
+import bisect
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ANALYSES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'analyses.db')
+INTERVALLE_SAUVEGARDE = 30.0
+GRANULARITES = ('heure', 'jour')
+CENTILES = (50, 90, 95)
+# Secondes : de l'aller-retour d'une minute à l'emprunt oublié une semaine
+BORNES_DUREE = (60, 300, 900, 1800, 3600, 7200, 14400, 28800, 86400, 172800, 259200, 604800)
+FORMAT_TIMESTAMP = "%Y-%m-%d %H:%M:%S"
+FORMATS_TRANCHE = {'heure': "%Y-%m-%d %H:00:00", 'jour': "%Y-%m-%d"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS agregats (
+    granularite TEXT NOT NULL,
+    debut TEXT NOT NULL,
+    emprunts INTEGER NOT NULL,
+    rendus INTEGER NOT NULL,
+    refus INTEGER NOT NULL,
+    durees INTEGER NOT NULL,
+    duree_totale REAL NOT NULL,
+    duree_max REAL NOT NULL,
+    histogramme TEXT NOT NULL,
+    minutes_sans_casier REAL NOT NULL,
+    PRIMARY KEY (granularite, debut)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS etat (
+    cle TEXT PRIMARY KEY,
+    valeur TEXT
+);
+"""
+CHAMPS = ('emprunts', 'rendus', 'refus', 'durees', 'duree_totale', 'duree_max', 'histogramme', 'minutes_sans_casier')
+
+
+def _date(valeur):
+    try:
+        return datetime.strptime(valeur.strip(), FORMAT_TIMESTAMP)
+    except (AttributeError, ValueError):
+        return None
+
+
+def nouvelle_tranche():
+    return {'emprunts': 0, 'rendus': 0, 'refus': 0, 'durees': 0, 'duree_totale': 0.0, 'duree_max': 0.0,
+            'histogramme': [0] * (len(BORNES_DUREE) + 1), 'minutes_sans_casier': 0.0}
+
+
+def centile(histogramme, duree_max, q):
+    """Centile q des durées (secondes), interpolé dans sa classe ; la dernière classe s'arrête à duree_max"""
+    total = sum(histogramme)
+    if not total:
+        return None
+    rang, cumul = q / 100 * total, 0
+    for i, compte in enumerate(histogramme):
+        if compte and cumul + compte >= rang:
+            bas = BORNES_DUREE[i - 1] if i else 0
+            haut = min(BORNES_DUREE[i], duree_max) if i < len(BORNES_DUREE) else duree_max
+            return bas + (max(haut, bas) - bas) * (rang - cumul) / compte
+        cumul += compte
+    return duree_max
+
+
+def vue_tranche(debut, tranche):
+    """Tranche prête pour le dashboard (durées en secondes, None sans emprunt rendu)"""
+    durees = tranche['durees']
+    vue = {
+        'debut': debut,
+        'emprunts': tranche['emprunts'],
+        'rendus': tranche['rendus'],
+        'refus': tranche['refus'],
+        'durees': durees,
+        'duree_moyenne': tranche['duree_totale'] / durees if durees else None,
+        'duree_max': tranche['duree_max'] if durees else None,
+    }
+    for q in CENTILES:
+        vue[f'p{q}'] = centile(tranche['histogramme'], tranche['duree_max'], q)
+    vue['minutes_sans_casier'] = round(tranche['minutes_sans_casier'], 1)
+    return vue
+
+
+def _tranche_sql(row):
+    tranche = {champ: row[i] for i, champ in enumerate(CHAMPS)}
+    tranche['histogramme'] = json.loads(tranche['histogramme'])
+    return tranche
+
+
+def _ligne_sql(granularite, debut, tranche):
+    return (granularite, debut) + tuple(
+        json.dumps(tranche[champ]) if champ == 'histogramme' else tranche[champ] for champ in CHAMPS
+    )
+
+
+def _selection(conn, granularite, limit):
+    if granularite not in GRANULARITES:
+        raise ValueError(f"Granularité inconnue: {granularite} ({', '.join(GRANULARITES)})")
+    rows = conn.execute(
+        f"SELECT debut, {', '.join(CHAMPS)} FROM agregats WHERE granularite = ? ORDER BY debut DESC LIMIT ?",
+        (granularite, limit)
+    ).fetchall()
+    return [vue_tranche(row[0], _tranche_sql(row[1:])) for row in reversed(rows)]
+
+
+def lire_agregats(path=ANALYSES_PATH, granularite='jour', limit=30):
+    """Les `limit` dernières tranches, de la plus ancienne à la plus récente (lecture seule, autre processus)"""
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5)
+    try:
+        return _selection(conn, granularite, limit)
+    finally:
+        conn.close()
+
+
+# --- Reconstruction vectorisée ---
+
+def _dates_np(np, valeurs):
+    textes = [v.strip() if isinstance(v, str) and v.strip() else 'NaT' for v in valeurs]
+    try:
+        return np.array(textes, dtype='datetime64[s]')
+    except ValueError:
+        # Quelques valeurs illisibles : écartées une à une
+        return np.array([t if _date(t) else 'NaT' for t in textes], dtype='datetime64[s]')
+
+
+def _cles(np, instants, granularite):
+    if granularite == 'heure':
+        return [cle.replace('T', ' ') for cle in np.datetime_as_string(instants.astype('datetime64[h]'), unit='s')]
+    return list(np.datetime_as_string(instants.astype('datetime64[D]'), unit='D'))
+
+
+def agreger_historique(lignes, nb_casiers):
+    """
+    Agrégats de tout l'historique (lignes d'emprunts, dict), en quelques passes NumPy.
+    Les minutes sans casier supposent disponible tout casier non emprunté (nb_casiers - emprunts en cours).
+    Retourne ({(granularite, debut): tranche}, début de la rupture en cours ou None).
+    """
+    import numpy as np
+
+    lignes = [ligne for ligne in lignes if (ligne.get('statut') or '').strip().upper() != 'ANNULE']
+    nat = np.datetime64('NaT', 's')
+    debuts = _dates_np(np, [ligne.get('timestamp') for ligne in lignes])
+    fins = _dates_np(np, [ligne.get('timestamp_fin') for ligne in lignes])
+    termine = np.array([(ligne.get('statut') or '').strip().upper() == 'TERMINE' for ligne in lignes], dtype=bool)
+    ancienne = termine & np.isnat(fins)  # Avant timestamp_fin : timestamp est le rendu
+    fins = np.where(termine, np.where(ancienne, debuts, fins), nat)
+    debuts = np.where(ancienne, nat, debuts)
+
+    a_debut, a_fin = ~np.isnat(debuts), ~np.isnat(fins)
+    avec_duree = a_debut & a_fin
+    avec_duree[avec_duree] = fins[avec_duree] >= debuts[avec_duree]  # Horloge reculée : ni durée ni occupation
+    suivi = a_debut & (avec_duree | ~a_fin)
+    durees = (fins[avec_duree] - debuts[avec_duree]).astype(np.int64)
+    classes = np.searchsorted(BORNES_DUREE, durees, side='left')
+
+    # Casiers disponibles après chaque événement (rendus avant emprunts au même instant)
+    rendus_suivis = fins[avec_duree & suivi]
+    temps = np.concatenate([rendus_suivis, debuts[suivi]]).astype(np.int64)
+    delta = np.concatenate([np.ones(len(rendus_suivis), np.int64), -np.ones(int(suivi.sum()), np.int64)])
+    ordre = np.lexsort((-delta, temps))
+    temps, delta = temps[ordre], delta[ordre]
+    libres = nb_casiers + np.cumsum(delta)
+    # Secondes sans casier cumulées à chaque événement : interpolées aux bornes des tranches
+    sans_casier = np.concatenate([[0], np.cumsum(np.diff(temps) * (libres[:-1] <= 0))]).astype(np.float64)
+
+    tranches = {}
+
+    def tranche(granularite, cle):
+        return tranches.setdefault((granularite, cle), nouvelle_tranche())
+
+    for granularite, unite in (('heure', 'h'), ('jour', 'D')):
+        for champ, instants in (('emprunts', debuts[a_debut]), ('rendus', fins[a_fin])):
+            valeurs, comptes = np.unique(instants.astype(f'datetime64[{unite}]'), return_counts=True)
+            for cle, compte in zip(_cles(np, valeurs, granularite), comptes.tolist()):
+                tranche(granularite, cle)[champ] += compte
+
+        valeurs, inverse = np.unique(fins[avec_duree].astype(f'datetime64[{unite}]'), return_inverse=True)
+        inverse = inverse.reshape(-1)
+        nombres = np.bincount(inverse, minlength=len(valeurs))
+        sommes = np.bincount(inverse, weights=durees, minlength=len(valeurs))
+        maximums = np.zeros(len(valeurs), np.int64)
+        np.maximum.at(maximums, inverse, durees)
+        histogrammes = np.zeros((len(valeurs), len(BORNES_DUREE) + 1), np.int64)
+        np.add.at(histogrammes, (inverse, classes), 1)
+        for i, cle in enumerate(_cles(np, valeurs, granularite)):
+            t = tranche(granularite, cle)
+            t['durees'] += int(nombres[i])
+            t['duree_totale'] += float(sommes[i])
+            t['duree_max'] = max(t['duree_max'], float(maximums[i]))
+            t['histogramme'] = histogrammes[i].tolist()
+
+        if len(temps):
+            pas = int(np.timedelta64(1, unite) / np.timedelta64(1, 's'))
+            bornes = np.arange(temps[0] // pas * pas, temps[-1] + pas, pas)
+            secondes = np.diff(np.interp(bornes, temps, sans_casier))
+            indices = np.nonzero(secondes > 0)[0]
+            for cle, s in zip(_cles(np, bornes[indices].astype('datetime64[s]'), granularite),
+                              secondes[indices].tolist()):
+                tranche(granularite, cle)['minutes_sans_casier'] += s / 60
+
+    en_rupture = len(temps) and libres[-1] <= 0
+    depuis = str(temps[-1].astype('datetime64[s]')).replace('T', ' ') if en_rupture else None
+    return tranches, depuis
+
+
+class Analyses:
+    """Agrégats d'emprunts tenus à jour par le stockage (un seul processus écrivain : la boucle RFID)"""
+
+    def __init__(self, path=ANALYSES_PATH):
+        self.nouvelle = not os.path.exists(path)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._tranches = {}  # (granularite, debut) -> tranche modifiée, en attente d'écriture
+        self._derniere_sauvegarde = time.monotonic()
+        self._dernier_evenement = None
+        row = self.conn.execute("SELECT valeur FROM etat WHERE cle = 'sans_casier_depuis'").fetchone()
+        self._sans_casier_depuis = _date(row[0]) if row else None
+
+    def verifier_historique(self, nb_emprunts):
+        """Base neuve alors que l'historique ne l'est pas : signale la reconstruction (nb_emprunts : fonction)"""
+        if self.nouvelle and nb_emprunts():
+            print(f"⚠ Base {os.path.basename(self.path)} neuve, l'historique n'y est pas : "
+                  f"python3 models/analyses.py reconstruire (borne arrêtée)")
+
+    # --- Événements (stockage) ---
+
+    def emprunt(self, debut, libres):
+        """Emprunt créé à `debut`, `libres` casiers encore disponibles"""
+        quand = _date(debut)
+        if quand is None:
+            return
+        with self._lock:
+            for tranche in self._tranches_de(quand):
+                tranche['emprunts'] += 1
+            self._disponibilite(quand, libres)
+            self._apres_evenement(quand)
+
+    def refus(self, quand):
+        """Carte refusée faute de casier disponible"""
+        quand = _date(quand)
+        if quand is None:
+            return
+        with self._lock:
+            for tranche in self._tranches_de(quand):
+                tranche['refus'] += 1
+            if self._sans_casier_depuis is None:
+                self._sans_casier_depuis = quand
+            self._apres_evenement(quand)
+
+    def rendu(self, debut, fin, libres):
+        """Emprunt commencé à `debut` rendu à `fin` (durée comptée dans la tranche du rendu)"""
+        quand, depuis = _date(fin), _date(debut)
+        if quand is None:
+            return
+        with self._lock:
+            for tranche in self._tranches_de(quand):
+                tranche['rendus'] += 1
+                if depuis is not None and depuis <= quand:
+                    self._ajouter_duree(tranche, (quand - depuis).total_seconds())
+            self._disponibilite(quand, libres)
+            self._apres_evenement(quand)
+
+    def annulation(self, debut, fin, libres):
+        """Emprunt de `debut` annulé à `fin` (casier jamais ouvert) : retiré des emprunts, sans rendu ni durée"""
+        depuis, quand = _date(debut), _date(fin)
+        if depuis is None or quand is None:
+            return
+        with self._lock:
+            for tranche in self._tranches_de(depuis):
+                tranche['emprunts'] = max(0, tranche['emprunts'] - 1)
+            self._disponibilite(quand, libres)
+            self._apres_evenement(quand)
+
+    def _tranches_de(self, quand):
+        for granularite in GRANULARITES:
+            debut = quand.strftime(FORMATS_TRANCHE[granularite])
+            tranche = self._tranches.get((granularite, debut))
+            if tranche is None:
+                row = self.conn.execute(
+                    f"SELECT {', '.join(CHAMPS)} FROM agregats WHERE granularite = ? AND debut = ?",
+                    (granularite, debut)
+                ).fetchone()
+                tranche = self._tranches[(granularite, debut)] = _tranche_sql(row) if row else nouvelle_tranche()
+            yield tranche
+
+    @staticmethod
+    def _ajouter_duree(tranche, duree):
+        tranche['durees'] += 1
+        tranche['duree_totale'] += duree
+        tranche['duree_max'] = max(tranche['duree_max'], duree)
+        tranche['histogramme'][bisect.bisect_left(BORNES_DUREE, duree)] += 1
+
+    def _disponibilite(self, quand, libres):
+        if libres <= 0:
+            if self._sans_casier_depuis is None:
+                self._sans_casier_depuis = quand
+        elif self._sans_casier_depuis is not None:
+            self._sans_casier(self._sans_casier_depuis, quand)
+            self._sans_casier_depuis = None
+
+    def _sans_casier(self, debut, fin):
+        """Répartit la rupture [debut, fin[ sur les tranches horaires (et journalières) traversées"""
+        curseur = debut
+        while curseur < fin:
+            limite = min(fin, curseur.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1))
+            for tranche in self._tranches_de(curseur):
+                tranche['minutes_sans_casier'] += (limite - curseur).total_seconds() / 60
+            curseur = limite
+
+    def _apres_evenement(self, quand):
+        self._dernier_evenement = max(quand, self._dernier_evenement or quand)
+        if time.monotonic() - self._derniere_sauvegarde >= INTERVALLE_SAUVEGARDE:
+            self._ecrire()
+
+    # --- Persistance ---
+
+    def _ecrire(self):
+        # Rupture en cours : comptée jusqu'au dernier événement, pour que la tranche courante la montre
+        if self._sans_casier_depuis is not None and self._dernier_evenement is not None:
+            self._sans_casier(self._sans_casier_depuis, self._dernier_evenement)
+            self._sans_casier_depuis = max(self._sans_casier_depuis, self._dernier_evenement)
+        depuis = self._sans_casier_depuis.strftime(FORMAT_TIMESTAMP) if self._sans_casier_depuis else None
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO agregats (granularite, debut, {', '.join(CHAMPS)}) "
+                f"VALUES ({', '.join('?' * (len(CHAMPS) + 2))})",
+                [_ligne_sql(granularite, debut, tranche) for (granularite, debut), tranche in self._tranches.items()]
+            )
+            self.conn.execute("INSERT OR REPLACE INTO etat (cle, valeur) VALUES ('sans_casier_depuis', ?)", (depuis,))
+        self._tranches.clear()
+        self._derniere_sauvegarde = time.monotonic()
+
+    def reconstruire(self, lignes, nb_casiers):
+        """Remplace les agrégats par ceux de l'historique complet"""
+        tranches, depuis = agreger_historique(lignes, nb_casiers)
+        with self._lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM agregats")
+                self.conn.executemany(
+                    f"INSERT INTO agregats (granularite, debut, {', '.join(CHAMPS)}) "
+                    f"VALUES ({', '.join('?' * (len(CHAMPS) + 2))})",
+                    [_ligne_sql(granularite, debut, tranche) for (granularite, debut), tranche in tranches.items()]
+                )
+                self.conn.execute("INSERT OR REPLACE INTO etat (cle, valeur) VALUES ('sans_casier_depuis', ?)",
+                                  (depuis,))
+            self._tranches.clear()
+            self._sans_casier_depuis = _date(depuis)
+            self._dernier_evenement = None
+
+    def serie(self, granularite='jour', limit=30):
+        """Les `limit` dernières tranches (tranches en attente écrites d'abord)"""
+        with self._lock:
+            if self._tranches:
+                self._ecrire()
+            return _selection(self.conn, granularite, limit)
+
+    def fermer(self):
+        with self._lock:
+            if self._tranches or self._sans_casier_depuis is not None:
+                self._ecrire()
+            self.conn.close()
+
+
+if __name__ == "__main__":
+    commande = sys.argv[1] if len(sys.argv) > 1 else None
+    if commande not in ("reconstruire",) + GRANULARITES:
+        print("Usage: python3 models/analyses.py reconstruire [--si-absente] | heure [N] | jour [N]")
+        sys.exit(1)
+
+    if commande == "reconstruire":
+        if "--si-absente" in sys.argv[2:] and os.path.exists(ANALYSES_PATH):
+            sys.exit(0)
+        from models.stockage import lire_table
+        lignes = lire_table('emprunts')
+        debut = time.perf_counter()
+        analyses = Analyses()
+        analyses.reconstruire(lignes, len(lire_table('casiers')))
+        analyses.fermer()
+        print(f"✓ {len(lignes)} emprunt(s) agrégé(s) en {(time.perf_counter() - debut) * 1000:.0f} ms")
+        sys.exit(0)
+
+    limite = int(sys.argv[2]) if len(sys.argv) > 2 else (24 if commande == 'heure' else 30)
+    minutes = lambda secondes: f"{secondes / 60:.1f}" if secondes is not None else "-"
+    print(f"{'début':<19} | {'emprunts':>8} | {'rendus':>6} | {'refus':>5} | {'moy. (min)':>10} | "
+          f"{'p50':>6} | {'p90':>6} | {'p95':>6} | {'sans casier (min)':>17}")
+    print("-" * 110)
+    for vue in lire_agregats(ANALYSES_PATH, commande, limite):
+        print(f"{vue['debut']:<19} | {vue['emprunts']:>8} | {vue['rendus']:>6} | {vue['refus']:>5} | "
+              f"{minutes(vue['duree_moyenne']):>10} | {minutes(vue['p50']):>6} | {minutes(vue['p90']):>6} | "
+              f"{minutes(vue['p95']):>6} | {vue['minutes_sans_casier']:>17}")
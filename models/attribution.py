@@ -0,0 +1,264 @@
+"""
+Réserve des casiers disponibles et politique d'attribution (usure répartie).
+
+La réserve est tenue à jour par les managers de casiers (casier_vide / casier_plein) :
+plus aucun parcours de la table à chaque emprunt.
+→ bitset des casiers disponibles (bit n = casier n) : premier libre, plus proche d'une position, en O(1)
+→ par banc, OrderedDict des disponibles du moins récemment ouvert au plus récent : LRU en O(1)
+
+Politiques (clé "attribution" de data/config.json) :
+→ "premier" : plus petit numéro libre (comportement historique : le casier 1 s'use le premier)
+→ "lru"     : casier libre ouvert le moins récemment, les ouvertures se répartissent sur tous les casiers
+→ "proche"  : casier libre le plus proche du lecteur qui a lu la carte ("lecteur" d'un banc dans
+              data/flotte.json, par défaut son premier casier), en supposant les casiers numérotés dans l'ordre physique
+
+Avec plusieurs bancs, "premier" et "lru" gardent la répartition de la flotte : banc du lecteur s'il a
+un casier libre, sinon le banc qui en a le plus.
+
+Chaque ouverture acquittée par l'Arduino (emprunt ou rendu) est comptée par casier (ouverture(), appelée
+à l'acquittement par hardware/arduino_comm.py) dans data/usure.json (au plus toutes les
+INTERVALLE_SAUVEGARDE secondes, et à l'arrêt), avec la date de dernière ouverture qui ordonne le LRU
+au redémarrage. Répartition de l'usure :
+    python3 models/attribution.py [data/usure.json]
+"""
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.journal import ecrire_atomique
+
+POLITIQUES = ('premier', 'lru', 'proche')
+USURE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'usure.json')
+INTERVALLE_SAUVEGARDE = 10.0
+
+
+def politique_configuree():
+    from config import obtenir_config
+    return obtenir_config().attribution
+
+
+def _plus_bas(bits):
+    """Numéro du bit le plus bas (None si aucun)"""
+    return (bits & -bits).bit_length() - 1 if bits else None
+
+
+def _plus_proche(bits, position):
+    """Numéro du bit le plus proche de position (le plus bas en cas d'égalité)"""
+    dessous = (bits & ((2 << position) - 1)).bit_length() - 1 if position >= 0 else -1
+    haut = bits >> (position + 1)
+    dessus = position + 1 + _plus_bas(haut) if haut else None
+    if dessous < 0:
+        return dessus
+    if dessus is None or position - dessous <= dessus - position:
+        return dessous
+    return dessus
+
+
+def lire_usure(path=USURE_PATH):
+    """{id_casier: {"ouvertures": n, "derniere": "YYYY-MM-DD HH:MM:SS" | None}} ({} sans fichier)"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            casiers = json.load(f).get('casiers', {})
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        print(f"⚠ {path} illisible, compteurs d'usure repartis de zéro")
+        return {}
+    return {int(id_casier): {'ouvertures': int(infos.get('ouvertures', 0)), 'derniere': infos.get('derniere')}
+            for id_casier, infos in casiers.items()}
+
+
+def statistiques_usure(usure):
+    """Répartition des ouvertures : min, max, moyenne, écart-type, max / moyenne"""
+    ouvertures = [infos['ouvertures'] for infos in usure.values()]
+    if not ouvertures:
+        return None
+    moyenne = sum(ouvertures) / len(ouvertures)
+    ecart_type = math.sqrt(sum((n - moyenne) ** 2 for n in ouvertures) / len(ouvertures))
+    return {
+        'casiers': len(ouvertures),
+        'total': sum(ouvertures),
+        'min': min(ouvertures),
+        'max': max(ouvertures),
+        'moyenne': moyenne,
+        'ecart_type': ecart_type,
+        'max_sur_moyenne': max(ouvertures) / moyenne if moyenne else None,
+    }
+
+
+class ReserveCasiers:
+    """Casiers disponibles (PLEIN : un câble est présent) et choix du prochain casier à attribuer"""
+
+    def __init__(self, libres=(), politique=None, usure_path=None):
+        politique = politique or politique_configuree()
+        if politique not in POLITIQUES:
+            raise ValueError(f"Politique d'attribution inconnue: {politique} ({', '.join(POLITIQUES)})")
+        self.politique = politique
+        self.usure_path = usure_path
+        self.usure = lire_usure(usure_path) if usure_path else {}
+        self._lock = threading.Lock()
+        self._derniere_sauvegarde = time.monotonic()
+        self._a_sauvegarder = False
+        self._groupes = None   # id_casier -> banc (None : un seul groupe, tous les casiers)
+        self._lecteurs = {}    # banc -> position du lecteur (numéro de casier)
+        self.charger(libres)
+
+    # --- Construction ---
+
+    def charger(self, libres):
+        """Repart de l'ensemble des casiers disponibles (démarrage, resynchronisation)"""
+        with self._lock:
+            self._bits = 0
+            for id_casier in libres:
+                self._bits |= 1 << int(id_casier)
+            self._reconstruire()
+
+    def regrouper(self, groupes, lecteurs=None):
+        """Casiers répartis en bancs {id_casier: banc}, positions des lecteurs {banc: id_casier} (flotte)"""
+        with self._lock:
+            self._groupes = {int(id_casier): banc for id_casier, banc in groupes.items()}
+            self._lecteurs = dict(lecteurs or {})
+            self._reconstruire()
+
+    def _groupe(self, id_casier):
+        if self._groupes is None:
+            return None
+        return self._groupes.get(id_casier, False)  # False : casier hors flotte, jamais attribué
+
+    def _reconstruire(self):
+        if self._groupes is None:
+            self._masques = {None: -1}
+        else:
+            self._masques = {}
+            for id_casier, banc in self._groupes.items():
+                self._masques[banc] = self._masques.get(banc, 0) | (1 << id_casier)
+        self._nb = {banc: bin(self._bits & masque).count('1') for banc, masque in self._masques.items()}
+        self._attribuables = 0
+        for masque in self._masques.values():
+            self._attribuables |= masque
+        # LRU : jamais ouverts d'abord, puis du plus ancien au plus récent
+        self._lru = {banc: OrderedDict() for banc in self._masques}
+        for id_casier in sorted(self.libres(), key=lambda c: (self._derniere(c) or '', c)):
+            groupe = self._groupe(id_casier)
+            if groupe is not False:
+                self._lru[groupe][id_casier] = None
+
+    def _derniere(self, id_casier):
+        return self.usure.get(id_casier, {}).get('derniere')
+
+    # --- Mises à jour (managers de casiers) ---
+
+    def est_libre(self, id_casier):
+        return bool(self._bits >> int(id_casier) & 1)
+
+    def prendre(self, id_casier):
+        """Le casier est attribué à un emprunt : il n'est plus disponible"""
+        id_casier = int(id_casier)
+        with self._lock:
+            if self._bits >> id_casier & 1:
+                self._bits &= ~(1 << id_casier)
+                groupe = self._groupe(id_casier)
+                if groupe is not False:
+                    self._nb[groupe] -= 1
+                    self._lru[groupe].pop(id_casier, None)
+
+    def liberer(self, id_casier):
+        """Le câble est de nouveau dans le casier (rendu, annulation) : disponible, et le plus récemment utilisé"""
+        id_casier = int(id_casier)
+        with self._lock:
+            groupe = self._groupe(id_casier)
+            if not self._bits >> id_casier & 1:
+                self._bits |= 1 << id_casier
+                if groupe is not False:
+                    self._nb[groupe] += 1
+            if groupe is not False:
+                self._lru[groupe][id_casier] = None
+                self._lru[groupe].move_to_end(id_casier)
+
+    def ouverture(self, id_casier, quand=None):
+        """Ouverture du casier acquittée par l'Arduino : compteur d'usure et date de dernière ouverture"""
+        with self._lock:
+            self._ouverture(int(id_casier), quand)
+
+    def _ouverture(self, id_casier, quand):
+        infos = self.usure.setdefault(id_casier, {'ouvertures': 0, 'derniere': None})
+        infos['ouvertures'] += 1
+        infos['derniere'] = quand or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._a_sauvegarder = True
+        if self.usure_path and time.monotonic() - self._derniere_sauvegarde >= INTERVALLE_SAUVEGARDE:
+            self._sauvegarder()
+
+    # --- Choix ---
+
+    def libres(self):
+        """Casiers disponibles, par numéro croissant"""
+        bits, libres = self._bits, []
+        while bits:
+            bas = bits & -bits
+            libres.append(bas.bit_length() - 1)
+            bits ^= bas
+        return libres
+
+    def nb_libres(self):
+        return bin(self._bits & self._attribuables).count('1')
+
+    def choisir(self, banc=None):
+        """Casier à attribuer selon la politique (None si aucun), sans le retirer de la réserve"""
+        with self._lock:
+            if self.politique == 'proche':
+                position = self._lecteurs.get(banc)
+                if position is None:
+                    position = next(iter(self._lecteurs.values()), 1)
+                return _plus_proche(self._bits & self._attribuables, int(position))
+
+            if self._nb.get(banc):
+                groupe = banc
+            else:
+                groupe = max(self._nb, key=self._nb.get)  # Quelques bancs au plus
+                if not self._nb[groupe]:
+                    return None
+            if self.politique == 'lru':
+                return next(iter(self._lru[groupe]))
+            return _plus_bas(self._bits & self._masques[groupe])
+
+    # --- Persistance de l'usure ---
+
+    def _sauvegarder(self):
+        donnees = {
+            'politique': self.politique,
+            'casiers': {str(id_casier): infos for id_casier, infos in sorted(self.usure.items())},
+        }
+        ecrire_atomique(self.usure_path, lambda f: json.dump(donnees, f, ensure_ascii=False, indent=1))
+        self._derniere_sauvegarde = time.monotonic()
+        self._a_sauvegarder = False
+
+    def fermer(self):
+        """Écrit les compteurs d'usure en attente"""
+        with self._lock:
+            if self.usure_path and self._a_sauvegarder:
+                self._sauvegarder()
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else USURE_PATH
+    usure = lire_usure(path)
+    stats = statistiques_usure(usure)
+    if stats is None:
+        print(f"Aucune ouverture enregistrée dans {path}")
+        sys.exit(0)
+    plus_grand = max(infos['ouvertures'] for infos in usure.values()) or 1
+    print(f"{'casier':>6} | {'ouvertures':>10} | {'dernière ouverture':<19} |")
+    print("-" * 60)
+    for id_casier, infos in sorted(usure.items()):
+        barre = "█" * round(20 * infos['ouvertures'] / plus_grand)
+        print(f"{id_casier:>6} | {infos['ouvertures']:>10} | {infos['derniere'] or '-':<19} | {barre}")
+    print(f"\n{stats['total']} ouvertures sur {stats['casiers']} casiers : min {stats['min']}, max {stats['max']}, "
+          f"moyenne {stats['moyenne']:.1f}, écart-type {stats['ecart_type']:.1f}, "
+          f"max/moyenne {stats['max_sur_moyenne']:.2f}")
@@ -1,62 +1,198 @@
-import pandas as pd
+import csv
 import os
+from models.journal import Journal, journal_path, ecrire_csv
+
+COLONNES = ['mail', 'id_casier', 'timestamp', 'statut', 'timestamp_fin']
+
+
+class Emprunt:
+    """
+    Une ligne d'emprunts.csv (__slots__ : quelques dizaines d'octets par ligne d'historique).
+    timestamp : début de l'emprunt, timestamp_fin : rendu (vide tant qu'il est EN COURS, et pour les
+    lignes d'avant la colonne, dont le timestamp est celui du rendu)
+    """
+    __slots__ = ('mail', 'id_casier', 'timestamp', 'statut', 'timestamp_fin')
+
+    def __init__(self, mail, id_casier, timestamp, statut, timestamp_fin=None):
+        self.mail = mail
+        self.id_casier = id_casier
+        self.timestamp = timestamp
+        self.statut = statut
+        self.timestamp_fin = timestamp_fin or None
+
+    @classmethod
+    def depuis_ligne(cls, ligne):
+        id_casier = ligne.get('id_casier')
+        return cls(
+            ligne.get('mail'),
+            int(id_casier) if id_casier not in (None, '') else None,
+            ligne.get('timestamp'),
+            ligne.get('statut'),
+            ligne.get('timestamp_fin')
+        )
+
+    def ligne(self):
+        return {'mail': self.mail, 'id_casier': self.id_casier, 'timestamp': self.timestamp, 'statut': self.statut,
+                'timestamp_fin': self.timestamp_fin or ''}
+
 
 class EmpruntManager:
-    def __init__(self):
-        self.csv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'emprunts.csv')
-        self.df = None
+    """
+    Gestion des emprunts.
+    → L'historique est une liste d'enregistrements Emprunt (persistance et analyses)
+    → Les emprunts EN COURS sont indexés par mail et par casier : les lectures
+      faites à chaque passage de carte sont en O(1), quelle que soit la taille de l'historique
+    → Chaque modification est un ajout au journal (emprunts.journal) ; emprunts.csv
+      n'est réécrit qu'à la compaction
+    """
+
+    def __init__(self, csv_path=None):
+        self.csv_path = csv_path or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'emprunts.csv')
+        self.emprunts = []
+        self._en_cours = {}     # mail -> [index des lignes EN COURS]
+        self._par_casier = {}   # id_casier -> mail
+        self.journal = Journal(journal_path(self.csv_path))
         self._load_emprunts()
-    
+
     def _load_emprunts(self):
-        """Charge les emprunts depuis le fichier CSV"""
-        try:
-            self.df = pd.read_csv(self.csv_path)
-        except FileNotFoundError:
+        """Charge les emprunts depuis le fichier CSV, puis rejoue le journal"""
+        if not os.path.exists(self.csv_path):
             print(f"Erreur: Le fichier {self.csv_path} n'existe pas")
-            self.df = pd.DataFrame(columns=['mail', 'id_casier', 'timestamp', 'statut'])
-    
+        self.emprunts = self._lire_snapshot()
+        evenements = list(self.journal.rejouer())
+        for evenement in evenements:
+            self._appliquer(evenement)
+        if evenements:
+            print(f"Rejeu de {len(evenements)} événement(s) du journal des emprunts")
+            self._save_emprunts()
+        self._indexer()
+
+    def _lire_snapshot(self):
+        """Lit emprunts.csv directement en enregistrements (plus rapide que DictReader)"""
+        if not os.path.exists(self.csv_path):
+            return []
+        with open(self.csv_path, 'r', newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            entete = next(reader, None)
+            if not entete:
+                return []
+            i_mail, i_casier, i_ts, i_statut = (entete.index(colonne) for colonne in COLONNES[:4])
+            if 'timestamp_fin' not in entete:  # Fichier d'avant la colonne : réécrit avec elle à la compaction
+                return [
+                    Emprunt(row[i_mail], int(row[i_casier]) if row[i_casier] else None, row[i_ts], row[i_statut])
+                    for row in reader if row
+                ]
+            i_fin = entete.index('timestamp_fin')
+            return [
+                Emprunt(row[i_mail], int(row[i_casier]) if row[i_casier] else None, row[i_ts], row[i_statut],
+                        row[i_fin] if i_fin < len(row) else None)
+                for row in reader if row
+            ]
+
+    def _appliquer(self, evenement):
+        """Rejoue un événement "set" du journal (idempotent)"""
+        if evenement.get('op') != 'set':
+            return
+        index = evenement['index']
+        emprunt = Emprunt.depuis_ligne(evenement['ligne'])
+        if index < len(self.emprunts):
+            self.emprunts[index] = emprunt
+        elif index == len(self.emprunts):
+            self.emprunts.append(emprunt)
+        else:
+            print(f"⚠ Événement de journal hors séquence ignoré (index {index})")
+
+    def _indexer(self):
+        """Construit les index des emprunts EN COURS (un seul parcours, au chargement)"""
+        self._en_cours = {}
+        self._par_casier = {}
+        for index, emprunt in enumerate(self.emprunts):
+            if emprunt.statut == 'EN COURS':
+                self._en_cours.setdefault(emprunt.mail, []).append(index)
+                self._par_casier[emprunt.id_casier] = emprunt.mail
+
     def _save_emprunts(self):
-        """Sauvegarde les emprunts dans le fichier CSV"""
-        if self.df is not None:
-            self.df.to_csv(self.csv_path, index=False)
-    
+        """Compaction : réécrit le snapshot CSV de façon atomique puis vide le journal"""
+        ecrire_csv(self.csv_path, COLONNES, (emprunt.ligne() for emprunt in self.emprunts))
+        self.journal.vider()
+
+    def _journaliser(self, index, emprunt):
+        """Écrit l'état d'une ligne dans le journal (avant de modifier la mémoire)"""
+        self.journal.ajouter({'op': 'set', 'index': index, 'ligne': emprunt.ligne()})
+
+    def _apres_ecriture(self):
+        if self.journal.doit_compacter():
+            self._save_emprunts()
+
     def creer_emprunt(self, mail, id_casier, timestamp):
         """Ajoute un nouvel emprunt avec le statut EN COURS si l'utilisateur n'a pas déjà un emprunt"""
         if self.get_emprunt(mail):
             return False
-        
-        new_row = pd.DataFrame([{
-            'mail': mail,
-            'id_casier': id_casier,
-            'timestamp': timestamp,
-            'statut': 'EN COURS'
-        }])
-        self.df = pd.concat([self.df, new_row], ignore_index=True)
-        self._save_emprunts()
+
+        index = len(self.emprunts)
+        emprunt = Emprunt(mail, int(id_casier), timestamp, 'EN COURS')
+        self._journaliser(index, emprunt)
+
+        self.emprunts.append(emprunt)
+        self._en_cours.setdefault(mail, []).append(index)
+        self._par_casier[emprunt.id_casier] = mail
+        self._apres_ecriture()
         return True
-    
-    def cloturer_emprunt(self, mail, timestamp):
-        """Met à jour la dernière ligne avec l'adresse mail en mettant le statut à TERMINE"""
-        mask = (self.df['mail'] == mail) & (self.df['statut'] == 'EN COURS')
-        emprunts_en_cours = self.df[mask]
-        
-        if not emprunts_en_cours.empty:
-            dernier_index = emprunts_en_cours.index[-1]
-            self.df.loc[dernier_index, 'timestamp'] = timestamp
-            self.df.loc[dernier_index, 'statut'] = 'TERMINE'
-            self._save_emprunts()
-            return True
-        return None
-    
+
+    def cloturer_emprunt(self, mail, timestamp, statut='TERMINE'):
+        """Termine le dernier emprunt EN COURS du mail : statut TERMINE (ou ANNULE), à `timestamp` (le début est gardé)"""
+        lignes = self._en_cours.get(mail)
+        if not lignes:
+            return None
+
+        dernier_index = lignes[-1]
+        emprunt = self.emprunts[dernier_index]
+        self._journaliser(dernier_index, Emprunt(mail, emprunt.id_casier, emprunt.timestamp, statut, timestamp))
+
+        lignes.pop()
+        if not lignes:
+            del self._en_cours[mail]
+        if self._par_casier.get(emprunt.id_casier) == mail:
+            del self._par_casier[emprunt.id_casier]
+
+        emprunt.timestamp_fin = timestamp
+        emprunt.statut = statut
+        self._apres_ecriture()
+        return True
+
     def get_emprunt(self, mail):
         """Vérifie si l'utilisateur a un emprunt EN COURS"""
-        mask = (self.df['mail'] == mail) & (self.df['statut'] == 'EN COURS')
-        return mask.any()
-    
+        return mail in self._en_cours
+
     def get_casier_en_cours(self, mail):
         """Retourne l'id_casier de l'emprunt EN COURS pour ce mail, sinon None"""
-        mask = (self.df['mail'] == mail) & (self.df['statut'] == 'EN COURS')
-        emprunts_en_cours = self.df[mask]
-        if not emprunts_en_cours.empty:
-            return int(emprunts_en_cours.iloc[-1]['id_casier'])
-        return None
\ No newline at end of file
+        lignes = self._en_cours.get(mail)
+        if lignes:
+            return self.emprunts[lignes[-1]].id_casier
+        return None
+
+    def get_debut_en_cours(self, mail):
+        """Retourne le timestamp de début de l'emprunt EN COURS pour ce mail, sinon None"""
+        lignes = self._en_cours.get(mail)
+        if lignes:
+            return self.emprunts[lignes[-1]].timestamp
+        return None
+
+    def get_mail_par_casier(self, id_casier):
+        """Retourne le mail de l'emprunteur du casier, sinon None"""
+        return self._par_casier.get(int(id_casier))
+
+    def get_emprunts_en_cours(self):
+        """Retourne {mail: id_casier} pour tous les emprunts EN COURS"""
+        return {mail: self.emprunts[lignes[-1]].id_casier for mail, lignes in self._en_cours.items()}
+
+    def get_historique(self):
+        """Historique complet en DataFrame (réservé aux analyses, pandas n'est importé qu'ici)"""
+        import pandas as pd
+        return pd.DataFrame([emprunt.ligne() for emprunt in self.emprunts], columns=COLONNES)
+
+    def fermer(self):
+        """Compacte le journal avant l'arrêt"""
+        if self.journal.nb_evenements:
+            self._save_emprunts()
+        self.journal.fermer()
@@ -0,0 +1,223 @@
+import csv
+import json
+import os
+
+COMPACTION_INTERVAL = 500  # Nombre d'événements avant réécriture du snapshot CSV
+
+
+class Journal:
+    """
+    Journal append-only des modifications d'un fichier CSV.
+    → Une ligne JSON par événement, fsync à chaque ajout (survit à une coupure de courant)
+    → Le CSV n'est plus qu'un snapshot, réécrit de façon atomique lors des compactions
+    → Les événements sont des "set" de lignes complètes : les rejouer deux fois est sans effet
+    """
+
+    def __init__(self, path, compaction_interval=COMPACTION_INTERVAL):
+        self.path = path
+        self.compaction_interval = compaction_interval
+        self.nb_evenements = 0
+        self._f = None
+
+    def rejouer(self):
+        """Relit les événements du journal (une ligne tronquée en fin de fichier est ignorée)"""
+        self.nb_evenements = 0
+        for evenement in lire_evenements(self.path):
+            self.nb_evenements += 1
+            yield evenement
+
+    def ajouter(self, evenement):
+        """Ajoute un événement et force son écriture sur le disque"""
+        if self._f is None:
+            self._f = open(self.path, 'a', encoding='utf-8')
+        self._f.write(json.dumps(evenement, ensure_ascii=False) + '\n')
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self.nb_evenements += 1
+
+    def doit_compacter(self):
+        return self.nb_evenements >= self.compaction_interval
+
+    def vider(self):
+        """Vide le journal (à appeler une fois le snapshot écrit)"""
+        if self._f is None:
+            self._f = open(self.path, 'a', encoding='utf-8')
+        self._f.truncate(0)
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self.nb_evenements = 0
+
+    def fermer(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+def journal_path(csv_path):
+    """data/emprunts.csv -> data/emprunts.journal"""
+    return os.path.splitext(csv_path)[0] + '.journal'
+
+
+def lire_evenements(path):
+    """Itère sur les événements d'un journal, en ignorant les lignes illisibles"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for ligne in f:
+            ligne = ligne.strip()
+            if not ligne:
+                continue
+            try:
+                yield json.loads(ligne)
+            except ValueError:
+                # Écriture interrompue par une coupure : l'événement n'a jamais été validé
+                print(f"⚠ Ligne de journal ignorée dans {path}")
+
+
+def appliquer_evenements(lignes, evenements, cle=None):
+    """
+    Applique des événements "set" à une liste de lignes (dict).
+    → cle=None : l'événement porte la position de la ligne ("index")
+    → sinon : la ligne est retrouvée par la valeur de sa colonne clé
+    """
+    positions = None
+    if cle is not None:
+        positions = {str(ligne.get(cle)): i for i, ligne in enumerate(lignes)}
+
+    for evenement in evenements:
+        if evenement.get('op') != 'set':
+            continue
+        ligne = evenement['ligne']
+        if cle is None:
+            index = evenement['index']
+        else:
+            index = positions.get(str(ligne.get(cle)), len(lignes))
+            positions[str(ligne.get(cle))] = index
+
+        if index < len(lignes):
+            lignes[index] = dict(ligne)
+        elif index == len(lignes):
+            lignes.append(dict(ligne))
+        else:
+            print(f"⚠ Événement de journal hors séquence ignoré (index {index})")
+    return lignes
+
+
+def lire_csv(csv_path):
+    """Lit un snapshot CSV en liste de dict (liste vide si le fichier n'existe pas)"""
+    if not os.path.exists(csv_path):
+        return []
+    with open(csv_path, 'r', newline='', encoding='utf-8-sig') as f:
+        return list(csv.DictReader(f))
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+
+def _lire_coherent(csv_path, lire_journal):
+    """
+    Snapshot + journal d'un même état : signature du snapshot, journal, snapshot, puis signature à nouveau.
+    Un "set" lu avant une compaction écraserait l'état plus récent de sa ligne dans le nouveau snapshot
+    (un emprunt TERMINE repasserait EN COURS) : si le snapshot a changé entre-temps, on recommence.
+    """
+    while True:
+        signature = _signature(csv_path)
+        journal = lire_journal()
+        lignes = lire_csv(csv_path)
+        if _signature(csv_path) == signature:
+            return signature, lignes, journal
+
+
+class SuiviJournal:
+    """
+    Suit un snapshot CSV et son journal depuis un autre processus (dashboard, rappels) :
+    ne relit que les octets ajoutés au journal depuis la dernière fois, et tout après une compaction.
+    """
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.journal_path = journal_path(csv_path)
+        self._signature = False  # Jamais chargé
+        self._offset = 0
+
+    def _lire_journal(self, debut):
+        """Lit les événements complets à partir de debut, retourne (événements, nouvel offset)"""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(debut)
+                donnees = f.read()
+        except FileNotFoundError:
+            return [], 0
+        fin = donnees.rfind(b'\n')
+        if fin < 0:
+            return [], debut
+        evenements = []
+        for ligne in donnees[:fin + 1].splitlines():
+            try:
+                if ligne.strip():
+                    evenements.append(json.loads(ligne))
+            except ValueError:
+                pass
+        return evenements, debut + fin + 1
+
+    def nouveaux_evenements(self):
+        """Événements ajoutés depuis le dernier appel, ou None s'il faut tout recharger (compaction)"""
+        if _signature(self.csv_path) != self._signature:
+            return None
+        try:
+            taille = os.stat(self.journal_path).st_size
+        except FileNotFoundError:
+            taille = 0
+        if taille < self._offset:
+            return None  # Journal vidé par une compaction
+        if taille == self._offset:
+            return []
+        evenements, offset = self._lire_journal(self._offset)
+        if _signature(self.csv_path) != self._signature:
+            return None  # Compaction pendant la lecture : ces octets peuvent venir du nouveau journal
+        self._offset = offset
+        return evenements
+
+    def recharger(self):
+        """Relit tout : retourne (lignes du snapshot, événements du journal) d'un même état"""
+        self._signature, lignes, (evenements, self._offset) = _lire_coherent(
+            self.csv_path, lambda: self._lire_journal(0))
+        return lignes, evenements
+
+
+def ecrire_csv(path, colonnes, lignes):
+    """Réécrit un snapshot CSV de façon atomique"""
+    def ecrire(f):
+        writer = csv.DictWriter(f, fieldnames=colonnes, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(lignes)
+    ecrire_atomique(path, ecrire)
+
+
+def lire_lignes(csv_path, cle=None):
+    """Lit un CSV et lui applique son journal : état courant, même entre deux compactions"""
+    _, lignes, evenements = _lire_coherent(csv_path, lambda: list(lire_evenements(journal_path(csv_path))))
+    return appliquer_evenements(lignes, evenements, cle)
+
+
+def ecrire_atomique(path, ecrire):
+    """Écrit un fichier via un fichier temporaire + fsync + rename (jamais de fichier à moitié écrit)"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        ecrire(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
@@ -1,59 +1,97 @@
-import pandas as pd
 import os
+from models.journal import Journal, journal_path, appliquer_evenements, lire_csv, ecrire_csv
+from models.attribution import ReserveCasiers
+
+COLONNES = ['id_casier', 'etat']
+
+
+class Casier:
+    __slots__ = ('id_casier', 'etat')
+
+    def __init__(self, id_casier, etat):
+        self.id_casier = id_casier
+        self.etat = etat
+
+    def ligne(self):
+        return {'id_casier': self.id_casier, 'etat': self.etat}
+
 
 class LockerManager:
-    def __init__(self):
-        self.csv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'casiers.csv')
-        self.df = None
+    def __init__(self, csv_path=None, politique=None):
+        self.csv_path = csv_path or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'casiers.csv')
+        self.casiers = []       # Dans l'ordre du fichier
+        self._par_id = {}       # id_casier -> Casier
+        self.journal = Journal(journal_path(self.csv_path))
         self._load_casiers()
-    
+        # Casiers disponibles tenus à jour à chaque changement d'état (models/attribution.py)
+        self.reserve = ReserveCasiers(self.get_libres(), politique,
+                                      os.path.join(os.path.dirname(self.csv_path), 'usure.json'))
+
     def _load_casiers(self):
-        """Charge les casiers depuis le fichier CSV"""
-        try:
-            self.df = pd.read_csv(self.csv_path)
-        except FileNotFoundError:
+        """Charge les casiers depuis le fichier CSV, puis rejoue le journal"""
+        if not os.path.exists(self.csv_path):
             print(f"Erreur: Le fichier {self.csv_path} n'existe pas")
-            self.df = pd.DataFrame()
-    
+        evenements = list(self.journal.rejouer())
+        lignes = appliquer_evenements(lire_csv(self.csv_path), evenements, cle='id_casier')
+        self.casiers = [Casier(int(ligne['id_casier']), (ligne.get('etat') or '').strip()) for ligne in lignes]
+        self._par_id = {casier.id_casier: casier for casier in self.casiers}
+        if evenements:
+            print(f"Rejeu de {len(evenements)} événement(s) du journal des casiers")
+            self._save_casiers()
+
     def _save_casiers(self):
-        """Sauvegarde les casiers dans le fichier CSV"""
-        if self.df is not None and not self.df.empty:
-            self.df.to_csv(self.csv_path, index=False)
-    
-    def get_premier_libre(self):
+        """Compaction : réécrit le snapshot CSV de façon atomique puis vide le journal"""
+        if self.casiers:
+            ecrire_csv(self.csv_path, COLONNES, (casier.ligne() for casier in self.casiers))
+            self.journal.vider()
+
+    def _changer_etat(self, id_casier, etat):
+        """Journalise puis applique le nouvel état d'un casier"""
+        casier = self._par_id.get(int(id_casier))
+        if casier is None:
+            return False
+        self.journal.ajouter({'op': 'set', 'ligne': {'id_casier': casier.id_casier, 'etat': etat}})
+        casier.etat = etat
+        if etat == 'PLEIN':
+            self.reserve.liberer(casier.id_casier)
+        else:
+            self.reserve.prendre(casier.id_casier)
+        if self.journal.doit_compacter():
+            self._save_casiers()
+        return True
+
+    def get_premier_libre(self, banc=None):
         """
-        Récupère le premier casier DISPONIBLE pour un emprunt.
+        Récupère le casier DISPONIBLE à attribuer pour un emprunt, selon la politique d'attribution.
         → DISPONIBLE = PLEIN (un câble est présent)
         """
-        casiers_disponibles = self.df[self.df['etat'].str.upper() == 'PLEIN']
-        if not casiers_disponibles.empty:
-            return casiers_disponibles.iloc[0]['id_casier']
-        return None
-    
+        return self.reserve.choisir(banc)
+
+    def get_libres(self):
+        """Tous les casiers DISPONIBLES (PLEIN), dans l'ordre du fichier"""
+        return [casier.id_casier for casier in self.casiers if casier.etat.upper() == 'PLEIN']
+
     def get_premier_plein(self):
         """Alias, laissé si ton code l'utilise ailleurs"""
         return self.get_premier_libre()
-    
+
     def casier_vide(self, id_casier):
         """
         Un utilisateur REND un câble ⇒ casier devient VIDE
         """
-        mask = self.df['id_casier'] == id_casier
-        if mask.any():
-            self.df.loc[mask, 'etat'] = 'VIDE'
-            self._save_casiers()
-            return True
-        return False
-    
+        return self._changer_etat(id_casier, 'VIDE')
+
     def casier_plein(self, id_casier):
         """
         Un utilisateur PREND un câble ⇒ casier devient PLEIN ou VIDE ?
         Nouvelle logique : un casier plein signifie "câble présent"
         Donc quand un étudiant PREND un câble → il n'y en a plus → VIDE.
         """
-        mask = self.df['id_casier'] == id_casier
-        if mask.any():
-            self.df.loc[mask, 'etat'] = 'PLEIN'
+        return self._changer_etat(id_casier, 'PLEIN')
+
+    def fermer(self):
+        """Compacte le journal avant l'arrêt"""
+        if self.journal.nb_evenements:
             self._save_casiers()
-            return True
-        return False
\ No newline at end of file
+        self.journal.fermer()
+        self.reserve.fermer()
@@ -0,0 +1,158 @@
+"""
+Détection des emprunts en retard.
+
+→ DetecteurRetards : les emprunts EN COURS dans un tas trié par date de début.
+  "Qui est en retard à T ?" ne parcourt que les emprunts commencés avant T - délai :
+  O(k log n) pour k retards parmi n emprunts en cours, quelle que soit la taille de l'historique.
+  Seules les dates des emprunts en cours sont parsées.
+→ SuiviRetards : tient un détecteur à jour depuis le stockage, depuis un autre processus
+  (rappels, dashboard) : fin du journal relue en CSV, emprunts EN COURS seuls (index) en SQLite.
+"""
+import heapq
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+from models.journal import SuiviJournal
+
+logger = logging.getLogger("models.retards")
+
+FORMAT_TIMESTAMP = "%Y-%m-%d %H:%M:%S"
+DELAI_RETARD = timedelta(days=1)
+
+
+class Retard:
+    """Un emprunt EN COURS (index = position de la ligne dans l'historique)"""
+    __slots__ = ('index', 'mail', 'id_casier', 'debut')
+
+    def __init__(self, index, mail, id_casier, debut):
+        self.index = index
+        self.mail = mail
+        self.id_casier = id_casier
+        self.debut = debut
+
+    def age(self, maintenant=None):
+        return (maintenant or datetime.now()) - self.debut
+
+    def ligne(self):
+        return {'mail': self.mail, 'id_casier': self.id_casier, 'debut': self.debut}
+
+
+class DetecteurRetards:
+    def __init__(self):
+        self._tas = []          # (debut, index, Retard), entrées périmées retirées paresseusement
+        self._en_cours = {}     # index -> Retard
+
+    def __len__(self):
+        return len(self._en_cours)
+
+    def ouvrir(self, index, mail, id_casier, debut):
+        """Emprunt EN COURS ; ignoré sans mail (aucun destinataire) ou avec une date illisible"""
+        mail = (mail or '').strip()
+        if not mail:
+            self.fermer(index)
+            return
+        if isinstance(debut, str):
+            try:
+                debut = datetime.strptime(debut.strip(), FORMAT_TIMESTAMP)
+            except ValueError:
+                logger.warning("Impossible de parser le timestamp '%s' pour %s, ligne ignorée", debut, mail)
+                self.fermer(index)
+                return
+        retard = Retard(index, mail, id_casier, debut)
+        self._en_cours[index] = retard
+        heapq.heappush(self._tas, (debut, index, retard))
+        if len(self._tas) > 2 * len(self._en_cours) + 64:
+            self._compacter()
+
+    def fermer(self, index):
+        self._en_cours.pop(index, None)
+
+    def appliquer(self, index, ligne):
+        """Applique l'état d'une ligne d'emprunts.csv (snapshot ou événement du journal)"""
+        if (ligne.get('statut') or '').strip().upper() != 'EN COURS':
+            self.fermer(index)
+            return
+        actuel = self._en_cours.get(index)
+        if actuel is not None and actuel.mail == (ligne.get('mail') or '').strip():
+            return  # Ligne inchangée (événement rejoué)
+        self.ouvrir(index, ligne.get('mail'), ligne.get('id_casier'), ligne.get('timestamp') or '')
+
+    def _valide(self, entree):
+        return self._en_cours.get(entree[1]) is entree[2]
+
+    def _compacter(self):
+        self._tas = [entree for entree in self._tas if self._valide(entree)]
+        heapq.heapify(self._tas)
+
+    def plus_ancien(self):
+        """L'emprunt en cours le plus ancien (ou None)"""
+        while self._tas and not self._valide(self._tas[0]):
+            heapq.heappop(self._tas)
+        return self._tas[0][2] if self._tas else None
+
+    def en_retard(self, maintenant=None, delai=DELAI_RETARD):
+        """Emprunts commencés avant maintenant - delai, du plus ancien au plus récent"""
+        limite = (maintenant or datetime.now()) - delai
+        retards = []
+        while self._tas and self._tas[0][0] <= limite:
+            entree = heapq.heappop(self._tas)
+            if self._valide(entree):
+                retards.append(entree)
+        for entree in retards:
+            heapq.heappush(self._tas, entree)
+        return [entree[2] for entree in retards]
+
+
+class SuiviRetards:
+    """Détecteur alimenté par le stockage (IROBOT_STORAGE), rafraîchi à chaque requête"""
+
+    def __init__(self, data_dir, backend='csv'):
+        self.backend = backend
+        self.detecteur = DetecteurRetards()
+        if backend == 'sqlite':
+            self.db_path = os.path.join(data_dir, 'irobot.db')
+            self._conn = None
+            self._data_version = None
+        else:
+            self._suivi = SuiviJournal(os.path.join(data_dir, 'emprunts.csv'))
+
+    def rafraichir(self):
+        if self.backend == 'sqlite':
+            self._rafraichir_sqlite()
+            return
+        evenements = self._suivi.nouveaux_evenements()
+        if evenements is None:
+            self.detecteur = DetecteurRetards()
+            lignes, evenements = self._suivi.recharger()
+            for index, ligne in enumerate(lignes):
+                self.detecteur.appliquer(index, ligne)
+        for evenement in evenements:
+            if evenement.get('op') == 'set':
+                self.detecteur.appliquer(evenement['index'], evenement['ligne'])
+
+    def _rafraichir_sqlite(self):
+        if self._conn is None:
+            if not os.path.exists(self.db_path):
+                return
+            self._conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        self._data_version = version
+        detecteur = DetecteurRetards()
+        # Index partiel des emprunts EN COURS : seules les lignes ouvertes sont lues
+        for id_, mail, id_casier, timestamp in self._conn.execute(
+                "SELECT id, mail, id_casier, timestamp FROM emprunts WHERE statut = 'EN COURS'"):
+            detecteur.ouvrir(id_ - 1, mail, id_casier, timestamp)
+        self.detecteur = detecteur
+
+    def en_retard(self, maintenant=None, delai=DELAI_RETARD):
+        self.rafraichir()
+        return self.detecteur.en_retard(maintenant, delai)
+
+    def fermer(self):
+        if self.backend == 'sqlite' and self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,477 @@
+"""
+Couche de stockage interchangeable pour les utilisateurs, casiers et emprunts.
+
+Deux backends exposent la même interface (users / casiers / emprunts + emprunter / rendre / annuler) :
+→ "csv"    : les managers historiques (CSV + journal), un fichier par table
+→ "sqlite" : une base SQLite en mode WAL partagée par tous les processus, avec
+             une transaction unique pour "attribuer un casier + créer l'emprunt"
+
+Le backend est choisi par la variable d'environnement IROBOT_STORAGE ou la clé "stockage"
+de data/config.json (csv par défaut, voir config.py).
+Les CSV restent disponibles via import/export :
+    python3 models/stockage.py import   # CSV -> data/irobot.db
+    python3 models/stockage.py export   # data/irobot.db -> CSV
+"""
+import csv
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.journal import lire_lignes, ecrire_atomique
+from models.attribution import ReserveCasiers
+from models.analyses import Analyses
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+DB_PATH = os.path.join(DATA_DIR, 'irobot.db')
+
+# table -> (fichier CSV, colonnes, colonne clé pour le journal)
+TABLES = {
+    'utilisateurs': ('utilisateurs.csv', ['uid', 'mail', 'date_inscription'], 'uid'),
+    'casiers': ('casiers.csv', ['id_casier', 'etat'], 'id_casier'),
+    'emprunts': ('emprunts.csv', ['mail', 'id_casier', 'timestamp', 'statut', 'timestamp_fin'], None),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS utilisateurs (
+    uid TEXT PRIMARY KEY,
+    mail TEXT NOT NULL UNIQUE,
+    date_inscription TEXT
+);
+CREATE TABLE IF NOT EXISTS casiers (
+    id_casier INTEGER PRIMARY KEY,
+    etat TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_casiers_etat ON casiers(etat, id_casier);
+CREATE TABLE IF NOT EXISTS emprunts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mail TEXT NOT NULL,
+    id_casier INTEGER NOT NULL,
+    timestamp TEXT,
+    statut TEXT NOT NULL,
+    timestamp_fin TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_emprunts_mail_en_cours ON emprunts(mail) WHERE statut = 'EN COURS';
+CREATE INDEX IF NOT EXISTS idx_emprunts_casier_en_cours ON emprunts(id_casier) WHERE statut = 'EN COURS';
+"""
+
+
+def backend_configure():
+    """Backend choisi dans la configuration (IROBOT_STORAGE ou "stockage" dans data/config.json)"""
+    from config import obtenir_config
+    return obtenir_config().stockage
+
+
+def ouvrir_stockage(backend=None, data_dir=DATA_DIR):
+    """Retourne le stockage configuré (StockageCSV ou StockageSQLite)"""
+    backend = backend or backend_configure()
+    if backend == 'sqlite':
+        return StockageSQLite(os.path.join(data_dir, 'irobot.db'), data_dir)
+    if backend == 'csv':
+        return StockageCSV(data_dir)
+    raise ValueError(f"Backend de stockage inconnu: {backend}")
+
+
+def lire_table(table, data_dir=DATA_DIR, backend=None):
+    """
+    Lecture seule de l'état courant d'une table (liste de dict), sans charger les managers.
+    → Pour le dashboard, les scripts de rappel, etc.
+    """
+    backend = backend or backend_configure()
+    fichier, colonnes, cle = TABLES[table]
+    if backend == 'sqlite':
+        db_path = os.path.join(data_dir, 'irobot.db')
+        if not os.path.exists(db_path):
+            return []
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=5)
+        conn.row_factory = sqlite3.Row
+        try:
+            existantes = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+            colonnes = [colonne for colonne in colonnes if colonne in existantes]  # Base pas encore migrée
+            ordre = 'id' if table == 'emprunts' else colonnes[0]
+            rows = conn.execute(f"SELECT {', '.join(colonnes)} FROM {table} ORDER BY {ordre}").fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+    return lire_lignes(os.path.join(data_dir, fichier), cle=cle)
+
+
+class StockageCSV:
+    """Backend historique : un manager par fichier CSV (pas de transaction entre fichiers)"""
+
+    def __init__(self, data_dir=DATA_DIR):
+        from models.user_manager import UserManager
+        from models.locker_manager import LockerManager
+        from models.emprunt_manager import EmpruntManager
+
+        self.users = UserManager(os.path.join(data_dir, 'utilisateurs.csv'))
+        self.casiers = LockerManager(os.path.join(data_dir, 'casiers.csv'))
+        self.emprunts = EmpruntManager(os.path.join(data_dir, 'emprunts.csv'))
+        self.analyses = Analyses(os.path.join(data_dir, 'analyses.db'))
+        self.analyses.verifier_historique(lambda: len(self.emprunts.emprunts))
+
+    def emprunter(self, mail, timestamp, banc=None):
+        """
+        Attribue un casier disponible (politique d'attribution, banc du lecteur) et crée l'emprunt.
+        Retourne l'id_casier ou None.
+        """
+        id_casier = self.casiers.get_premier_libre(banc)
+        if id_casier is None:
+            if not self.emprunts.get_emprunt(mail):
+                self.analyses.refus(timestamp)
+            return None
+        id_casier = int(id_casier)
+        if not self.emprunts.creer_emprunt(mail, id_casier, timestamp):
+            return None
+        self.casiers.casier_vide(id_casier)
+        self.analyses.emprunt(timestamp, self.casiers.reserve.nb_libres())
+        return id_casier
+
+    def rendre(self, mail, timestamp):
+        """Clôture l'emprunt EN COURS et marque le casier PLEIN. Retourne l'id_casier ou None"""
+        id_casier = self.emprunts.get_casier_en_cours(mail)
+        if id_casier is None:
+            return None
+        debut = self.emprunts.get_debut_en_cours(mail)
+        self.emprunts.cloturer_emprunt(mail, timestamp)
+        self.casiers.casier_plein(id_casier)
+        self.analyses.rendu(debut, timestamp, self.casiers.reserve.nb_libres())
+        return id_casier
+
+    def annuler(self, mail, id_casier, timestamp):
+        """
+        Emprunt dont le casier n'a jamais été ouvert : statut ANNULE, casier de nouveau PLEIN.
+        Ni rendu ni durée dans les analyses, ni ouverture dans l'usure. Retourne l'id_casier ou None.
+        """
+        if self.emprunts.get_casier_en_cours(mail) != id_casier:
+            return None
+        debut = self.emprunts.get_debut_en_cours(mail)
+        self.emprunts.cloturer_emprunt(mail, timestamp, statut='ANNULE')
+        self.casiers.casier_plein(id_casier)
+        self.analyses.annulation(debut, timestamp, self.casiers.reserve.nb_libres())
+        return id_casier
+
+    def fermer(self):
+        self.analyses.fermer()
+        self.emprunts.fermer()
+        self.casiers.fermer()
+        self.users.fermer()
+
+
+class StockageSQLite:
+    """
+    Backend SQLite (mode WAL) : lecteurs et écrivain de plusieurs processus
+    partagent un état cohérent, et chaque passage de carte est une seule transaction.
+    """
+
+    def __init__(self, db_path=DB_PATH, data_dir=DATA_DIR):
+        self.db_path = db_path
+        self.data_dir = data_dir
+        nouvelle_base = not os.path.exists(db_path)
+
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript(SCHEMA)
+        self._migrer()
+
+        self.users = SQLiteUserManager(self)
+        self.casiers = SQLiteLockerManager(self)
+        self.emprunts = SQLiteEmpruntManager(self)
+
+        if nouvelle_base:
+            self.importer_csv()
+        else:
+            self.casiers.charger_reserve()
+        self.analyses = Analyses(os.path.join(os.path.dirname(db_path), 'analyses.db'))
+        self.analyses.verifier_historique(lambda: self.un("SELECT COUNT(*) AS n FROM emprunts")['n'])
+
+    def _migrer(self):
+        """Colonnes ajoutées depuis la création de la base"""
+        colonnes = {row['name'] for row in self.conn.execute("PRAGMA table_info(emprunts)")}
+        if 'timestamp_fin' not in colonnes:
+            self.conn.execute("ALTER TABLE emprunts ADD COLUMN timestamp_fin TEXT")
+
+    def transaction(self):
+        return _Transaction(self)
+
+    def un(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    def tous(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def emprunter(self, mail, timestamp, banc=None):
+        """Attribue un casier disponible (politique d'attribution) et crée l'emprunt, de façon atomique"""
+        reserve = self.casiers.reserve
+        with self.transaction() as conn:
+            if conn.execute("SELECT 1 FROM emprunts WHERE mail = ? AND statut = 'EN COURS'", (mail,)).fetchone():
+                return None
+            for tentative in range(2):
+                id_casier = reserve.choisir(banc)
+                if id_casier is None:
+                    self.analyses.refus(timestamp)
+                    return None
+                if conn.execute("UPDATE casiers SET etat = 'VIDE' WHERE id_casier = ? AND etat = 'PLEIN'",
+                                (id_casier,)).rowcount:
+                    break
+                # Casier pris par un autre processus : la réserve est resynchronisée avec la base
+                reserve.charger(self.casiers.get_libres(conn))
+            else:
+                return None
+            conn.execute(
+                "INSERT INTO emprunts (mail, id_casier, timestamp, statut) VALUES (?, ?, ?, 'EN COURS')",
+                (mail, id_casier, timestamp)
+            )
+        reserve.prendre(id_casier)
+        self.analyses.emprunt(timestamp, reserve.nb_libres())
+        return id_casier
+
+    def rendre(self, mail, timestamp):
+        """Clôture l'emprunt EN COURS et marque le casier PLEIN, de façon atomique"""
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT id, id_casier, timestamp FROM emprunts WHERE mail = ? AND statut = 'EN COURS' "
+                "ORDER BY id DESC LIMIT 1",
+                (mail,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE emprunts SET timestamp_fin = ?, statut = 'TERMINE' WHERE id = ?",
+                         (timestamp, row['id']))
+            conn.execute("UPDATE casiers SET etat = 'PLEIN' WHERE id_casier = ?", (row['id_casier'],))
+        self.casiers.reserve.liberer(row['id_casier'])
+        self.analyses.rendu(row['timestamp'], timestamp, self.casiers.reserve.nb_libres())
+        return row['id_casier']
+
+    def annuler(self, mail, id_casier, timestamp):
+        """Emprunt dont le casier n'a jamais été ouvert : statut ANNULE, casier PLEIN, de façon atomique"""
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT id, timestamp FROM emprunts WHERE mail = ? AND id_casier = ? AND statut = 'EN COURS'",
+                (mail, int(id_casier))
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE emprunts SET timestamp_fin = ?, statut = 'ANNULE' WHERE id = ?",
+                         (timestamp, row['id']))
+            conn.execute("UPDATE casiers SET etat = 'PLEIN' WHERE id_casier = ?", (int(id_casier),))
+        self.casiers.reserve.liberer(id_casier)
+        self.analyses.annulation(row['timestamp'], timestamp, self.casiers.reserve.nb_libres())
+        return int(id_casier)
+
+    def importer_csv(self, data_dir=None):
+        """Remplace le contenu de la base par celui des CSV (snapshot + journal)"""
+        data_dir = data_dir or self.data_dir
+        with self.transaction() as conn:
+            for table, (fichier, colonnes, cle) in TABLES.items():
+                lignes = lire_lignes(os.path.join(data_dir, fichier), cle=cle)
+                conn.execute(f"DELETE FROM {table}")
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(colonnes)}) VALUES ({', '.join('?' * len(colonnes))})",
+                    [[_normaliser(colonne, ligne.get(colonne)) for colonne in colonnes] for ligne in lignes]
+                )
+                print(f"✓ {len(lignes)} ligne(s) importée(s) dans {table}")
+        self.casiers.charger_reserve()
+
+    def exporter_csv(self, data_dir=None):
+        """Écrit l'état de la base dans les CSV habituels (écriture atomique)"""
+        data_dir = data_dir or self.data_dir
+        for table, (fichier, colonnes, cle) in TABLES.items():
+            lignes = lire_table(table, os.path.dirname(self.db_path), backend='sqlite')
+
+            def ecrire(f, lignes=lignes, colonnes=colonnes):
+                writer = csv.DictWriter(f, fieldnames=colonnes)
+                writer.writeheader()
+                writer.writerows(lignes)
+
+            ecrire_atomique(os.path.join(data_dir, fichier), ecrire)
+            print(f"✓ {len(lignes)} ligne(s) exportée(s) vers {fichier}")
+
+    def fermer(self):
+        self.analyses.fermer()
+        self.casiers.fermer()
+        with self._lock:
+            self.conn.close()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK, verrou d'écriture pris dès le début"""
+
+    def __init__(self, stockage):
+        self.stockage = stockage
+
+    def __enter__(self):
+        self.stockage._lock.acquire()
+        self.stockage.conn.execute("BEGIN IMMEDIATE")
+        return self.stockage.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.stockage.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.stockage._lock.release()
+        return False
+
+
+def _normaliser(colonne, valeur):
+    if colonne == 'id_casier' and valeur not in (None, ''):
+        return int(valeur)
+    if colonne == 'etat' and valeur:
+        return str(valeur).strip().upper()
+    if colonne == 'uid' and valeur is not None:
+        return str(valeur)
+    if colonne == 'timestamp_fin' and not valeur:
+        return None
+    return valeur
+
+
+class SQLiteUserManager:
+    """Même interface que UserManager, sur la table utilisateurs"""
+
+    def __init__(self, stockage):
+        self.stockage = stockage
+
+    def get_mail_by_uid(self, uid):
+        row = self.stockage.un("SELECT mail FROM utilisateurs WHERE uid = ?", (str(uid),))
+        return row['mail'] if row else None
+
+    def register_user(self, uid, mail):
+        """Associe un UID à un mail s'ils ne sont pas déjà utilisés"""
+        try:
+            with self.stockage.transaction() as conn:
+                conn.execute(
+                    "INSERT INTO utilisateurs (uid, mail, date_inscription) VALUES (?, ?, ?)",
+                    (str(uid), mail, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def fermer(self):
+        pass
+
+
+class SQLiteLockerManager:
+    """Même interface que LockerManager, sur la table casiers"""
+
+    def __init__(self, stockage, politique=None):
+        self.stockage = stockage
+        self.reserve = ReserveCasiers((), politique, os.path.join(os.path.dirname(stockage.db_path), 'usure.json'))
+
+    def charger_reserve(self):
+        """Remplit la réserve depuis la table (ouverture, import CSV)"""
+        self.reserve.charger(self.get_libres())
+
+    def get_premier_libre(self, banc=None):
+        return self.reserve.choisir(banc)
+
+    def get_libres(self, conn=None):
+        sql = "SELECT id_casier FROM casiers WHERE etat = 'PLEIN' ORDER BY id_casier"
+        rows = conn.execute(sql).fetchall() if conn is not None else self.stockage.tous(sql)
+        return [row['id_casier'] for row in rows]
+
+    def get_premier_plein(self):
+        return self.get_premier_libre()
+
+    def _changer_etat(self, id_casier, etat):
+        with self.stockage.transaction() as conn:
+            cur = conn.execute("UPDATE casiers SET etat = ? WHERE id_casier = ?", (etat, int(id_casier)))
+        if not cur.rowcount:
+            return False
+        if etat == 'PLEIN':
+            self.reserve.liberer(id_casier)
+        else:
+            self.reserve.prendre(id_casier)
+        return True
+
+    def casier_vide(self, id_casier):
+        return self._changer_etat(id_casier, 'VIDE')
+
+    def casier_plein(self, id_casier):
+        return self._changer_etat(id_casier, 'PLEIN')
+
+    def fermer(self):
+        self.reserve.fermer()
+
+
+class SQLiteEmpruntManager:
+    """Même interface que EmpruntManager, sur la table emprunts"""
+
+    def __init__(self, stockage):
+        self.stockage = stockage
+
+    def creer_emprunt(self, mail, id_casier, timestamp):
+        try:
+            with self.stockage.transaction() as conn:
+                conn.execute(
+                    "INSERT INTO emprunts (mail, id_casier, timestamp, statut) VALUES (?, ?, ?, 'EN COURS')",
+                    (mail, int(id_casier), timestamp)
+                )
+            return True
+        except sqlite3.IntegrityError:
+            # L'index unique partiel interdit un second emprunt EN COURS
+            return False
+
+    def cloturer_emprunt(self, mail, timestamp):
+        with self.stockage.transaction() as conn:
+            cur = conn.execute(
+                "UPDATE emprunts SET timestamp_fin = ?, statut = 'TERMINE' WHERE mail = ? AND statut = 'EN COURS'",
+                (timestamp, mail)
+            )
+            return True if cur.rowcount else None
+
+    def get_emprunt(self, mail):
+        return self.get_casier_en_cours(mail) is not None
+
+    def get_casier_en_cours(self, mail):
+        row = self.stockage.un(
+            "SELECT id_casier FROM emprunts WHERE mail = ? AND statut = 'EN COURS'", (mail,)
+        )
+        return int(row['id_casier']) if row else None
+
+    def get_debut_en_cours(self, mail):
+        row = self.stockage.un("SELECT timestamp FROM emprunts WHERE mail = ? AND statut = 'EN COURS'", (mail,))
+        return row['timestamp'] if row else None
+
+    def get_mail_par_casier(self, id_casier):
+        row = self.stockage.un(
+            "SELECT mail FROM emprunts WHERE id_casier = ? AND statut = 'EN COURS'", (int(id_casier),)
+        )
+        return row['mail'] if row else None
+
+    def get_emprunts_en_cours(self):
+        rows = self.stockage.tous("SELECT mail, id_casier FROM emprunts WHERE statut = 'EN COURS'")
+        return {row['mail']: int(row['id_casier']) for row in rows}
+
+    def get_historique(self):
+        import pandas as pd
+        return pd.DataFrame(lire_table('emprunts', os.path.dirname(self.stockage.db_path), backend='sqlite'))
+
+    def fermer(self):
+        pass
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("import", "export"):
+        print("Usage: python3 models/stockage.py import|export")
+        print("  import : CSV -> data/irobot.db")
+        print("  export : data/irobot.db -> CSV")
+        sys.exit(1)
+
+    stockage = StockageSQLite()
+    try:
+        if sys.argv[1] == "import":
+            stockage.importer_csv()
+        else:
+            stockage.exporter_csv()
+    finally:
+        stockage.fermer()
@@ -1,42 +1,67 @@
-import pandas as pd
 import os
 from datetime import datetime
+from models.journal import Journal, journal_path, appliquer_evenements, lire_csv, ecrire_csv
+
+COLONNES = ['uid', 'mail', 'date_inscription']
 
 class UserManager:
-    def __init__(self):
-        self.csv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'utilisateurs.csv')
-        self.df = None
+    def __init__(self, csv_path=None):
+        self.csv_path = csv_path or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'utilisateurs.csv')
+        self.users = {}     # uid -> ligne (dict)
+        self._mails = set()
+        self.journal = Journal(journal_path(self.csv_path))
         self._load_users()
 
     def _load_users(self):
         try:
-            if os.path.exists(self.csv_path):
-                self.df = pd.read_csv(self.csv_path, dtype={'uid': str})
-            else:
-                self.df = pd.DataFrame(columns=['uid', 'mail', 'date_inscription'])
-                self.df.to_csv(self.csv_path, index=False)
+            evenements = list(self.journal.rejouer())
+            lignes = appliquer_evenements(lire_csv(self.csv_path), evenements, cle='uid')
         except Exception as e:
             print(f"Erreur chargement utilisateurs: {e}")
-            self.df = pd.DataFrame(columns=['uid', 'mail', 'date_inscription'])
+            evenements, lignes = [], []
+
+        self.users = {}
+        for ligne in lignes:
+            ligne['uid'] = str(ligne['uid'])
+            self.users[ligne['uid']] = ligne
+        self._mails = {ligne['mail'] for ligne in lignes}
+
+        if evenements:
+            print(f"Rejeu de {len(evenements)} événement(s) du journal des utilisateurs")
+        if evenements or not os.path.exists(self.csv_path):
+            self._save_users()
+
+    def _save_users(self):
+        """Compaction : réécrit le snapshot CSV de façon atomique puis vide le journal"""
+        ecrire_csv(self.csv_path, COLONNES, self.users.values())
+        self.journal.vider()
 
     def get_mail_by_uid(self, uid):
-        uid = str(uid)
-        user = self.df[self.df['uid'] == uid]
-        if not user.empty:
-            return user.iloc[0]['mail']
+        user = self.users.get(str(uid))
+        if user is not None:
+            return user['mail']
         return None
 
     def register_user(self, uid, mail):
         """Associe un UID à un mail s'ils ne sont pas déjà utilisés"""
         uid = str(uid)
-        if uid in self.df['uid'].values or mail in self.df['mail'].values:
+        if uid in self.users or mail in self._mails:
             return False
-        
-        new_user = pd.DataFrame([{
+
+        ligne = {
             'uid': uid,
             'mail': mail,
             'date_inscription': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }])
-        self.df = pd.concat([self.df, new_user], ignore_index=True)
-        self.df.to_csv(self.csv_path, index=False)
-        return True
\ No newline at end of file
+        }
+        self.journal.ajouter({'op': 'set', 'ligne': ligne})
+        self.users[uid] = ligne
+        self._mails.add(mail)
+        if self.journal.doit_compacter():
+            self._save_users()
+        return True
+
+    def fermer(self):
+        """Compacte le journal avant l'arrêt"""
+        if self.journal.nb_evenements:
+            self._save_users()
+        self.journal.fermer()
@@ -2,20 +2,19 @@
 #
 # 1) Principe
 #    - Utiliser cron pour lancer le script chaque jour à 08:55.
-#    - Le script doit être appelé depuis son répertoire pour que ./data/emprunts.csv soit trouvé.
+#    - Le script utilise des chemins absolus (data/, template.html) : il peut être lancé depuis n'importe quel répertoire.
+#    - Alternative sans cron : smtp/planificateur.py (voir 5).
 #
 # 2) Entrée crontab recommandée (à ajouter via `crontab -e`)
-#    55 8 * * * cd /[chemin vers le dossier du script] && /usr/bin/env python3 [nom du fichier].py >/dev/null 2>&1
+#    55 8 * * * /usr/bin/env python3 /[chemin vers iRobot]/smtp/smtp_server.py >/dev/null 2>&1
 #
-#    - cd ... : garantit le bon répertoire de travail.
 #    - /usr/bin/env python3 : utilise l'interpréteur système.
 #    - >/dev/null 2>&1 : supprime toute sortie (pas de fichier de logs).
 #
 # 3) Commandes utiles
 #    - Éditer la crontab : crontab -e
-#    - Tester manuellement : 
-#         cd [chemin vers le dossier du script]
-#         /usr/bin/env python3 [nom du fichier].py
+#    - Tester manuellement :
+#         /usr/bin/env python3 /[chemin vers iRobot]/smtp/smtp_server.py
 #    - Vérifier le démon cron (Ubuntu) :
 #         sudo systemctl status cron.service
 #       ou (ancienne méthode) :
@@ -25,6 +24,16 @@
 #         journalctl -u cron --since "1 hour ago"
 #
 # 4) Remarques / bonnes pratiques
-#    - Utiliser chemins absolus dans le script si tu préfères éviter le `cd`.
 #    - Pour debug temporaire, supprimer la redirection `>/dev/null 2>&1` pour voir la sortie/erreurs.
-#    - Les identifiants SMTP restent dans le script : pour plus de sécurité, tu peux migrer vers des variables d'environnement plus tard.
\ No newline at end of file
+#    - Les identifiants SMTP restent dans le script : pour plus de sécurité, tu peux migrer vers des variables d'environnement plus tard.
+#
+# 5) Planificateur intégré (remplace la crontab)
+#    - smtp/planificateur.py tourne en continu : rappel quotidien (08:55) + relance unique après 3 jours (09:00).
+#    - Template et phrases restent en mémoire (relus seulement s'ils sont modifiés), pas d'interpréteur relancé chaque jour.
+#    - Réglages : --heure-rappel, --heure-relance, --jours-relance (0 = pas de relance), --data-dir
+#      (ou variables HEURE_RAPPEL, HEURE_RELANCE, JOURS_RELANCE, IROBOT_DATA_DIR).
+#    - Lancer une tâche tout de suite : python3 smtp/planificateur.py --maintenant rappel
+#    - Supervision : dernière et prochaine exécution de chaque tâche dans data/planificateur.json.
+#    - Service systemd (à la place de la crontab) :
+#         ExecStart=/usr/bin/env python3 /[chemin vers iRobot]/smtp/planificateur.py
+#         Restart=on-failure
@@ -0,0 +1,110 @@
+#Gabarits de mail précompilés : le template est découpé une seule fois en segments statiques et champs
+#→ Rendu d'un destinataire = une concaténation (plus de re.sub sur tout le HTML à chaque mail)
+#→ Le mail est produit directement en octets (CRLF, envoyé tel quel par smtplib) : en-têtes et structure MIME
+#  encodés une fois, seules les parties qui dépendent du destinataire sont encodées à chaque rendu
+
+import base64
+import re
+import string
+import uuid
+from email.header import Header
+from html import escape
+
+
+def echapper_html(texte):
+    """Texte échappé, retours à la ligne en <br>"""
+    return escape(texte).replace('\n', '<br>')
+
+
+class Gabarit:
+    """Suite de segments : (texte, None) statique ou (None, champ) remplacé au rendu"""
+
+    def __init__(self, segments, echapper=None):
+        self.segments = tuple(segments)
+        self.champs = frozenset(champ for _, champ in self.segments if champ is not None)
+        self.echapper = echapper
+
+    @classmethod
+    def depuis_html(cls, html, champs):
+        """
+        Découpe un HTML dont le contenu des <span id="..."> est remplacé au rendu.
+        champs : {id_span: nom du champ}
+        """
+        motif = re.compile(
+            r'(<span[^>]*id=["\'](' + '|'.join(re.escape(id_span) for id_span in champs) + r')["\'][^>]*>).*?(</span>)',
+            flags=re.IGNORECASE | re.DOTALL
+        )
+        segments = []
+        position = 0
+        for m in motif.finditer(html):
+            segments.append((html[position:m.end(1)], None))
+            segments.append((None, champs[m.group(2)]))
+            position = m.start(3)
+        segments.append((html[position:], None))
+        return cls(segments, echapper_html)
+
+    @classmethod
+    def depuis_format(cls, texte, echapper=None):
+        """Découpe un texte au format str.format ("... {phrase} ...")"""
+        segments = []
+        for statique, champ, _, _ in string.Formatter().parse(texte):
+            if statique:
+                segments.append((statique, None))
+            if champ is not None:
+                segments.append((None, champ))
+        return cls(segments, echapper)
+
+    def rendre(self, valeurs):
+        echapper = self.echapper
+        if echapper:
+            valeurs = {champ: echapper(valeurs[champ]) for champ in self.champs}
+        return "".join([texte if champ is None else valeurs[champ] for texte, champ in self.segments])
+
+
+def _en_tete(nom, valeur):
+    try:
+        valeur.encode("ascii")
+    except UnicodeEncodeError:
+        valeur = Header(valeur, "utf-8", header_name=nom).encode(linesep="\r\n")
+    return f"{nom}: {valeur}\r\n".encode("ascii")
+
+
+class ModeleMail:
+    """
+    Mail multipart/alternative (texte brut + HTML) rendu pour chaque destinataire en octets,
+    prêts pour smtplib.sendmail().
+    → En-têtes communs, délimiteurs et en-têtes des parties : encodés à la construction
+    → Une partie sans champ (ex. template sans <span> à remplir) est encodée une seule fois
+    """
+
+    def __init__(self, texte, html, from_email, sujet):
+        self.texte = texte
+        self.html = html
+        frontiere = f"==============={uuid.uuid4().hex[:19]}=="
+        self._debut = (
+            f'Content-Type: multipart/alternative; boundary="{frontiere}"\r\n'.encode("ascii")
+            + b"MIME-Version: 1.0\r\n"
+            + _en_tete("Subject", sujet)
+            + _en_tete("From", from_email)
+        )
+        self._parties = []
+        for gabarit, sous_type in ((texte, "plain"), (html, "html")):
+            en_tete = (f"\r\n--{frontiere}\r\n"
+                       f'Content-Type: text/{sous_type}; charset="utf-8"\r\n'
+                       "MIME-Version: 1.0\r\n"
+                       "Content-Transfer-Encoding: base64\r\n\r\n").encode("ascii")
+            fixe = None if gabarit.champs else self._encoder(gabarit.rendre({}))
+            self._parties.append((en_tete, gabarit, fixe))
+        self._fin = f"\r\n--{frontiere}--\r\n".encode("ascii")
+
+    @staticmethod
+    def _encoder(texte):
+        return base64.encodebytes(texte.encode("utf-8")).replace(b"\n", b"\r\n")
+
+    def rendre(self, destinataire, valeurs):
+        morceaux = [self._debut, _en_tete("To", destinataire)]
+        for en_tete, gabarit, fixe in self._parties:
+            morceaux.append(en_tete)
+            morceaux.append(fixe if fixe is not None else self._encoder(gabarit.rendre(valeurs)))
+        morceaux.append(self._fin)
+        return b"".join(morceaux)
@@ -0,0 +1,257 @@
+#Envoi de mails en lots sur une seule session SMTP, avec reprise et journal des envois
+
+import json
+import logging
+import os
+import smtplib
+import socket
+import time
+from datetime import datetime
+from pathlib import Path
+
+from models.journal import ecrire_atomique
+
+logger = logging.getLogger("smtp.mailer")
+
+TAILLE_LOT = 20         # Messages envoyés avant une pause
+PAUSE_LOT = 1.0         # Secondes de pause entre deux lots
+DEBIT_MAX = 5.0         # Messages par seconde au maximum (None : pas de limite)
+TENTATIVES = 3          # Passes d'envoi pour un destinataire en échec temporaire
+DELAI_REESSAI = 5.0     # Secondes avant de retenter les échecs temporaires
+
+
+class JournalEnvois:
+    """
+    Journal des mails déjà envoyés (une ligne JSON par envoi, fsync).
+    → Relancer l'envoi ne renvoie pas un mail dont la clé est déjà dans le journal
+    → conservation : une clé ni envoyée ni redemandée depuis cette durée est oubliée à la compaction
+      (fin d'envoi), le fichier ne garde que les clés encore utiles (au moins le plus long délai de rappel)
+    """
+
+    def __init__(self, path, conservation=None):
+        self.path = Path(path)
+        self.conservation = conservation
+        self.cles = {}  # cle -> {"mail", "envoye_le", "vu_le"}
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                for ligne in f:
+                    try:
+                        entree = json.loads(ligne)
+                        self.cles[entree.pop("cle")] = entree
+                    except (ValueError, KeyError, AttributeError):
+                        logger.warning("Ligne illisible ignorée dans %s", self.path)
+
+    def deja_envoye(self, cle):
+        entree = self.cles.get(cle)
+        if entree is None:
+            return False
+        entree["vu_le"] = _maintenant()  # Toujours demandée : gardée à la prochaine compaction
+        return True
+
+    def noter(self, cle, destinataire):
+        entree = {"mail": destinataire, "envoye_le": _maintenant()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(dict(entree, cle=cle), ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.cles[cle] = entree
+
+    def compacter(self, maintenant=None):
+        """Oublie les clés plus vues depuis `conservation` et réécrit le journal (atomique)"""
+        if self.conservation is None:
+            return 0
+        limite = ((maintenant or datetime.now()) - self.conservation).strftime("%Y-%m-%d %H:%M:%S")
+        avant = len(self.cles)
+        self.cles = {cle: entree for cle, entree in self.cles.items()
+                     if max(entree.get("vu_le") or "", entree.get("envoye_le") or "") >= limite}
+
+        def ecrire(f):
+            for cle, entree in self.cles.items():
+                f.write(json.dumps(dict(entree, cle=cle), ensure_ascii=False) + "\n")
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        ecrire_atomique(str(self.path), ecrire)
+        if avant > len(self.cles):
+            logger.info("Journal des envois : %d clé(s) oubliée(s), %d gardée(s)", avant - len(self.cles), len(self.cles))
+        return avant - len(self.cles)
+
+
+def _maintenant():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Envoi:
+    """Un mail à envoyer : clé de déduplication, destinataire et message (construit à la demande)"""
+    __slots__ = ("cle", "destinataire", "construire", "tentatives", "erreur")
+
+    def __init__(self, cle, destinataire, construire):
+        self.cle = cle
+        self.destinataire = destinataire
+        self.construire = construire  # construire() -> email.message.Message ou octets
+        self.tentatives = 0
+        self.erreur = None
+
+
+class ErreurTemporaire(Exception):
+    pass
+
+
+class Mailer:
+    """
+    Envoie des mails individuels sur une seule session SMTP (STARTTLS optionnel).
+    → Lots de TAILLE_LOT messages, débit limité à DEBIT_MAX messages/s
+    → Échecs temporaires (4xx, coupure) retentés jusqu'à TENTATIVES fois, échecs définitifs (5xx) abandonnés
+    → Chaque envoi réussi est noté dans le journal : une relance ne crée pas de doublon
+    """
+
+    def __init__(self, host, port, from_email, user=None, password=None, starttls=True, journal_path=None,
+                 conservation=None, taille_lot=TAILLE_LOT, pause_lot=PAUSE_LOT, debit_max=DEBIT_MAX,
+                 tentatives=TENTATIVES, delai_reessai=DELAI_REESSAI, timeout=10):
+        self.host = host
+        self.port = port
+        self.from_email = from_email
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.journal = JournalEnvois(journal_path, conservation) if journal_path else None
+        self.taille_lot = taille_lot
+        self.pause_lot = pause_lot
+        self.debit_max = debit_max
+        self.tentatives = tentatives
+        self.delai_reessai = delai_reessai
+        self.timeout = timeout
+        self._server = None
+        self._dernier_envoi = 0.0
+
+    # --- Session SMTP ---
+
+    def _connecter(self):
+        if self._server is not None:
+            return self._server
+        logger.debug("Connexion SMTP vers %s:%s", self.host, self.port)
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if self.starttls:
+                server.starttls()
+                server.ehlo()
+            if self.user:
+                server.login(self.user, self.password or "")
+                logger.info("Authentification réussie")
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+        return server
+
+    def fermer(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                self._server.close()
+            self._server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    # --- Envoi ---
+
+    def _attendre_debit(self):
+        if self.debit_max:
+            attente = self._dernier_envoi + 1 / self.debit_max - time.monotonic()
+            if attente > 0:
+                time.sleep(attente)
+        self._dernier_envoi = time.monotonic()
+
+    def _envoyer_un(self, envoi):
+        """Envoie un message, lève ErreurTemporaire si l'envoi peut être retenté"""
+        message = envoi.construire()
+        self._attendre_debit()
+        try:
+            server = self._connecter()
+            if isinstance(message, bytes):  # Mail déjà encodé (ModeleMail)
+                refuses = server.sendmail(self.from_email, [envoi.destinataire], message)
+            else:
+                refuses = server.send_message(message, self.from_email, [envoi.destinataire])
+        except smtplib.SMTPRecipientsRefused as e:
+            refuses = e.recipients
+        except (smtplib.SMTPServerDisconnected, socket.timeout, ConnectionError) as e:
+            self._server = None  # Session perdue : reconnexion au prochain envoi
+            raise ErreurTemporaire(str(e))
+        except smtplib.SMTPResponseException as e:
+            if 400 <= e.smtp_code < 500:
+                raise ErreurTemporaire(f"{e.smtp_code} {e.smtp_error!r}")
+            raise
+
+        if refuses:
+            code, detail = refuses.get(envoi.destinataire, (550, b""))
+            if 400 <= code < 500:
+                raise ErreurTemporaire(f"{code} {detail!r}")
+            raise smtplib.SMTPRecipientsRefused(refuses)
+
+    def envoyer(self, envois):
+        """
+        Envoie chaque Envoi non encore journalisé.
+        Retourne {"envoyes": [...], "deja_envoyes": [...], "echecs": {mail: erreur}}.
+        """
+        rapport = {"envoyes": [], "deja_envoyes": [], "echecs": {}}
+        a_envoyer = []
+        for envoi in envois:
+            if self.journal and self.journal.deja_envoye(envoi.cle):
+                rapport["deja_envoyes"].append(envoi.destinataire)
+            else:
+                a_envoyer.append(envoi)
+
+        try:
+            for passe in range(1, self.tentatives + 1):
+                if not a_envoyer:
+                    break
+                if passe > 1:
+                    logger.info("Nouvelle tentative pour %d destinataire(s) dans %.0fs", len(a_envoyer), self.delai_reessai)
+                    time.sleep(self.delai_reessai)
+                a_envoyer = self._passe(a_envoyer, rapport)
+        finally:
+            self.fermer()
+            if self.journal:
+                self.journal.compacter()
+
+        for envoi in a_envoyer:
+            rapport["echecs"][envoi.destinataire] = envoi.erreur
+        logger.info("Envoi terminé : %d envoyé(s), %d déjà envoyé(s), %d échec(s)",
+                    len(rapport["envoyes"]), len(rapport["deja_envoyes"]), len(rapport["echecs"]))
+        return rapport
+
+    def _passe(self, envois, rapport):
+        """Une passe sur les envois, retourne ceux à retenter"""
+        a_retenter = []
+        for i, envoi in enumerate(envois):
+            if i and i % self.taille_lot == 0 and self.pause_lot:
+                time.sleep(self.pause_lot)
+            envoi.tentatives += 1
+            try:
+                self._envoyer_un(envoi)
+            except ErreurTemporaire as e:
+                logger.warning("Échec temporaire pour %s : %s", envoi.destinataire, e)
+                envoi.erreur = str(e)
+                a_retenter.append(envoi)
+                continue
+            except smtplib.SMTPAuthenticationError as e:
+                # Inutile d'insister : aucun des envois restants ne passera
+                logger.error("Échec de l'authentification : %s", e)
+                for restant in envois[i:]:
+                    rapport["echecs"][restant.destinataire] = str(e)
+                return []
+            except (smtplib.SMTPException, OSError) as e:
+                logger.error("Échec définitif pour %s : %s", envoi.destinataire, e)
+                rapport["echecs"][envoi.destinataire] = str(e)
+                continue
+            if self.journal:
+                self.journal.noter(envoi.cle, envoi.destinataire)
+            rapport["envoyes"].append(envoi.destinataire)
+            logger.debug("Mail envoyé à %s", envoi.destinataire)
+        return a_retenter
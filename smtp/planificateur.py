@@ -0,0 +1,205 @@
+#Planificateur des rappels par mail : un processus qui tourne en continu (remplace la crontab)
+#→ Plusieurs tâches programmées (rappel quotidien, relance après N jours...), chemins absolus
+#→ Template (compilé en Gabarit) et phrases gardés en mémoire (relus seulement si le fichier change), retards suivis incrémentalement
+#→ Dernière et prochaine exécution de chaque tâche écrites dans data/planificateur.json (supervision)
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+from datetime import datetime, time as heure_du_jour, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from models.journal import ecrire_atomique
+from models.stockage import backend_configure
+from models.retards import SuiviRetards
+from smtp.smtp_server import (DATA_DIR, SMTP_DIR, JOURNAL_ENVOIS, SUJET, DELAI_RAPPEL,
+                              charger_template, charger_phrases, compiler_template, creer_mailer,
+                              envoyer_rappels)
+
+logger = logging.getLogger("smtp.planificateur")
+
+HEURE_RAPPEL = "08:55"
+HEURE_RELANCE = "09:00"
+JOURS_RELANCE = 3       # Une relance (une seule par emprunt) après ce nombre de jours de retard
+SUJET_RELANCE = "Dernier rappel : le câble HDMI n'a toujours pas été rendu"
+ATTENTE_MAX = 60        # Secondes : l'horloge est revérifiée au moins aussi souvent (changement d'heure, NTP)
+
+
+def lire_heure(texte):
+    """"08:55" -> datetime.time"""
+    heures, minutes = texte.strip().split(":")
+    return heure_du_jour(int(heures), int(minutes))
+
+
+class Tache:
+    """Une tâche programmée : à `heure` les jours `jours` (0 = lundi), rappel aux emprunts en retard de `delai`"""
+
+    def __init__(self, nom, heure, delai, sujet=SUJET, une_fois=False, jours=range(7)):
+        self.nom = nom
+        self.heure = lire_heure(heure) if isinstance(heure, str) else heure
+        self.delai = delai
+        self.sujet = sujet
+        self.une_fois = une_fois  # Clé de déduplication sans la date : un seul mail par emprunt
+        self.jours = set(jours)
+        self.derniere_execution = None
+        self.prochaine_execution = None
+        self.dernier_rapport = None
+
+    def calculer_prochaine(self, apres):
+        """Premier créneau strictement après `apres`"""
+        jour = apres.date()
+        while True:
+            creneau = datetime.combine(jour, self.heure)
+            if creneau > apres and creneau.weekday() in self.jours:
+                return creneau
+            jour += timedelta(days=1)
+
+    def statut(self):
+        return {
+            "heure": self.heure.strftime("%H:%M"),
+            "delai_jours": self.delai.total_seconds() / 86400,
+            "derniere_execution": self.derniere_execution.strftime("%Y-%m-%d %H:%M:%S") if self.derniere_execution else None,
+            "prochaine_execution": self.prochaine_execution.strftime("%Y-%m-%d %H:%M:%S") if self.prochaine_execution else None,
+            "dernier_rapport": self.dernier_rapport,
+        }
+
+
+def taches_par_defaut(heure_rappel=HEURE_RAPPEL, heure_relance=HEURE_RELANCE, jours_relance=JOURS_RELANCE):
+    taches = [Tache("rappel", heure_rappel, DELAI_RAPPEL)]
+    if jours_relance:
+        taches.append(Tache("relance", heure_relance, timedelta(days=jours_relance), SUJET_RELANCE, une_fois=True))
+    return taches
+
+
+class Ressource:
+    """Fichier chargé une fois et gardé en mémoire, rechargé seulement si sa date de modification change"""
+
+    def __init__(self, path, charger):
+        self.path = Path(path)
+        self._charger = charger
+        self._mtime = None
+        self._valeur = None
+
+    def valeur(self):
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except OSError:
+            mtime = -1
+        if mtime != self._mtime:
+            self._valeur = self._charger(self.path)
+            self._mtime = mtime
+            logger.info("%s chargé", self.path.name)
+        return self._valeur
+
+
+class Planificateur:
+    def __init__(self, taches, data_dir=DATA_DIR, template_path=SMTP_DIR / "template.html",
+                 phrases_path=None, journal_path=JOURNAL_ENVOIS, statut_path=None, creer_mailer=creer_mailer):
+        self.taches = taches
+        self.data_dir = Path(data_dir).resolve()
+        self.template = Ressource(Path(template_path).resolve(),
+                                  lambda path: compiler_template(charger_template(path)))
+        self.phrases = Ressource((Path(phrases_path) if phrases_path else self.data_dir / "phrases_rappel.csv").resolve(),
+                                 charger_phrases)
+        self.journal_path = Path(journal_path).resolve()
+        self.conservation = max(tache.delai for tache in taches) + timedelta(days=1)  # Clés utiles du journal
+        self.statut_path = Path(statut_path).resolve() if statut_path else self.data_dir / "planificateur.json"
+        self._creer_mailer = creer_mailer
+        self.suivi = SuiviRetards(str(self.data_dir), backend_configure())  # Gardé d'une exécution à l'autre
+        self.demarre_le = None
+        self._arret = threading.Event()
+
+    def executer(self, tache, maintenant=None):
+        """Exécute une tâche tout de suite et retourne son rapport"""
+        maintenant = maintenant or datetime.now()
+        logger.info("Exécution de la tâche %s", tache.nom)
+        try:
+            rapport = envoyer_rappels(self._creer_mailer(self.journal_path, self.conservation), self.data_dir, maintenant,
+                                      suivi=self.suivi, html_template=self.template.valeur(),
+                                      phrases=self.phrases.valeur(), type_rappel=tache.nom,
+                                      delai=tache.delai, sujet=tache.sujet, une_fois=tache.une_fois)
+        except Exception as e:
+            logger.exception("Échec de la tâche %s", tache.nom)
+            rapport = {"erreur": str(e)}
+        tache.derniere_execution = maintenant
+        tache.dernier_rapport = {cle: len(valeur) if isinstance(valeur, (list, dict)) else valeur
+                                 for cle, valeur in rapport.items()}
+        return rapport
+
+    def statut(self):
+        return {
+            "demarre_le": self.demarre_le.strftime("%Y-%m-%d %H:%M:%S") if self.demarre_le else None,
+            "pid": os.getpid(),
+            "taches": {tache.nom: tache.statut() for tache in self.taches},
+        }
+
+    def _ecrire_statut(self):
+        try:
+            self.statut_path.parent.mkdir(parents=True, exist_ok=True)
+            ecrire_atomique(str(self.statut_path),
+                            lambda f: json.dump(self.statut(), f, ensure_ascii=False, indent=2))
+        except OSError as e:
+            logger.warning("Statut non écrit (%s) : %s", self.statut_path, e)
+
+    def run(self):
+        """Boucle principale : exécute chaque tâche à son créneau, jusqu'à stop()"""
+        self.demarre_le = datetime.now()
+        for tache in self.taches:
+            tache.prochaine_execution = tache.calculer_prochaine(self.demarre_le)
+            logger.info("Tâche %s : prochaine exécution le %s", tache.nom, tache.prochaine_execution)
+        self._ecrire_statut()
+
+        while not self._arret.is_set():
+            maintenant = datetime.now()
+            for tache in self.taches:
+                if tache.prochaine_execution <= maintenant:
+                    self.executer(tache, maintenant)
+                    tache.prochaine_execution = tache.calculer_prochaine(maintenant)
+                    self._ecrire_statut()
+            prochaine = min(tache.prochaine_execution for tache in self.taches)
+            attente = (prochaine - datetime.now()).total_seconds()
+            self._arret.wait(min(max(attente, 0), ATTENTE_MAX))
+        self.suivi.fermer()
+        logger.info("Planificateur arrêté")
+
+    def stop(self):
+        self._arret.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Planificateur des rappels par mail")
+    parser.add_argument("--data-dir", default=os.getenv("IROBOT_DATA_DIR", str(DATA_DIR)))
+    parser.add_argument("--heure-rappel", default=os.getenv("HEURE_RAPPEL", HEURE_RAPPEL))
+    parser.add_argument("--heure-relance", default=os.getenv("HEURE_RELANCE", HEURE_RELANCE))
+    parser.add_argument("--jours-relance", type=int, default=int(os.getenv("JOURS_RELANCE", JOURS_RELANCE)),
+                        help="0 pour désactiver la relance")
+    parser.add_argument("--maintenant", metavar="TACHE", help="Exécute une tâche immédiatement puis quitte")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+        handlers=[logging.StreamHandler()]
+    )
+    data_dir = Path(args.data_dir).resolve()
+    planificateur = Planificateur(taches_par_defaut(args.heure_rappel, args.heure_relance, args.jours_relance),
+                                  data_dir=data_dir, journal_path=data_dir / JOURNAL_ENVOIS.name)
+
+    if args.maintenant:
+        taches = [tache for tache in planificateur.taches if tache.nom == args.maintenant]
+        if not taches:
+            parser.error(f"tâche inconnue : {args.maintenant}")
+        rapport = planificateur.executer(taches[0])
+        sys.exit(1 if rapport.get("echecs") or rapport.get("erreur") else 0)
+
+    signal.signal(signal.SIGTERM, lambda *_: planificateur.stop())
+    try:
+        planificateur.run()
+    except KeyboardInterrupt:
+        planificateur.stop()
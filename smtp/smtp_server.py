@@ -1,22 +1,29 @@
-#Server SMTP pour envoi d'email via Brevo avec contenu HTML/CSS et phrase aléatoire depuis CSV
+#Server SMTP pour envoi d'email via Brevo avec contenu HTML/CSS (gabarit précompilé) et phrase aléatoire depuis CSV
+#Un mail individuel par emprunteur en retard (casier, durée de l'emprunt), envoyés en lots sur une seule session
 
 #Importations
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import logging
-from pathlib import Path
 from random import choice
 from html import escape
 import csv
-from datetime import datetime, date, timedelta
+from datetime import datetime, timedelta
 import sys
-import re
 import os
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from models.stockage import backend_configure
+from models.retards import SuiviRetards
+from smtp.mailer import Mailer, Envoi
+from smtp.gabarit import Gabarit, ModeleMail
+from config import obtenir_config
+
+SMTP_DIR = Path(__file__).resolve().parent
+DATA_DIR = SMTP_DIR.parent / "data"
+
 # Charge le .env si présent (dev uniquement)
-env_file = Path(__file__).parent / ".env"
+env_file = SMTP_DIR / ".env"
 if env_file.exists():
     with open(env_file) as f:
         for line in f:
@@ -24,141 +31,136 @@ if env_file.exists():
                 key, value = line.strip().split("=", 1)
                 os.environ[key] = value
 
-# Logging configuration (EN HAUT POUR QUE ÇA FONCTIONNE)
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger("smtp_test")
 
-#CONFIG SMTP BREVO     
-SMTP_SERVER = "smtp-relay.brevo.com"
-SMTP_PORT = 587
-SMTP_USER = "9c33ff001@smtp-brevo.com"
-SMTP_PASS = os.getenv("SMTP_PASS", "")
+#CONFIG SMTP BREVO (config.py : data/config.json, surchargeable par l'environnement, ex. serveur local de test)
+_config = obtenir_config()
+SMTP_SERVER = _config.smtp_server
+SMTP_PORT = _config.smtp_port
+SMTP_USER = _config.smtp_user
+SMTP_PASS = _config.smtp_pass
+SMTP_STARTTLS = _config.smtp_starttls
 
-#CONFIG EMAIL     
+#CONFIG EMAIL
 FROM_EMAIL = "hdmi-locker@outlook.fr"
+SUJET = "Rappel : merci de rendre le câble HDMI"
+DELAI_RAPPEL = timedelta(days=1)  # Un emprunt EN COURS depuis plus longtemps reçoit un rappel
+JOURNAL_ENVOIS = DATA_DIR / "rappels_envoyes.jsonl"
 
 #Texte brut de secours
-plain_text = (
+PLAIN_TEXT = (
     "Rappel : Rendre le câble HDMI\n\n"
-    "Il faudrait que tu ramènes le câble HDMI.\n\n"
+    "{phrase}\n\n"
+    "{details}\n\n"
     "Il est demandé aux étudiants de rendre le câble HDMI emprunté en fin de journée afin de permettre à d'autres étudiants de l'utiliser.\n\n"
     "Ceci est un mail automatique envoyé par le HDMI Locker 3000"
 )
+PHRASE_DEFAUT = "Il faudrait que tu ramènes le câble HDMI."
+GABARIT_TEXTE = Gabarit.depuis_format(PLAIN_TEXT)
+CHAMPS_HTML = {"rappel-phrase": "phrase", "rappel-details": "details"}  # <span id> du template -> champ
 
-#Chargement du fichier html (visuel du mail)
-html_path = Path("template.html")
-if html_path.exists():
-    html_content = html_path.read_text(encoding="utf-8")
-else:
-    html_content = f"<pre>{plain_text}</pre>"
-
-#Chargement des phrases aléatoires depuis le CSV
-phrases_path = Path("../data/phrases_rappel.csv")
-logger.debug("Recherche du fichier de phrases à %s", phrases_path)
-
-try:
-    if phrases_path.exists():
-        with phrases_path.open("r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.reader(f)
-            phrases = [row[0].strip() for row in reader if row]
-
-        logger.debug("Found %d phrases", len(phrases))
-
-        if phrases:
-            # Échappe le HTML et convertit les retours à la ligne en <br>
-            selected = escape(choice(phrases))
-            selected = selected.replace('\n', '<br>')
-            logger.debug("Phrase sélectionnée (après escape) : %s", selected)
-
-            def _repl(m):
-                return m.group(1) + selected + m.group(2)
-
-            html_content = re.sub(
-                r'(<span[^>]*id=["\']rappel-phrase["\'][^>]*>).*?(</span>)',
-                _repl,
-                html_content,
-                flags=re.IGNORECASE | re.DOTALL
-            )
-    else:
-        logger.warning("Fichier de phrases introuvable : %s", phrases_path)
 
-except Exception as exc:
-    logger.exception("Erreur en injectant la phrase aléatoire: %s", exc)
-
-# Lecture du fichier d'emprunts pour déterminer les destinataires
-emprunts_path = Path("../data/emprunts.csv")
-recipients = set()
-logger.debug("Recherche du fichier d'emprunts à %s", emprunts_path)
-
-if emprunts_path.exists():
-    try:
-        with emprunts_path.open("r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.DictReader(f)
-            cutoff = datetime.now() - timedelta(days=1)  # il y a 24h
-            for row in reader:
-                mail = (row.get("mail") or "").strip()
-                statut = (row.get("statut") or "").strip().upper()
-                timestamp_str = (row.get("timestamp") or "").strip()
-                if not mail:
-                    logger.debug("Ligne ignorée sans adresse mail: %s", row)
-                    continue
-                if statut != "EN COURS":
-                    logger.debug("Statut non 'EN COURS' pour %s: %s", mail, statut)
-                    continue
-                try:
-                    row_datetime = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
-                except Exception:
-                    logger.warning("Impossible de parser le timestamp '%s' pour %s, ligne ignorée", timestamp_str, mail)
-                    continue
-                if row_datetime <= cutoff:
-                    recipients.add(mail)
-                    logger.debug("Ajout du destinataire %s (emprunt du %s)", mail, row_datetime)
-    except Exception as exc:
-        logger.exception("Erreur en lisant %s: %s", emprunts_path, exc)
-else:
-    logger.warning("Fichier d'emprunts introuvable: %s", emprunts_path)
-
-#Convertit en liste triée pour envoi, si vide -> quitter
-recipients = sorted(recipients)
-if not recipients:
-    logger.info("Aucun destinataire à notifier aujourd'hui. Fin du script.")
-    sys.exit(0)
-
-#Prépare l'en-tête To avec la liste des destinataires
-to_header = ", ".join(recipients)
-
-message = MIMEMultipart("alternative")
-message["Subject"] = "Rappel : merci de rendre le câble HDMI"
-message["From"] = FROM_EMAIL
-message["To"] = to_header
-
-message.attach(MIMEText(plain_text, "plain", "utf-8"))
-message.attach(MIMEText(html_content, "html", "utf-8"))
-
-try:
-    logger.debug("Initialisation du client SMTP vers %s:%s (délai d'attente=10s)", SMTP_SERVER, SMTP_PORT)
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=10) as server:
-        logger.debug("Connecté au serveur SMTP, envoi de EHLO")
-        server.ehlo()
-        logger.debug("Démarrage de TLS...")
-        server.starttls()
-        server.ehlo()
-        logger.debug("Tentative d'authentification en tant que %s", SMTP_USER)
-        server.login(SMTP_USER, SMTP_PASS)
-        logger.info("Authentification réussie")
-        logger.debug("Envoi du message de %s à %s", FROM_EMAIL, recipients)
-        result = server.sendmail(FROM_EMAIL, recipients, message.as_string())
-        if result:
-            logger.warning("sendmail a signalé des destinataires en échec : %s", result)
-        else:
-            logger.info("Email envoyé avec succès via Brevo !")
-except smtplib.SMTPAuthenticationError as e:
-    logger.exception("Échec de l'authentification : %s", e)
-except smtplib.SMTPException as e:
-    logger.exception("Erreur SMTP : %s", e)
-except Exception as e:
-    logger.exception("Erreur inattendue : %s", e)
\ No newline at end of file
+def charger_template(html_path=SMTP_DIR / "template.html"):
+    """Chargement du fichier html (visuel du mail)"""
+    if html_path.exists():
+        return html_path.read_text(encoding="utf-8")
+    logger.warning("Template introuvable : %s, envoi en texte brut", html_path)
+    return None
+
+
+def charger_phrases(phrases_path=DATA_DIR / "phrases_rappel.csv"):
+    """Chargement des phrases aléatoires depuis le CSV"""
+    logger.debug("Recherche du fichier de phrases à %s", phrases_path)
+    if not phrases_path.exists():
+        logger.warning("Fichier de phrases introuvable : %s", phrases_path)
+        return []
+    with phrases_path.open("r", encoding="utf-8-sig", newline="") as f:
+        phrases = [row[0].strip() for row in csv.reader(f) if row and row[0].strip()]
+    logger.debug("Found %d phrases", len(phrases))
+    return phrases
+
+
+def trouver_retards(data_dir=DATA_DIR, maintenant=None, delai=DELAI_RAPPEL, suivi=None):
+    """Emprunts EN COURS depuis plus de `delai` : liste de {mail, id_casier, debut}, un par emprunteur"""
+    # CSV (snapshot + journal) ou SQLite selon IROBOT_STORAGE ; seules les dates des emprunts en cours sont lues
+    suivi = suivi or SuiviRetards(str(data_dir), backend_configure())
+    retards = {}
+    for retard in suivi.en_retard(maintenant, delai):
+        retards.setdefault(retard.mail, retard.ligne())
+    return sorted(retards.values(), key=lambda retard: retard["mail"])
+
+
+def formater_duree(duree):
+    """timedelta -> "3 jours", "1 jour", "26 heures"... """
+    jours = duree.days
+    if jours >= 2:
+        return f"{jours} jours"
+    heures = int(duree.total_seconds() // 3600)
+    return f"{heures} heures" if heures >= 2 else "1 jour"
+
+
+def compiler_template(html_template):
+    """HTML du mail -> Gabarit (parsé une seule fois), None : version texte brut en <pre>"""
+    if html_template is None or isinstance(html_template, Gabarit):
+        return html_template
+    return Gabarit.depuis_html(html_template, CHAMPS_HTML)
+
+
+def creer_modele(html_template, sujet=SUJET):
+    """Modèle de mail réutilisé pour tous les destinataires d'un envoi"""
+    gabarit = compiler_template(html_template)
+    if gabarit is None:
+        gabarit = Gabarit.depuis_format(f"<pre>{escape(PLAIN_TEXT)}</pre>", escape)
+    return ModeleMail(GABARIT_TEXTE, gabarit, FROM_EMAIL, sujet)
+
+
+def construire_message(retard, modele, phrases, maintenant=None):
+    """Mail personnalisé (octets) pour un emprunteur : phrase tirée au sort, casier et durée de l'emprunt"""
+    duree = formater_duree((maintenant or datetime.now()) - retard["debut"])
+    phrase = choice(phrases) if phrases else PHRASE_DEFAUT
+    details = f"Tu as emprunté le câble du casier n°{retard['id_casier']} il y a {duree}."
+    return modele.rendre(retard["mail"], {"phrase": phrase, "details": details})
+
+
+def creer_mailer(journal_path=JOURNAL_ENVOIS, conservation=DELAI_RAPPEL + timedelta(days=1)):
+    """Clés du journal gardées le plus long délai de rappel, plus un jour de marge entre deux exécutions"""
+    return Mailer(SMTP_SERVER, SMTP_PORT, FROM_EMAIL, user=SMTP_USER if SMTP_PASS else None,
+                  password=SMTP_PASS, starttls=SMTP_STARTTLS, journal_path=journal_path, conservation=conservation)
+
+
+def envoyer_rappels(mailer=None, data_dir=DATA_DIR, maintenant=None, suivi=None, html_template=None,
+                    phrases=None, type_rappel="rappel", delai=DELAI_RAPPEL, sujet=SUJET, une_fois=False):
+    """
+    Envoie un rappel individuel à chaque emprunteur en retard de plus de `delai`.
+    → Au plus un mail par emprunt et par jour (une_fois : un seul pour tout l'emprunt)
+    → Le template (str ou Gabarit déjà compilé) et les phrases sont relus si non fournis (appel ponctuel)
+    """
+    maintenant = maintenant or datetime.now()
+    retards = trouver_retards(data_dir, maintenant, delai, suivi)
+    if not retards:
+        logger.info("Aucun destinataire à notifier (%s). Fin de l'envoi.", type_rappel)
+        return {"envoyes": [], "deja_envoyes": [], "echecs": {}}
+
+    if html_template is None:
+        html_template = charger_template()
+    if phrases is None:
+        phrases = charger_phrases()
+    modele = creer_modele(html_template, sujet)
+    periode = "" if une_fois else f"|{maintenant:%Y-%m-%d}"
+    envois = [
+        Envoi(f"{type_rappel}|{retard['mail']}|{retard['debut']:%Y-%m-%d %H:%M:%S}{periode}", retard["mail"],
+              lambda retard=retard: construire_message(retard, modele, phrases, maintenant))
+        for retard in retards
+    ]
+    return (mailer or creer_mailer()).envoyer(envois)
+
+
+if __name__ == "__main__":
+    # Logging configuration
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+        handlers=[logging.StreamHandler()]
+    )
+    rapport = envoyer_rappels()
+    sys.exit(1 if rapport["echecs"] else 0)
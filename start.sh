@@ -16,5 +16,7 @@ pkill -f "hardware/rfid_manager.py" 2>/dev/null || true
 # 4. Lancer le système
 echo "--- Lancement du système iRobot ---"
 source .venv/bin/activate
+# Agrégats d'emprunts remplis depuis l'historique avant la borne, hors du démarrage RFID (première fois seulement)
+python models/analyses.py reconstruire --si-absente
 # On lance le web en arrière-plan et le RFID au premier plan
 python web/app.py & python hardware/rfid_manager.py
@@ -0,0 +1,81 @@
+#Tests de la flotte : routage des casiers vers deux bancs (Arduino factices sur pty) et acquittements par port
+#Lancement : python3 -m pytest -q tests
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from hardware.arduino_comm import ArduinoComm
+from hardware.arduino_factice import ArduinoFactice
+from hardware.flotte import Banc, Flotte
+from hardware.simulation import SpeakerNul
+
+TIMEOUT = 2.0
+
+
+@pytest.fixture
+def bancs():
+    """Banc A : casiers 1 à 3, banc B (plus lent) : casiers 16 à 18"""
+    arduinos = {"A": ArduinoFactice(), "B": ArduinoFactice(delai_reponse=0.3)}
+    flotte = Flotte([Banc("A", arduinos["A"].port, [1, 2, 3], reset_delay=0),
+                     Banc("B", arduinos["B"].port, [16, 17, 18], reset_delay=0)])
+    comm = ArduinoComm(speaker=SpeakerNul(), flotte=flotte)
+    yield comm, arduinos
+    comm.fermer()
+    for arduino in arduinos.values():
+        arduino.fermer()
+
+
+def acquitter(commandes):
+    """{id_casier: (réponse, instant de l'acquittement)}"""
+    acquittements = {}
+    for id_casier, commande in commandes.items():
+        assert commande.attendre(TIMEOUT), f"Pas d'acquittement pour le casier {id_casier}"
+        acquittements[id_casier] = (commande.reponse, commande.t_ack)
+    return acquittements
+
+
+def test_routage_et_acquittements_par_port(bancs):
+    comm, arduinos = bancs
+
+    commandes = {id_casier: comm.envoyer_commande(id_casier, "OUVRIR") for id_casier in (1, 16, 3, 18, 2)}
+    acquittements = acquitter(commandes)
+
+    # Chaque casier est ouvert sur le port de son banc, au canal = sa position dans le banc
+    assert arduinos["A"].canaux_recus == [0, 2, 1]
+    assert arduinos["B"].canaux_recus == [0, 2]
+    # Chaque commande est résolue par la réponse de son propre port, dans l'ordre d'envoi sur ce port
+    assert {id_casier: reponse for id_casier, (reponse, _) in acquittements.items()} == {
+        1: "OK 0", 3: "OK 2", 2: "OK 1", 16: "OK 0", 18: "OK 2"}
+    assert comm.speaker.annonces == [1, 16, 3, 18, 2]
+
+
+def test_banc_lent_ne_retarde_pas_les_autres(bancs):
+    comm, arduinos = bancs
+
+    commandes = {id_casier: comm.envoyer_commande(id_casier, "OUVRIR") for id_casier in (16, 17, 1)}
+    acquittements = acquitter(commandes)
+
+    # Le casier 1 (banc A) est acquitté avant que le banc B n'ait fini son premier relais
+    assert acquittements[1][1] < acquittements[16][1] < acquittements[17][1]
+
+
+def test_port_partage_refuse():
+    arduino = ArduinoFactice()
+    try:
+        with pytest.raises(ValueError, match="Port"):
+            Flotte([Banc("A", arduino.port, [1, 2], reset_delay=0), Banc("B", arduino.port, [3, 4], reset_delay=0)])
+    finally:
+        arduino.fermer()
+
+
+def test_casier_hors_flotte(bancs):
+    comm, arduinos = bancs
+
+    assert comm.envoyer_commande(42, "OUVRIR") is None
+    time.sleep(0.1)
+    assert arduinos["A"].canaux_recus == [] and arduinos["B"].canaux_recus == []
@@ -0,0 +1,57 @@
+#Tests de l'afficheur LCD : priorités et expiration des messages (écran en mémoire)
+#Lancement : python3 -m pytest -q tests
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from hardware.lcd_display import ERREUR, MESSAGES_DEFAUT, LCDDisplay, cadrer
+from hardware.simulation import PiloteLCDMemoire
+
+
+@pytest.fixture
+def lcd():
+    pilote = PiloteLCDMemoire()
+    afficheur = LCDDisplay(driver=pilote)
+    yield afficheur, pilote
+    afficheur.cleanup()
+
+
+def ecran(pilote, attendu, timeout=1.0):
+    """Attend que le thread du LCD ait dessiné `attendu` (deux lignes cadrées)"""
+    fin = time.monotonic() + timeout
+    while pilote.ecran() != list(attendu) and time.monotonic() < fin:
+        time.sleep(0.01)
+    return pilote.ecran()
+
+
+def test_erreur_masque_le_statut(lcd):
+    afficheur, pilote = lcd
+    afficheur.afficher("Veuillez", "patienter...")
+    afficheur.afficher("Carte inconnue", "Scannez QR code", priorite=ERREUR, duree=0.3)
+    afficheur.afficher("Casier 3", "ouvert", duree=5)
+
+    erreur = cadrer("Carte inconnue", "Scannez QR code")
+    assert ecran(pilote, erreur) == list(erreur)
+    # Erreur expirée : le statut le plus récent reprend
+    assert ecran(pilote, cadrer("Casier 3", "ouvert")) == list(cadrer("Casier 3", "ouvert"))
+
+
+def test_retour_par_defaut_garde_les_erreurs(lcd):
+    afficheur, pilote = lcd
+    afficheur.afficher("Veuillez", "patienter...")
+    afficheur.afficher("Erreur casier", "7", priorite=ERREUR, duree=0.3)
+
+    afficheur.start_alternating()  # Fin d'une autre opération
+
+    assert ecran(pilote, cadrer("Erreur casier", "7")) == list(cadrer("Erreur casier", "7"))
+    # Après son expiration, l'alternance par défaut (le statut a été retiré)
+    defauts = [list(cadrer(*message)) for message in MESSAGES_DEFAUT]
+    fin = time.monotonic() + 1.0
+    while pilote.ecran() not in defauts and time.monotonic() < fin:
+        time.sleep(0.01)
+    assert pilote.ecran() in defauts
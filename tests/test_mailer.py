@@ -0,0 +1,137 @@
+#Tests du Mailer contre un vrai serveur SMTP local (aiosmtpd) : lots, reprise, abandon et journal des envois
+#Lancement : python3 -m pytest -q tests
+
+import json
+import socket
+import sys
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from aiosmtpd.controller import Controller
+
+from smtp.mailer import Envoi, JournalEnvois, Mailer
+
+FROM_EMAIL = "irobot@epitech.eu"
+
+
+class Serveur:
+    """Handler aiosmtpd : refuse en 4xx les destinataires temp*, en 5xx les refus*, accepte les autres"""
+
+    def __init__(self):
+        self.sessions = 0
+        self.rcpt = []
+        self.recus = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        self.rcpt.append(address)
+        if address.startswith("temp"):
+            return "451 4.3.0 Réessayez plus tard"
+        if address.startswith("refus"):
+            return "550 5.1.1 Destinataire inconnu"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.recus.extend(envelope.rcpt_tos)
+        return "250 Message accepted"
+
+
+def port_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def serveur():
+    handler = Serveur()
+    controller = Controller(handler, hostname="127.0.0.1", port=port_libre())
+    controller.start()
+    yield handler, controller.port
+    controller.stop()
+
+
+def message(destinataire):
+    msg = EmailMessage()
+    msg["From"] = FROM_EMAIL
+    msg["To"] = destinataire
+    msg["Subject"] = "Rappel"
+    msg.set_content("Pense à rendre le câble.")
+    return msg
+
+
+def envois(destinataires):
+    return [Envoi(f"rappel|{mail}", mail, lambda mail=mail: message(mail)) for mail in destinataires]
+
+
+def creer_mailer(port, journal_path, **options):
+    options = dict(dict(taille_lot=2, pause_lot=0, debit_max=None, tentatives=3, delai_reessai=0), **options)
+    return Mailer("127.0.0.1", port, FROM_EMAIL, starttls=False, journal_path=journal_path, **options)
+
+
+def test_lots_sur_une_seule_session(serveur, tmp_path):
+    handler, port = serveur
+    destinataires = [f"u{i}@epitech.eu" for i in range(5)]
+
+    rapport = creer_mailer(port, tmp_path / "envois.jsonl").envoyer(envois(destinataires))
+
+    assert rapport["envoyes"] == destinataires
+    assert rapport["echecs"] == {}
+    assert handler.recus == destinataires
+    assert handler.sessions == 1  # Trois lots de 2, une seule connexion
+
+
+def test_4xx_retente_puis_5xx_abandonne(serveur, tmp_path):
+    handler, port = serveur
+
+    rapport = creer_mailer(port, tmp_path / "envois.jsonl").envoyer(
+        envois(["ok@epitech.eu", "temp@epitech.eu", "refus@epitech.eu"]))
+
+    assert rapport["envoyes"] == ["ok@epitech.eu"]
+    assert set(rapport["echecs"]) == {"temp@epitech.eu", "refus@epitech.eu"}
+    assert "451" in rapport["echecs"]["temp@epitech.eu"]
+    assert handler.rcpt.count("temp@epitech.eu") == 3  # Une tentative par passe
+    assert handler.rcpt.count("refus@epitech.eu") == 1  # Échec définitif : pas de nouvelle tentative
+    assert handler.recus == ["ok@epitech.eu"]
+
+
+def test_journal_evite_les_doublons(serveur, tmp_path):
+    handler, port = serveur
+    journal = tmp_path / "envois.jsonl"
+    destinataires = ["a@epitech.eu", "temp@epitech.eu", "b@epitech.eu"]
+
+    creer_mailer(port, journal).envoyer(envois(destinataires))
+    rapport = creer_mailer(port, journal).envoyer(envois(destinataires))  # Relance (ex. après un plantage)
+
+    assert rapport["envoyes"] == []
+    assert rapport["deja_envoyes"] == ["a@epitech.eu", "b@epitech.eu"]
+    assert list(rapport["echecs"]) == ["temp@epitech.eu"]  # Jamais envoyé : retenté à la relance
+    assert handler.recus == ["a@epitech.eu", "b@epitech.eu"]
+
+
+def test_journal_oublie_les_cles_perimees(serveur, tmp_path):
+    handler, port = serveur
+    journal = tmp_path / "envois.jsonl"
+    ancien = (datetime.now() - timedelta(days=10)).strftime("%Y-%m-%d %H:%M:%S")
+    with journal.open("w", encoding="utf-8") as f:
+        for cle in ("rappel|vieux@epitech.eu", "rappel|encore@epitech.eu"):
+            f.write(json.dumps({"cle": cle, "mail": cle.split("|")[1], "envoye_le": ancien}) + "\n")
+
+    # encore@ est toujours en retard (redemandé) : sa clé est gardée, vieux@ est oublié
+    rapport = creer_mailer(port, journal, conservation=timedelta(days=4)).envoyer(
+        envois(["encore@epitech.eu", "nouveau@epitech.eu"]))
+
+    assert rapport["deja_envoyes"] == ["encore@epitech.eu"]
+    assert rapport["envoyes"] == ["nouveau@epitech.eu"]
+    assert set(JournalEnvois(journal).cles) == {"rappel|encore@epitech.eu", "rappel|nouveau@epitech.eu"}
+    assert len(journal.read_text(encoding="utf-8").splitlines()) == 2
@@ -0,0 +1,117 @@
+#Tests du pipeline (borne simulée) : emprunt annulé et rendu non écrit sans acquittement, lecteur par banc
+#Lancement : python3 -m pytest -q tests
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from hardware.simulation import creer_borne_simulee
+
+UTILISATEURS = {"111": "a@epitech.eu", "222": "b@epitech.eu"}
+SANS_REPONSE = 3.0  # Relais plus lent que le délai d'actionnement : l'ouverture expire
+
+
+@pytest.fixture(params=["csv", "sqlite"])
+def borne(request, tmp_path):
+    manager, simulation = creer_borne_simulee(str(tmp_path), 15, UTILISATEURS, delai_relais=0.02,
+                                              backend=request.param)
+    manager.pipeline.delai_actionnement = 0.3
+    manager.poll_interval = 0.05
+    manager.anti_rebond.fenetre = 0  # La même carte repasse tout de suite (rendu)
+    thread = threading.Thread(target=manager.run, daemon=True)
+    thread.start()
+    yield manager, simulation
+    manager.arreter()
+    thread.join(timeout=5)
+    simulation.fermer()
+
+
+def passer(manager, uid, timeout=5.0):
+    """Présente la carte et attend la fin de l'opération (persistance comprise)"""
+    manager.reader.programmer([(0, uid)])
+    fin = time.monotonic() + timeout
+    time.sleep(0.1)
+    while manager.reader.restantes() or manager.pipeline.en_cours():
+        assert time.monotonic() < fin, "Passage non terminé"
+        time.sleep(0.02)
+
+
+def statuts(stockage):
+    if hasattr(stockage, "tous"):
+        return [row["statut"] for row in stockage.tous("SELECT statut FROM emprunts ORDER BY id")]
+    return [emprunt.statut for emprunt in stockage.emprunts.emprunts]
+
+
+def test_emprunt_puis_rendu(borne):
+    manager, _ = borne
+    stockage = manager.stockage
+
+    passer(manager, "111")
+    id_casier = stockage.emprunts.get_casier_en_cours("a@epitech.eu")
+    assert id_casier is not None and stockage.casiers.reserve.nb_libres() == 14
+
+    passer(manager, "111")
+    assert statuts(stockage) == ["TERMINE"]
+    assert stockage.casiers.reserve.nb_libres() == 15
+    assert stockage.casiers.reserve.usure[id_casier]["ouvertures"] == 2
+
+
+def test_emprunt_sans_acquittement_annule(borne):
+    manager, simulation = borne
+    stockage = manager.stockage
+    simulation.arduinos[0].delai_reponse = SANS_REPONSE
+
+    passer(manager, "111")
+
+    assert statuts(stockage) == ["ANNULE"]
+    assert not stockage.emprunts.get_emprunt("a@epitech.eu")
+    assert stockage.casiers.reserve.nb_libres() == 15  # Le câble est resté dans le casier
+    assert sum(infos["ouvertures"] for infos in stockage.casiers.reserve.usure.values()) == 0  # Jamais acquittée
+    serie = stockage.analyses.serie("jour", 1)
+    assert serie[0]["emprunts"] == 0 and serie[0]["rendus"] == 0 and serie[0]["durees"] == 0
+
+
+def test_rendu_sans_acquittement_non_ecrit(borne):
+    manager, simulation = borne
+    stockage = manager.stockage
+    passer(manager, "111")
+    id_casier = stockage.emprunts.get_casier_en_cours("a@epitech.eu")
+    simulation.arduinos[0].delai_reponse = SANS_REPONSE
+
+    passer(manager, "111")
+
+    # Le câble est resté chez l'utilisateur : emprunt toujours EN COURS, casier pas proposé au suivant
+    assert statuts(stockage) == ["EN COURS"]
+    assert stockage.emprunts.get_casier_en_cours("a@epitech.eu") == id_casier
+    assert not stockage.casiers.reserve.est_libre(id_casier)
+    assert stockage.casiers.reserve.nb_libres() == 14
+
+
+def test_emprunt_au_banc_du_lecteur(tmp_path):
+    manager, simulation = creer_borne_simulee(str(tmp_path), 30, UTILISATEURS, delai_relais=0.02,
+                                              lecteur_par_banc=True)
+    manager.poll_interval = 0.05
+    thread = threading.Thread(target=manager.run, daemon=True)
+    thread.start()
+    try:
+        lecteurs = manager.reader.lecteurs
+        for uid, banc in (("111", "sim2"), ("222", "sim1")):
+            lecteurs[banc].programmer([(0, uid)])
+            fin = time.monotonic() + 5.0
+            time.sleep(0.1)
+            while lecteurs[banc].restantes() or manager.pipeline.en_cours():
+                assert time.monotonic() < fin, "Passage non terminé"
+                time.sleep(0.02)
+
+        # Chaque carte ouvre un casier du banc (15 casiers, un Arduino) devant lequel est son lecteur
+        assert 16 <= manager.stockage.emprunts.get_casier_en_cours("a@epitech.eu") <= 30
+        assert 1 <= manager.stockage.emprunts.get_casier_en_cours("b@epitech.eu") <= 15
+    finally:
+        manager.arreter()
+        thread.join(timeout=5)
+        simulation.fermer()
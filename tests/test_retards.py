@@ -0,0 +1,41 @@
+#Tests de la détection des retards : lignes d'emprunts.csv sans mail ou à date illisible ignorées
+#Lancement : python3 -m pytest -q tests
+
+import logging
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from models.retards import DetecteurRetards
+
+MAINTENANT = datetime(2025, 3, 10, 12, 0, 0)
+
+
+def ligne(mail, timestamp="2025-03-01 09:00:00", statut="EN COURS"):
+    return {"mail": mail, "id_casier": "4", "timestamp": timestamp, "statut": statut}
+
+
+def test_mail_vide_ignore_et_mail_nettoye():
+    detecteur = DetecteurRetards()
+    detecteur.appliquer(0, ligne(""))
+    detecteur.appliquer(1, ligne("   "))
+    detecteur.appliquer(2, ligne(None))
+    detecteur.appliquer(3, ligne("  a@epitech.eu \n"))
+
+    assert [retard.mail for retard in detecteur.en_retard(MAINTENANT)] == ["a@epitech.eu"]
+
+    detecteur.appliquer(3, ligne("a@epitech.eu"))  # Même ligne rejouée sans les espaces
+    assert len(detecteur) == 1
+
+
+def test_date_illisible_journalisee(caplog):
+    detecteur = DetecteurRetards()
+
+    with caplog.at_level(logging.WARNING, logger="models.retards"):
+        detecteur.appliquer(0, ligne("a@epitech.eu", timestamp="01/03/2025"))
+        detecteur.appliquer(1, ligne("b@epitech.eu", timestamp=" 2025-03-01 09:00:00 "))
+
+    assert [retard.mail for retard in detecteur.en_retard(MAINTENANT)] == ["b@epitech.eu"]
+    assert "01/03/2025" in caplog.text and "a@epitech.eu" in caplog.text
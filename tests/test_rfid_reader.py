@@ -0,0 +1,77 @@
+#Tests du lecteur factice et de l'anti-rebond (sans GPIO)
+#Lancement : python3 -m pytest -q tests
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from hardware.rfid_reader import AntiRebond, LecteurFactice, LecteurRFID
+
+
+class Horloge:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def passages(lecteur, anti_rebond, horloge, lectures):
+    """Comme la boucle RFID : chaque carte lue passe l'anti-rebond, [(avance en s, uid)] -> UID acceptés"""
+    acceptes = []
+    for avance, uid in lectures:
+        horloge.t += avance
+        lecteur.presenter(uid)
+        carte = lecteur.attendre_carte(1)
+        if carte and anti_rebond.accepter(carte):
+            acceptes.append(carte)
+    return acceptes
+
+
+def test_interface_abstraite():
+    class SansAttente(LecteurRFID):
+        pass
+
+    with pytest.raises(TypeError):
+        SansAttente()
+
+
+def test_attendre_carte():
+    lecteur = LecteurFactice(["111"])
+
+    assert lecteur.attendre_carte(0.1) == "111"
+    debut = time.monotonic()
+    assert lecteur.attendre_carte(0.1) is None  # Timeout sans carte
+    assert time.monotonic() - debut >= 0.09
+
+    threading.Timer(0.05, lecteur.presenter, ("222",)).start()
+    assert lecteur.attendre_carte(2) == "222"  # Réveillé par la carte, sans attendre le timeout
+
+
+def test_carte_restee_sur_le_lecteur_ignoree():
+    horloge = Horloge()
+    anti_rebond = AntiRebond(fenetre=3.0, horloge=horloge)
+
+    # La carte reste posée (relue toutes les 0.5 s) : la fenêtre glisse, un seul passage
+    acceptes = passages(LecteurFactice(), anti_rebond, horloge, [(0, "111")] + [(0.5, "111")] * 10)
+
+    assert acceptes == ["111"]
+    assert anti_rebond.ignorees == 10
+
+
+def test_autre_carte_et_nouveau_passage():
+    horloge = Horloge()
+    anti_rebond = AntiRebond(fenetre=3.0, horloge=horloge)
+
+    acceptes = passages(LecteurFactice(), anti_rebond, horloge,
+                        [(0, "111"), (0.2, "222"), (1, "111"), (3.5, "111")])
+
+    assert acceptes == ["111", "222", "111"]  # Autre carte tout de suite, même carte après la fenêtre
+    compteurs = anti_rebond.compteurs()
+    assert (compteurs["lectures"], compteurs["acceptees"], compteurs["ignorees"]) == (4, 3, 1)
+    assert compteurs["acceptees_juste_apres"] == 1
@@ -1,40 +1,42 @@
 import os
+import sys
 import json
 import time
 import re
-from flask import Flask, request, render_template, redirect, url_for, flash, jsonify
+from flask import Flask, Response, request, render_template, redirect, url_for, flash, jsonify, stream_with_context
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-STATE_FILE = os.path.join(DATA_DIR, "rfid_state.json")
+sys.path.append(BASE_DIR)
 
-ASSOCIATION_TIMEOUT_SECONDS = 20
+from hardware.ipc import ClientIPC
+from config import obtenir_config
+from metriques import TYPE_CONTENU, metriques_rfid
+
+IPC_CONNECT_TIMEOUT_SECONDS = 2
+SSE_HEARTBEAT_SECONDS = 5
+STATUTS_TERMINAUX = ("success", "error", "timeout")
 EMAIL_REGEX = re.compile(r"^[A-Za-z0-9._%+\-]+@(epitech\.eu|epitech\.digital)$", re.IGNORECASE)
 
 app = Flask(__name__)
 app.secret_key = "change-me-in-prod"
 
-
-def ensure_state_file():
-    os.makedirs(DATA_DIR, exist_ok=True)
-    if not os.path.exists(STATE_FILE):
-        with open(STATE_FILE, "w") as f:
-            json.dump({"mode": "NORMAL"}, f)
+# Connexion persistante au processus RFID : l'état courant est poussé en mémoire
+ipc = ClientIPC().start()
 
 
 def read_state():
-    ensure_state_file()
-    try:
-        with open(STATE_FILE, "r") as f:
-            return json.load(f)
-    except Exception:
-        return {"mode": "NORMAL"}
+    return ipc.etat
 
 
-def write_state(payload: dict):
-    ensure_state_file()
-    with open(STATE_FILE, "w") as f:
-        json.dump(payload, f)
+def write_state(payload: dict) -> bool:
+    """Envoie une demande au processus RFID, retourne False s'il est injoignable"""
+    if not ipc.attendre_connexion(IPC_CONNECT_TIMEOUT_SECONDS):
+        return False
+    ipc.mettre_a_jour(payload)
+    if not ipc.envoyer(dict(payload, type=payload["mode"])):
+        ipc.mettre_a_jour({"mode": "NORMAL"})
+        return False
+    return True
 
 
 def is_valid_email(email: str) -> bool:
@@ -52,7 +54,7 @@ def root():
 @app.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "GET":
-        return render_template("register.html", timeout=ASSOCIATION_TIMEOUT_SECONDS)
+        return render_template("register.html", timeout=f"{obtenir_config().association_timeout:g}")
 
     # POST
     raw_email = (request.form.get("email") or "").strip().lower()
@@ -70,47 +72,95 @@ def register():
         flash("Email invalide. Utilise @epitech.eu ou @epitech.digital", "error")
         return redirect(url_for("register"))
 
-    # Ecrit une demande d'association que rfid_manager va consommer
-    write_state({
+    # Pousse une demande d'association au processus RFID
+    if not write_state({
         "mode": "ASSOCIATION",
         "mail": email,
         "timestamp": time.time()
-    })
+    }):
+        flash("Lecteur de cartes indisponible, réessaie dans un instant.", "error")
+        return redirect(url_for("register"))
 
-    # Page qui attend et poll /status
+    # Page qui attend le résultat via /status/stream (SSE)
     return render_template("wait_for_card.html", email=email)
 
 
-@app.get("/status")
-def check_status():
+def status_payload(state: dict) -> dict:
     """
-    Renvoie un statut simple pour la page wait_for_card.html:
+    Statut simple pour la page wait_for_card.html:
     - waiting / success / error / timeout / idle
     """
-    state = read_state()
     mode = state.get("mode", "NORMAL")
 
     if mode == "SUCCESS":
-        return jsonify({
+        return {
             "status": "success",
             "mail": state.get("mail"),
             "uid": state.get("uid")
-        })
+        }
 
     if mode == "ERROR":
-        return jsonify({
+        return {
             "status": "error",
             "message": state.get("message", "Erreur inconnue")
-        })
+        }
+
+    if mode == "TIMEOUT":
+        return {"status": "timeout"}
 
     if mode == "ASSOCIATION":
         ts = state.get("timestamp", 0)
-        if time.time() - ts > ASSOCIATION_TIMEOUT_SECONDS:
-            return jsonify({"status": "timeout"})
-        return jsonify({"status": "waiting"})
+        if time.time() - ts > obtenir_config().association_timeout:
+            return {"status": "timeout"}
+        return {"status": "waiting"}
 
-    return jsonify({"status": "idle"})
+    return {"status": "idle"}
+
+
+@app.get("/status")
+def check_status():
+    """Statut courant (repli pour les navigateurs sans EventSource)"""
+    return jsonify(status_payload(read_state()))
+
+
+@app.get("/status/stream")
+def stream_status():
+    """
+    Server-Sent Events : pousse le statut dès que le processus RFID le publie
+    (réveil par la Condition du client IPC, aucun polling ni lecture de fichier).
+    Le flux se termine sur success / error / timeout.
+    """
+    def evenements():
+        version = None
+        while True:
+            with ipc.condition:
+                attente = SSE_HEARTBEAT_SECONDS
+                if ipc.etat.get("mode") == "ASSOCIATION":
+                    # Se réveiller pile à l'expiration pour annoncer le timeout
+                    restant = ipc.etat.get("timestamp", 0) + obtenir_config().association_timeout - time.time()
+                    attente = max(0, min(attente, restant + 0.05))
+                ipc.condition.wait_for(lambda: ipc.version != version, timeout=attente)
+                state, nouvelle_version = ipc.etat, ipc.version
+
+            payload = status_payload(state)
+            if nouvelle_version != version or payload["status"] in STATUTS_TERMINAUX:
+                version = nouvelle_version
+                yield f"data: {json.dumps(payload)}\n\n"
+                if payload["status"] in STATUTS_TERMINAUX:
+                    return
+            else:
+                yield ": keep-alive\n\n"
+
+    return Response(stream_with_context(evenements()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/metrics")
+def metrics():
+    """Métriques de la borne (processus RFID) au format Prometheus"""
+    return Response(metriques_rfid(ipc, IPC_CONNECT_TIMEOUT_SECONDS), content_type=TYPE_CONTENU)
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=False, use_reloader=False)
\ No newline at end of file
+    obtenir_config().surveiller()  # association_timeout rechargé à chaud, comme dans le processus RFID
+    app.run(host="0.0.0.0", port=obtenir_config().web_port, debug=False, use_reloader=False, threaded=True)
\ No newline at end of file